@@ -2,3 +2,6 @@ from .bandit import Bandit
 from . import job
 from .email import Email
 from .version import __version__
+from .cache import JobResultCache
+from .database import db
+from .instrument import stats
@@ -0,0 +1,224 @@
+"""
+Client-side aggregation for `Bandit.report`. Per-batch metrics can easily run
+into millions of points, which is a lot to ship and more than a chart can
+show. An Aggregator collects points per tag and, every `interval` seconds,
+boils each tag down to at most `max_points` points before they're sent.
+"""
+from .yhat_json import json_dumps
+from array import array
+import atexit
+import random
+import threading
+import time
+
+
+class Aggregator(object):
+    """
+    Collects data points per tag and downsamples them before they're sent, so a
+    tag never sends more than `max_points` points per `interval`.
+
+    `method` decides how points are picked:
+
+        - "lttb": Largest-Triangle-Three-Buckets, which keeps the points that
+          matter for the shape of the curve (spikes, dips)
+        - "reservoir": a uniform random sample. only `max_points` points per tag
+          are ever held in memory
+        - "mean", "min", "max", "last", "count": split the window into
+          `max_points` buckets and report one summary value per bucket
+
+    Parameters
+    ==========
+    bandit: Bandit
+        the client the downsampled points will be sent with
+    interval: float
+        number of seconds of points that are collected before downsampling
+    max_points: int
+        max number of points sent per tag per interval
+    method: str
+        one of "lttb", "reservoir", "mean", "min", "max", "last", "count"
+
+    Examples
+    ========
+    >>> bandit = Bandit()
+    >>> bandit.aggregate_reports(interval=10, max_points=200, method="lttb")
+    >>> for i, loss in enumerate(losses):
+    ...     bandit.report("loss", loss)
+    """
+    METHODS = ("lttb", "reservoir", "mean", "min", "max", "last", "count")
+
+    def __init__(self, bandit, interval=5.0, max_points=100, method="lttb"):
+        if method not in self.METHODS:
+            raise Exception("method must be one of: " + ", ".join(self.METHODS))
+        if method=="lttb" and max_points < 3:
+            raise Exception("lttb needs max_points to be at least 3")
+        if max_points < 1:
+            raise Exception("max_points must be at least 1")
+
+        self.bandit = bandit
+        self.interval = interval
+        self.max_points = max_points
+        self.method = method
+        self.received = 0
+        self.sent = 0
+
+        # tag -> (xs, ys), or for "reservoir" tag -> [number of points seen, samples]
+        self._windows = {}
+        self._lock = threading.RLock()
+        self._last_flush = time.time()
+        atexit.register(self.close)
+
+    def add(self, tag_name, x, y):
+        "add a data point to its tag's window, flushing if the interval is up"
+        return self.extend(tag_name, [x], [y])
+
+    def extend(self, tag_name, xs, ys):
+        "add a sequence of data points for a single tag"
+        with self._lock:
+            if self.method=="reservoir":
+                self._sample(tag_name, xs, ys)
+            else:
+                window = self._windows.get(tag_name)
+                if window is None:
+                    window = self._windows[tag_name] = (array('d'), array('d'))
+                window[0].extend(xs)
+                window[1].extend(ys)
+            self.received += len(ys)
+            due = time.time() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+        return { "status": "OK", "message": "AGGREGATED" }
+
+    def _sample(self, tag_name, xs, ys):
+        # algorithm R: the i-th point replaces a random sample with probability k/i
+        seen, samples = self._windows.setdefault(tag_name, [0, []])
+        for point in zip(xs, ys):
+            seen += 1
+            if len(samples) < self.max_points:
+                samples.append(point)
+            else:
+                i = random.randint(0, seen - 1)
+                if i < self.max_points:
+                    samples[i] = point
+        self._windows[tag_name][0] = seen
+
+    def flush(self):
+        """
+        Downsample every tag's window and send the result.
+        """
+        with self._lock:
+            self._last_flush = time.time()
+            windows, self._windows = self._windows, {}
+
+            lines = []
+            for tag_name in sorted(windows):
+                for x, y in self._downsample(windows[tag_name]):
+                    lines.append(json_dumps(dict(tag_name=tag_name, x=_number(x), y=_number(y))))
+            if lines:
+                self.sent += len(lines)
+                self.bandit._dispatch(lines)
+
+    def _downsample(self, window):
+        if self.method=="reservoir":
+            return sorted(window[1])
+        xs, ys = window
+        if self.method=="lttb":
+            return lttb(xs, ys, self.max_points)
+        return bucket(xs, ys, self.max_points, self.method)
+
+    def close(self):
+        """
+        send whatever's been collected, flush the client's reporter too, and
+        stop flushing at exit
+        """
+        self.flush()
+        self.bandit.flush_reports()
+        atexit.unregister(self.close)
+
+    def stats(self):
+        "counts of points that have been received and sent"
+        with self._lock:
+            return {"received": self.received, "sent": self.sent}
+
+
+def lttb(xs, ys, n_out):
+    """
+    Downsample a series to `n_out` points with Largest-Triangle-Three-Buckets.
+    The first and last points are always kept; in between, every bucket
+    contributes the point that makes the biggest triangle with the previously
+    picked point and the average of the next bucket.
+
+    Parameters
+    ==========
+    xs: sequence
+        x values, in increasing order
+    ys: sequence
+        y values
+    n_out: int
+        number of points to keep. must be at least 3
+
+    Returns
+    =======
+    list of (x, y) tuples
+    """
+    n = len(xs)
+    if n <= n_out:
+        return list(zip(xs, ys))
+
+    every = float(n - 2) / (n_out - 2)
+    picked = [(xs[0], ys[0])]
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[end:next_end]) / (next_end - end)
+        avg_y = sum(ys[end:next_end]) / (next_end - end)
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            # twice the triangle's area; the constant factor doesn't matter
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append((xs[best], ys[best]))
+        a = best
+    picked.append((xs[n - 1], ys[n - 1]))
+    return picked
+
+
+_REDUCERS = {
+    "mean": lambda ys: sum(ys) / len(ys),
+    "min": min,
+    "max": max,
+    "last": lambda ys: ys[-1],
+    "count": len,
+}
+
+
+def bucket(xs, ys, n_out, method):
+    """
+    Split a series into `n_out` equally sized buckets and summarize each one
+    with `method` ("mean", "min", "max", "last", or "count"). Each summary is
+    reported at the x value of the last point in its bucket.
+
+    Returns
+    =======
+    list of (x, y) tuples
+    """
+    reduce_ = _REDUCERS[method]
+    n = len(xs)
+    n_out = min(n, n_out)
+    picked = []
+    for i in range(n_out):
+        start = i * n // n_out
+        end = (i + 1) * n // n_out
+        picked.append((xs[end - 1], reduce_(ys[start:end])))
+    return picked
+
+
+def _number(value):
+    "points are stored as floats; send whole numbers (like steps) as ints"
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
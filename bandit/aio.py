@@ -0,0 +1,211 @@
+"""
+asyncio flavored Bandit client. Requires aiohttp; without it the module still
+imports, but creating an AsyncBandit raises.
+
+    >>> from bandit.aio import AsyncBandit
+"""
+from .bandit import _is_numeric
+from .models import Job, JobResult
+from .session import RETRY_STATUSES
+from .job import Metadata
+from .yhat_json import json_dumps
+from .files import append, job_path
+from . import instrument
+from urllib.parse import urljoin
+import asyncio
+import base64
+import os
+import time
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncBandit(object):
+    """
+    Client for communicating with the Bandit server from an asyncio event loop.
+    It takes the same arguments and has the same local/dry run behavior as
+    `Bandit`, but every method that talks to the server is a coroutine, so you
+    can start and poll lots of jobs at once.
+
+    Parameters
+    ==========
+    username: str
+        your Bandit (and also GitHub) username
+    apikey: str
+        your Bandit apikey
+    url: str
+        the url of your Bandit server (i.e. http://10.1.201.1/, http://bandit.yhat.com/)
+    pool_size: int
+        max number of connections kept open to the Bandit server
+    timeout: float
+        number of seconds to wait on the Bandit server before giving up
+    retries: int
+        number of times to retry requests that fail with a connection error or a 5xx
+    backoff_factor: float
+        retries back off exponentially, sleeping backoff_factor * 2^n seconds
+
+    Examples
+    ========
+    >>> async def main():
+    ...     async with AsyncBandit() as bandit:
+    ...         await asyncio.gather(*[bandit.run("myproject", name) for name in names])
+    >>> asyncio.get_event_loop().run_until_complete(main())
+    """
+    def __init__(self, username=None, apikey=None, url=None, pool_size=10, timeout=30,
+                 retries=3, backoff_factor=0.5):
+        if aiohttp is None:
+            raise Exception("AsyncBandit requires aiohttp. `pip install aiohttp`")
+
+        self.username = os.environ.get('BANDIT_CLIENT_USERNAME', username)
+        self.apikey = os.environ.get('BANDIT_CLIENT_APIKEY', apikey)
+        self.url = os.environ.get('BANDIT_CLIENT_URL', url)
+
+        self._is_local = False
+        if self.username is None or self.apikey is None or self.url is None:
+            self._is_local = True
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.metadata = Metadata()
+        self._steps = {}
+        # aiohttp sessions have to be created inside of a running event loop
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        "close the connections to the Bandit server"
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def run(self, project, jobname):
+        """
+        Run a job that's on Bandit
+
+        Parameters
+        ==========
+        project: str
+            the name of the project the job belongs to
+        name: str
+            the name of the job you'd like to run
+
+        Examples
+        ========
+        >>> bandit = AsyncBandit()
+        >>> await bandit.run("myproject", "my-first-job")
+        """
+        if self._is_local==True:
+            print('/'.join([self.username, project, 'jobs', jobname]))
+            return
+
+        return await self._request('GET', '/'.join(['api', 'projects', self.username, project, 'jobs', jobname]))
+
+    async def get_jobs(self):
+        """
+        Get a list of the jobs you have on Bandit
+        """
+        if self._is_local==True:
+            print('/api/jobs')
+            return
+
+        data = await self._request('GET', '/api/jobs', params={'format': 'json'})
+        return [Job(**j) for j in data['jobs']]
+
+    async def get_job_results(self):
+        """
+        Get a list of the job results from Bandit
+        """
+        if self._is_local==True:
+            print('/api/job-results')
+            return
+
+        data = await self._request('GET', '/api/job-results', params={'format': 'json'})
+        return [JobResult(**j) for j in data['jobResults']]
+
+    async def stream(self, tag_name, y, x=None):
+        "alias for `report`"
+        return await self.report(tag_name, y, x)
+
+    async def report(self, tag_name, y, x=None):
+        """
+        Parameters
+        ==========
+        tag_name: str
+            tag for the data point
+        y: int, float
+            y value for the data point
+        x: int, float
+            x value for the data point. defaults to the tag's next step
+        """
+        if _is_numeric(y)==False:
+            raise Exception("`y` parameter is not a number '{}'".format(y))
+        if x is not None and _is_numeric(x)==False:
+            raise Exception("`x` parameter is not a number '{}'".format(x))
+
+        tag_name = tag_name.replace(' ', '-')
+        if x is None:
+            x = self._steps.get(tag_name, 0)
+            self._steps[tag_name] = x + 1
+        line = json_dumps(dict(tag_name=tag_name, x=x, y=y))
+
+        job_id = os.environ.get('BANDIT_JOB_ID')
+        if not job_id or self._is_local==True:
+            print(line)
+            return { "status": "OK", "message": "DRY RUN" }
+
+        append(job_path('metadata', 'charts.ndjson'), line + '\n')
+
+        return await self._request('PUT', '/'.join(['api', 'jobs', job_id, 'report']), data=line.encode('utf-8'),
+                                   headers={'Content-Type': 'application/json'})
+
+    def get_connection(self, name):
+        """
+        Get a database connection string that's saved on Bandit
+        """
+        return os.environ.get('DATABASE_' + name)
+
+    async def _request(self, method, path, **kwargs):
+        """
+        make an authenticated request to the Bandit server and return the parsed
+        JSON response, retrying connection errors and 5xx responses with
+        exponential backoff
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers={'Authorization': _basic_auth(self.username, self.apikey)},
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+        url = urljoin(self.url, path)
+        start = time.perf_counter()
+        instrument.add('http.requests')
+        try:
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt==self.retries
+                if attempt > 0:
+                    instrument.add('http.retries')
+                try:
+                    async with self._session.request(method, url, **kwargs) as r:
+                        if r.status not in RETRY_STATUSES or last_attempt:
+                            return await r.json(content_type=None)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if last_attempt:
+                        raise
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+        finally:
+            instrument.record('http', time.perf_counter() - start)
+
+
+def _basic_auth(username, apikey):
+    credentials = ('%s:%s' % (username, apikey)).encode('utf-8')
+    return 'Basic ' + base64.b64encode(credentials).decode('ascii')
@@ -0,0 +1,425 @@
+"""
+Large job output (models, exports, ...) written to output-files through a
+streaming writer. Every artifact is checksummed as it's written and listed in
+output-files/artifacts.json. With uploads turned on, artifacts are also sent
+to Bandit while the job is still running instead of being picked up after the
+container exits: every `chunk_size` bytes go out as one part of a multipart
+upload as soon as they've been written, a few parts at a time. If an upload
+fails, `ArtifactStore.upload` picks it up again and only sends the parts
+Bandit doesn't have yet.
+
+    >>> artifacts = bandit.artifacts(upload=True)
+    >>> with artifacts.open('model.pkl') as f:
+    ...     pickle.dump(model, f)
+    >>> artifacts.save('predictions.csv', '/tmp/predictions.csv')
+    >>> artifacts.wait()
+
+Uploads go to the job's artifact endpoints:
+
+    POST /api/jobs/<id>/artifacts                          start (or resume) an upload
+    PUT  /api/jobs/<id>/artifacts/<upload id>/parts/<n>    send part n
+    POST /api/jobs/<id>/artifacts/<upload id>/complete     put the parts together
+"""
+from .files import atomic_write
+from . import instrument
+import atexit
+import functools
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+# checksums of everything written with an ArtifactStore, next to the artifacts
+MANIFEST = 'artifacts.json'
+
+
+class Artifact(object):
+    "a file that's been written to output-files, and its checksum"
+    def __init__(self, name, path, size, sha256):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.uploaded = False
+        # the last upload started for the artifact, so a failed one can be resumed
+        self.upload_id = None
+
+    def to_dict(self):
+        return {"size": self.size, "sha256": self.sha256, "uploaded": self.uploaded}
+
+    def __repr__(self):
+        return "<Artifact %s (%d bytes)>" % (self.name, self.size)
+
+
+class ArtifactStore(object):
+    """
+    Writes artifacts to the job's output directory and (optionally) uploads
+    them to Bandit. Use `Bandit.artifacts` to get one.
+
+    Parameters
+    ==========
+    bandit: Bandit
+        the client that uploads are sent with
+    output_dir: str
+        directory the artifacts are written to
+    upload: bool
+        upload artifacts to Bandit as they're written. uploads only happen on a
+        Bandit worker (or under `bandit run-local`)
+    chunk_size: int
+        size of each part of an upload, in bytes. this many bytes per worker are
+        held in memory while a part is being sent
+    workers: int
+        max number of parts being sent at once
+    """
+    def __init__(self, bandit, output_dir, upload=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=4):
+        if chunk_size < 1:
+            raise Exception("chunk_size must be at least 1 byte")
+
+        self.bandit = bandit
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.job_id = os.environ.get('BANDIT_JOB_ID')
+        self.uploading = upload and bool(self.job_id) and not bandit._is_local
+        self.artifacts = {}
+
+        self._lock = threading.Lock()
+        self._uploads = {}
+        # a writer blocks once this many parts are waiting to be sent
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._part_pool = None
+        self._complete_pool = None
+        atexit.register(self.close)
+
+    def path(self, name):
+        "where the artifact `name` is written"
+        path = os.path.normpath(os.path.join(self.output_dir, name))
+        if os.path.isabs(name) or not path.startswith(os.path.normpath(self.output_dir) + os.sep):
+            raise Exception("artifact names must be relative paths inside the output directory, got '%s'" % name)
+        return path
+
+    def open(self, name):
+        """
+        Get a binary file-like object that writes the artifact `name`. The file
+        only shows up in the output directory once the writer is closed.
+
+        Examples
+        ========
+        >>> with artifacts.open('model.pkl') as f:
+        ...     pickle.dump(model, f)
+        >>> with artifacts.open('logs/train.log') as f:
+        ...     for line in log_lines:
+        ...         f.write(line)
+        """
+        return ArtifactWriter(self, name)
+
+    def save(self, name, src):
+        """
+        Copy a file into the output directory as the artifact `name`.
+
+        Parameters
+        ==========
+        name: str
+            name of the artifact
+        src: str, file
+            path of the file to copy, or a file object opened in binary mode
+
+        Examples
+        ========
+        >>> artifacts.save('model.h5', '/tmp/model.h5')
+        <Artifact model.h5 (104857600 bytes)>
+        """
+        if not hasattr(src, 'read'):
+            with open(src, 'rb') as f:
+                return self.save(name, f)
+        with self.open(name) as writer:
+            while True:
+                chunk = src.read(self.chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        return writer.artifact
+
+    def upload(self, name):
+        """
+        Upload a file that's already in the output directory, i.e. an artifact
+        whose upload failed or a file written by something else. If Bandit has
+        some of its parts from an earlier attempt, only the rest are sent.
+        Returns a `concurrent.futures.Future` for the artifact.
+
+        Examples
+        ========
+        >>> artifacts.upload('model.pkl').result()
+        <Artifact model.pkl (104857600 bytes)>
+        """
+        if not self.uploading:
+            raise Exception("uploads are off. use `bandit.artifacts(upload=True)` on a Bandit worker")
+        path = self.path(name)
+        artifact = self.artifacts.get(name)
+        if artifact is None or artifact.size!=os.path.getsize(path):
+            artifact = self._add(name, path, *_checksum(path, self.chunk_size))
+
+        upload = _Upload(self, name, size=artifact.size, sha256=artifact.sha256, upload_id=artifact.upload_id)
+        # resuming needs to know which parts Bandit already has before sending any
+        upload.start()
+        for offset in range(0, artifact.size, self.chunk_size):
+            upload.send(functools.partial(_read, path, offset, self.chunk_size))
+        return self._finish(upload, artifact)
+
+    def wait(self):
+        """
+        Wait for every upload to finish. Raises an Exception naming the
+        artifacts that couldn't be uploaded.
+        """
+        with self._lock:
+            uploads = list(self._uploads.items())
+        failed = []
+        for name, future in uploads:
+            try:
+                future.result()
+            except Exception as e:
+                failed.append("%s (%s)" % (name, str(e)))
+        if failed:
+            raise Exception("could not upload %s" % ", ".join(failed))
+        return [future.result() for _, future in uploads]
+
+    def close(self):
+        "wait for the uploads that are in progress, then stop the upload threads"
+        try:
+            self.wait()
+        except Exception as e:
+            sys.stderr.write("%s. they're still in the output directory; `upload` them again to resume\n" % str(e))
+        with self._lock:
+            pools = (self._part_pool, self._complete_pool)
+            self._part_pool = self._complete_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown()
+
+    def _add(self, name, path, size, sha256):
+        artifact = Artifact(name, path, size, sha256)
+        with self._lock:
+            self.artifacts[name] = artifact
+            self._write_manifest()
+        instrument.add('artifacts.bytes', size)
+        return artifact
+
+    def _write_manifest(self):
+        manifest = dict((name, artifact.to_dict()) for name, artifact in self.artifacts.items())
+        atomic_write(os.path.join(self.output_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True))
+
+    def _pools(self):
+        # parts and completions get their own threads so a completion waiting on
+        # its parts can never hold up the parts themselves
+        with self._lock:
+            if self._part_pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._part_pool = ThreadPoolExecutor(self.workers)
+                self._complete_pool = ThreadPoolExecutor(1)
+        return self._part_pool, self._complete_pool
+
+    def _finish(self, upload, artifact):
+        "complete `upload` once all of its parts are in, without blocking the job"
+        future = self._pools()[1].submit(upload.complete, artifact)
+        with self._lock:
+            self._uploads[artifact.name] = future
+        return future
+
+    def _api(self, *parts):
+        return '/'.join(['api', 'jobs', self.job_id, 'artifacts'] + [str(part) for part in parts])
+
+
+class ArtifactWriter(object):
+    """
+    A binary file-like object that writes an artifact, checksumming it on the
+    way. Get one from `ArtifactStore.open`. Until it's closed the data goes to
+    a temp file next to the artifact, so nobody picks up half of it.
+    """
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.path = store.path(name)
+        self.artifact = None
+        self.closed = False
+        self._upload = _Upload(store, name) if store.uploading else None
+        self._part = bytearray()
+
+        dirname = os.path.dirname(self.path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        fd, self._tmp_path = tempfile.mkstemp(dir=dirname, prefix='.' + os.path.basename(self.path) + '-')
+        self._file = io.open(fd, 'wb')
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+
+    def write(self, data):
+        "write bytes to the artifact. text is written as UTF-8"
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._file.write(data)
+        self._sha256.update(data)
+        self._size += len(data)
+        if self._upload is not None:
+            self._buffer(data)
+        return len(data)
+
+    def _buffer(self, data):
+        "collect `data` into parts, sending each part as soon as it's full"
+        view = memoryview(data)
+        while len(view):
+            n = min(len(view), self.store.chunk_size - len(self._part))
+            self._part += view[:n]
+            view = view[n:]
+            if len(self._part)==self.store.chunk_size:
+                self._upload.send(bytes(self._part))
+                self._part = bytearray()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """
+        Finish writing the artifact and move it into place. The upload (if
+        there is one) finishes in the background. Returns the Artifact.
+        """
+        if self.closed:
+            return self.artifact
+        self.closed = True
+        self._file.close()
+        os.chmod(self._tmp_path, 0o644)
+        os.rename(self._tmp_path, self.path)
+        self.artifact = self.store._add(self.name, self.path, self._size, self._sha256.hexdigest())
+        if self._upload is not None:
+            if self._part:
+                self._upload.send(bytes(self._part))
+                self._part = bytearray()
+            self.store._finish(self._upload, self.artifact)
+        return self.artifact
+
+    def abort(self):
+        "throw away what's been written"
+        if self.closed:
+            return
+        self.closed = True
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class _Upload(object):
+    """
+    One multipart upload. It's only started on Bandit when the first part goes
+    out, from the upload threads, so a server that's down or slow never holds
+    up the job; if starting fails, the next part tries again. Passing the id of
+    an unfinished upload resumes it; so does starting an upload for a file with
+    a known size and checksum that Bandit already has some of.
+    """
+    def __init__(self, store, name, size=None, sha256=None, upload_id=None):
+        self.store = store
+        self.n_parts = 0
+        self.upload_id = None
+        self.received = set()
+        self._futures = []
+        self._start_lock = threading.Lock()
+        self._request = {"name": name, "chunk_size": store.chunk_size}
+        if sha256 is not None:
+            self._request.update(size=size, sha256=sha256)
+        if upload_id is not None:
+            self._request['upload_id'] = upload_id
+
+    def start(self):
+        "start (or resume) the upload on Bandit if that hasn't happened yet. returns its id"
+        with self._start_lock:
+            if self.upload_id is None:
+                r = self.store.bandit._request('POST', self.store._api(),
+                                               data=json.dumps(self._request).encode('utf-8'),
+                                               headers={'Content-Type': 'application/json'})
+                r.raise_for_status()
+                result = r.json()
+                self.received = set(result.get('parts') or [])
+                self.upload_id = result['upload_id']
+        return self.upload_id
+
+    def send(self, data):
+        """
+        Send the next part in the background. `data` is its bytes, or a function
+        that reads them. Blocks while too many parts are waiting to be sent.
+        """
+        n = self.n_parts
+        self.n_parts += 1
+        if n in self.received:
+            return
+        self.store._slots.acquire()
+        try:
+            future = self.store._pools()[0].submit(self._send, n, data)
+        except Exception:
+            self.store._slots.release()
+            raise
+        future.add_done_callback(lambda _: self.store._slots.release())
+        self._futures.append(future)
+
+    def _send(self, n, data):
+        upload_id = self.start()
+        if callable(data):
+            data = data()
+        r = self.store.bandit._request('PUT', self.store._api(upload_id, 'parts', n), data=data,
+                                       headers={'Content-Type': 'application/octet-stream',
+                                                'X-Bandit-SHA256': hashlib.sha256(data).hexdigest()})
+        r.raise_for_status()
+        instrument.add('artifacts.parts')
+
+    def complete(self, artifact):
+        "wait for the parts, then have Bandit put them together and check the result"
+        # let every part finish, so a resumed upload knows exactly what's missing
+        errors = [future.exception() for future in self._futures]
+        # remember the upload even if it failed, so `ArtifactStore.upload` resumes it
+        artifact.upload_id = self.upload_id
+        for error in errors:
+            if error is not None:
+                raise error
+        upload_id = self.start()
+        artifact.upload_id = upload_id
+        data = {"parts": self.n_parts, "size": artifact.size, "sha256": artifact.sha256}
+        r = self.store.bandit._request('POST', self.store._api(upload_id, 'complete'),
+                                       data=json.dumps(data).encode('utf-8'),
+                                       headers={'Content-Type': 'application/json'})
+        if r.status_code==400:
+            raise Exception(r.json().get('message'))
+        r.raise_for_status()
+        with self.store._lock:
+            artifact.uploaded = True
+            self.store._write_manifest()
+        return artifact
+
+
+def _checksum(path, chunk_size):
+    "(size, sha256) of the file at `path`"
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            size += len(chunk)
+    return size, sha256.hexdigest()
+
+
+def _read(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
@@ -0,0 +1,114 @@
+"""
+Makes dashboards self-contained. Images and stylesheets that a dashboard points
+at on the local filesystem are either copied into an `assets/` folder next to
+the dashboard or inlined as data URIs. Copied assets are named by a hash of
+their contents, so an image used by a hundred dashboards is only stored once.
+"""
+from .files import atomic_write
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import re
+
+# the stylesheet that the built-in templates load
+BOOTSTRAP_URL = 'http://bootswatch.com/readable/bootstrap.min.css'
+
+_ASSET_ATTR = re.compile(r'''(<(?:img|link|script)\b[^>]*?\b(?:src|href)=)(["'])([^"']+)\2''', re.IGNORECASE)
+
+
+class AssetStore(object):
+    """
+    Parameters
+    ==========
+    output_dir: str
+        directory the dashboards are written to
+    mode: str
+        "copy" to copy assets into <output_dir>/assets/, or "inline" to embed
+        them in the page as data URIs
+    max_image_size: tuple
+        (width, height) to shrink bigger PNG/JPEG images down to. needs Pillow
+
+    Examples
+    ========
+    >>> store = AssetStore(bandit.output_dir)
+    >>> store.add('/tmp/plot.png')
+    'assets/5f0c6b0e8a3e4d5c.png'
+    """
+    def __init__(self, output_dir, mode="copy", max_image_size=None):
+        if mode not in ("copy", "inline"):
+            raise Exception("mode must be 'copy' or 'inline'")
+        if max_image_size is not None:
+            try:
+                import PIL.Image
+            except ImportError:
+                raise Exception("resizing images requires Pillow. `pip install Pillow`")
+
+        self.output_dir = output_dir
+        self.mode = mode
+        self.max_image_size = max_image_size
+
+    def add(self, path):
+        """
+        Add the file at `path` to the store and get back the URL to use for it
+        in the dashboard.
+        """
+        content = self._read(path)
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.mode=="inline":
+            return 'data:%s;base64,%s' % (content_type, base64.b64encode(content).decode('ascii'))
+
+        digest = hashlib.sha1(content).hexdigest()[:16]
+        name = digest + os.path.splitext(path)[1].lower()
+        asset_dir = os.path.join(self.output_dir, 'assets')
+        if not os.path.exists(asset_dir):
+            try:
+                os.makedirs(asset_dir)
+            except OSError:
+                # someone else (i.e. another worker) beat us to it
+                pass
+        asset_path = os.path.join(asset_dir, name)
+        if not os.path.exists(asset_path):
+            atomic_write(asset_path, content)
+        return 'assets/' + name
+
+    def rewrite(self, html, replace=None):
+        """
+        Point every <img>, <link> and <script> in `html` that references a local
+        file at the stored copy of that file instead.
+
+        Parameters
+        ==========
+        html: str
+            the rendered dashboard
+        replace: dict
+            URLs to swap for local files before rewriting, i.e.
+            {BOOTSTRAP_URL: 'static/bootstrap.min.css'}
+        """
+        replace = replace or {}
+
+        def rewrite_attr(match):
+            prefix, quote, url = match.groups()
+            path = replace.get(url, url)
+            if re.match(r'^([a-z]+:|//)', path, re.IGNORECASE) or not os.path.isfile(path):
+                return match.group(0)
+            return prefix + quote + self.add(path) + quote
+
+        return _ASSET_ATTR.sub(rewrite_attr, html)
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        if self.max_image_size is None or os.path.splitext(path)[1].lower() not in ('.png', '.jpg', '.jpeg'):
+            return content
+
+        from PIL import Image
+        image = Image.open(io.BytesIO(content))
+        width, height = self.max_image_size
+        if image.size[0] <= width and image.size[1] <= height:
+            return content
+        image.thumbnail(self.max_image_size)
+        out = io.BytesIO()
+        image.save(out, format=image.format or 'PNG', optimize=True)
+        return out.getvalue()
@@ -1,35 +1,33 @@
 from .job import Metadata
 from .yhat_json import json_dumps
-import requests
-import pybars
-import urlparse
-import json
+from .reporter import BufferedReporter, BackgroundReporter
+from .aggregate import Aggregator
+from .metrics import MetricsLog
+from .artifacts import ArtifactStore, DEFAULT_CHUNK_SIZE
+from .session import make_session
+from .models import Job, JobResult
+from .templates import get_template, precompile
+from . import tables
+from .assets import AssetStore, BOOTSTRAP_URL
+from .files import append, job_path
+from . import database
+from . import instrument
+from urllib.parse import urljoin
+import atexit
 import time
+import datetime
+import random
 import tempfile
+import uuid
+import threading
+import traceback
+import sys
+import re
 import os
-try:
-    from pandas import DataFrame
-except Exception as e:
-    DataFrame = None
 
 
-class Job(object):
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
-        self.data = kwargs
-
-    def __repr__(self):
-        return "<Job {}/{}>".format(self.username, self.name)
-
-class JobResult(object):
-    def __init__(self, **kwargs):
-        for key, value in kwargs.items():
-            setattr(self, key, value)
-        self.data = kwargs
-
-    def __repr__(self):
-        return "<JobResult {}/{}/{}>".format(self.name, self.n, self.status)
+# job result statuses for runs that haven't finished yet
+_RUNNING_STATUSES = ('pending', 'queued', 'starting', 'running')
 
 class Bandit(object):
     """
@@ -43,13 +41,22 @@ class Bandit(object):
         your Bandit apikey
     url: str
         the url of your Bandit server (i.e. http://10.1.201.1/, http://bandit.yhat.com/)
+    pool_size: int
+        max number of connections kept open to the Bandit server
+    timeout: float
+        number of seconds to wait on the Bandit server before giving up
+    retries: int
+        number of times to retry requests that fail with a connection error or a 5xx
+    backoff_factor: float
+        retries back off exponentially, sleeping backoff_factor * 2^n seconds
 
     Examples
     ========
     >>> bandit = Bandit() # this will grab username, apikey, and url from environment variables
     >>> bandit = Bandit()
     """
-    def __init__(self, username=None, apikey=None, url=None):
+    def __init__(self, username=None, apikey=None, url=None, pool_size=10, timeout=30,
+                 retries=3, backoff_factor=0.5):
         self.username = os.environ.get('BANDIT_CLIENT_USERNAME', username)
         self.apikey = os.environ.get('BANDIT_CLIENT_APIKEY', apikey)
         self.url = os.environ.get('BANDIT_CLIENT_URL', url)
@@ -58,12 +65,33 @@ class Bandit(object):
         if self.username is None or self.apikey is None or self.url is None:
             self._is_local = True
 
+        self.timeout = timeout
+        self._session_options = dict(pool_size=pool_size, retries=retries, backoff_factor=backoff_factor)
+        self._session = None
+        self._session_lock = threading.Lock()
         self.metadata = Metadata()
+        self._reporter = None
+        self._aggregator = None
+        self._charts_log = None
+        self._artifacts = None
+        # whether the server has the bulk report endpoint. see `_send_reports`
+        self._bulk_reports = True
+        self._steps = {}
+        self._steps_lock = threading.Lock()
 
         if self._is_local==True:
             self.output_dir = tempfile.mkdtemp(prefix='tmp-bandit-')
         else:
-            self.output_dir = '/job/output-files/'
+            self.output_dir = job_path('output-files', '')
+
+    @property
+    def session(self):
+        "the pooled HTTP session. created the first time we talk to Bandit"
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = make_session(**self._session_options)
+        return self._session
 
     def run(self, project, jobname):
         """
@@ -86,14 +114,185 @@ class Bandit(object):
             print('/'.join([self.username, project, 'jobs', jobname]))
             return
 
-        url = urlparse.urljoin(self.url, '/'.join(['api', 'projects', self.username, project, 'jobs', jobname]))
-        r = requests.get(url, auth=(self.username, self.apikey))
+        r = self._request('GET', '/'.join(['api', 'projects', self.username, project, 'jobs', jobname]))
         return r.json()
 
-    def get_jobs(self):
+    def run_and_wait(self, project, jobname, timeout=None, poll_interval=1.0, max_poll_interval=30.0):
+        """
+        Run a job that's on Bandit and wait for it to finish
+
+        Parameters
+        ==========
+        project: str
+            the name of the project the job belongs to
+        jobname: str
+            the name of the job you'd like to run
+        timeout: float
+            max number of seconds to wait. waits indefinitely if None
+        poll_interval: float
+            number of seconds to wait before first checking on the job. the wait
+            grows each time the job is still running
+        max_poll_interval: float
+            max number of seconds to wait between checks
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> result = bandit.run_and_wait("myproject", "my-first-job")
+        >>> result.status
+        'success'
+        """
+        jobs = [{'project': project, 'name': jobname}]
+        return self.run_parallel(jobs, timeout=timeout, poll_interval=poll_interval,
+                                 max_poll_interval=max_poll_interval)[0]
+
+    def run_series(self, jobs, stop_on_failure=False, timeout=None, poll_interval=1.0,
+                   max_poll_interval=30.0):
+        """
+        Run jobs one after another, waiting for each to finish before starting
+        the next one
+
+        Parameters
+        ==========
+        jobs: list
+            list of dicts with a `project` and a `name`
+        stop_on_failure: bool
+            don't start any more jobs once one hasn't succeeded
+        timeout: float
+            max number of seconds to wait on each job
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.run_series([
+        ...     {'project': 'etl', 'name': 'extract'},
+        ...     {'project': 'etl', 'name': 'load'}
+        ... ])
+        [<JobResult extract/12/success>, <JobResult load/12/success>]
+        """
+        results = []
+        for job in jobs:
+            result = self.run_and_wait(job['project'], job['name'], timeout=timeout,
+                                       poll_interval=poll_interval,
+                                       max_poll_interval=max_poll_interval)
+            results.append(result)
+            if stop_on_failure and result is not None and result.status!='success':
+                break
+        return results
+
+    def run_parallel(self, jobs, max_concurrency=None, timeout=None, poll_interval=1.0,
+                     max_poll_interval=30.0):
+        """
+        Run a bunch of jobs at once and wait for all of them to finish. No matter
+        how many jobs are running, Bandit is only asked for job results once per
+        poll, and polls back off (with a bit of jitter) while jobs are running.
+
+        Parameters
+        ==========
+        jobs: list
+            list of dicts with a `project` and a `name`
+        max_concurrency: int
+            max number of jobs running at the same time. no limit if None
+        timeout: float
+            max number of seconds to wait for all of the jobs. waits
+            indefinitely if None
+        poll_interval: float
+            number of seconds to wait before first checking on the jobs
+        max_poll_interval: float
+            max number of seconds to wait between checks
+
+        Jobs that can't be started (i.e. a misspelled name) aren't waited on.
+        Their result is a JobResult with status 'error' and a `message`.
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.run_parallel([{'project': 'models', 'name': 'train-' + s} for s in segments], max_concurrency=4)
+        """
+        if self._is_local==True:
+            for job in jobs:
+                self.run(job['project'], job['name'])
+            return [None for job in jobs]
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiting = list(enumerate(jobs))
+        running = {}
+        results = [None for job in jobs]
+        # results that have already been matched up with a job we started
+        claimed = set()
+        # only look at runs from around when we started. the margin is for clock
+        # skew between us and the Bandit server
+        since = datetime.datetime.fromtimestamp(time.time() - 300, datetime.timezone.utc)
+        baseline = self._recent_job_results(since)
+        delay = poll_interval
+
+        while waiting or running:
+            while waiting and (max_concurrency is None or len(running) < max_concurrency):
+                i, job = waiting.pop(0)
+                key = (job['project'], job['name'])
+                previous_runs = [result.n for result in _runs_of(baseline, *key)]
+                error = self._start_job(*key)
+                if error is not None:
+                    results[i] = JobResult(project=key[0], name=key[1], n=None, status='error',
+                                           message=error)
+                    continue
+                running[i] = (key, max(previous_runs) if previous_runs else None)
+                delay = poll_interval
+
+            if not running:
+                continue
+            wait = delay * random.uniform(0.5, 1.0)
+            if deadline is not None:
+                wait = max(0, min(wait, deadline - time.monotonic()))
+            time.sleep(wait)
+            delay = min(delay * 1.5, max_poll_interval)
+
+            recent = self._recent_job_results(since)
+            for i in sorted(running):
+                key, last_n = running[i]
+                for result in sorted(_runs_of(recent, *key), key=lambda r: r.n):
+                    if (key, result.n) in claimed:
+                        continue
+                    if last_n is not None and result.n <= last_n:
+                        continue
+                    if result.status in _RUNNING_STATUSES:
+                        # this is our run but it hasn't finished yet
+                        break
+                    claimed.add((key, result.n))
+                    results[i] = result
+                    del running[i]
+                    break
+
+            if (running or waiting) and deadline is not None and time.monotonic() >= deadline:
+                keys = [key for key, _ in running.values()]
+                keys += [(job['project'], job['name']) for _, job in waiting]
+                raise Exception("timed out waiting for jobs: " + ", ".join('/'.join(key) for key in keys))
+        return results
+
+    def _start_job(self, project, jobname):
+        "start a job for `run_parallel`. returns why it couldn't be started, or None"
+        r = self._request('GET', '/'.join(['api', 'projects', self.username, project, 'jobs', jobname]))
+        if r.status_code >= 400:
+            return "HTTP %d starting %s/%s" % (r.status_code, project, jobname)
+        try:
+            body = r.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict) and str(body.get('status', '')).upper()=='ERROR':
+            return body.get('message') or "couldn't start %s/%s" % (project, jobname)
+        return None
+
+    def get_jobs(self, project=None, page_size=100):
         """
         Get a list of the jobs you have on Bandit
 
+        Parameters
+        ==========
+        project: str
+            only get jobs that belong to this project
+        page_size: int
+            number of jobs to fetch per request
+
         Examples
         ========
         >>> bandit = Bandit()
@@ -103,39 +302,136 @@ class Bandit(object):
             print('/api/jobs')
             return
 
-        url = urlparse.urljoin(self.url, '/api/jobs')
-        r = requests.get(url, params={'format': 'json'}, auth=(self.username, self.apikey))
-        jobs = r.json()['jobs']
-        return [Job(**j) for j in jobs]
+        return list(self.iter_jobs(project=project, page_size=page_size))
+
+    def iter_jobs(self, project=None, page_size=100):
+        """
+        Lazily iterate over the jobs you have on Bandit, fetching `page_size`
+        jobs at a time.
+
+        Parameters
+        ==========
+        project: str
+            only get jobs that belong to this project
+        page_size: int
+            number of jobs to fetch per request
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> for job in bandit.iter_jobs(project="myproject"):
+        ...     print(job)
+        """
+        if self._is_local==True:
+            print('/api/jobs')
+            return
+
+        params = _filters(project=project)
+        for j in self._paginate('/api/jobs', 'jobs', params, page_size):
+            job = Job(**j)
+            if _matches(job, params):
+                yield job
 
-    def get_job_results(self):
+    def get_job_results(self, project=None, name=None, status=None, since=None, until=None,
+                        page_size=100):
         """
         Get a list of the job results from Bandit
 
+        Parameters
+        ==========
+        project: str
+            only get results for jobs in this project
+        name: str
+            only get results for jobs with this name
+        status: str
+            only get results with this status (i.e. "success", "failed")
+        since: datetime
+            only get results from jobs that started at or after this time
+        until: datetime
+            only get results from jobs that started before this time
+        page_size: int
+            number of results to fetch per request
+
         Examples
         ========
         >>> bandit = Bandit()
         >>> bandit.get_job_results()
+        >>> bandit.get_job_results(project="myproject", status="failed")
         """
         if self._is_local==True:
             print('/api/job-results')
             return
 
-        url = urlparse.urljoin(self.url, "/api/job-results")
-        r = requests.get(url, params={'format': 'json'}, auth=(self.username, self.apikey))
-        job_results = r.json()['jobResults']
-        return [JobResult(**j) for j in job_results]
+        return list(self.iter_job_results(project=project, name=name, status=status,
+                                          since=since, until=until, page_size=page_size))
 
-    def stream(self, tag_name, y):
+    def iter_job_results(self, project=None, name=None, status=None, since=None, until=None,
+                         page_size=100):
+        """
+        Lazily iterate over job results from Bandit, fetching `page_size`
+        results at a time. Filtering happens on the server, so only the results
+        you asked for get downloaded. Takes the same arguments as `get_job_results`.
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> for result in bandit.iter_job_results(status="failed", since=datetime(2017, 1, 1)):
+        ...     print(result)
+        """
+        if self._is_local==True:
+            print('/api/job-results')
+            return
+
+        params = _filters(project=project, name=name, status=status, since=since, until=until)
+        for j in self._paginate('/api/job-results', 'jobResults', params, page_size):
+            result = JobResult(**j)
+            if _matches(result, params):
+                yield result
+
+    def _paginate(self, path, key, params, page_size):
+        """
+        yield every row of a paginated list endpoint. follows the server's cursor
+        if it hands one back, otherwise pages with limit/offset
+        """
+        params = dict(params, format='json', limit=page_size)
+        offset = 0
+        first_row = None
+        while True:
+            r = self._request('GET', path, params=params)
+            r.raise_for_status()
+            data = r.json()
+            rows = data[key]
+            # ...or ignores the offset and keeps sending the first page
+            if offset and rows and rows[0]==first_row:
+                return
+            first_row = rows[0] if rows else None
+            for row in rows:
+                yield row
+
+            # a server that doesn't know about paging sends everything at once
+            if len(rows) > page_size:
+                return
+            if data.get('nextCursor'):
+                params['cursor'] = data['nextCursor']
+            elif len(rows) < page_size or 'nextCursor' in data:
+                return
+            else:
+                offset += len(rows)
+                params['offset'] = offset
+
+    def _recent_job_results(self, since):
+        return list(self.iter_job_results(since=since))
+
+    def stream(self, tag_name, y, x=None):
         """
         Parameters
         ==========
         tag_name: str
             tag for the data point
-        x: int, float
-            x value for the data point
         y: int, float
             y value for the data point
+        x: int, float
+            x value for the data point. defaults to the tag's next step
 
         Examples
         ========
@@ -144,18 +440,20 @@ class Bandit(object):
         >>> bandit.stream("thing", 20)
         >>> bandit.stream("thing", 30)
         """
-        return self.report(tag_name, y)
+        return self.report(tag_name, y, x)
 
-    def report(self, tag_name, y):
+    @instrument.timed('report')
+    def report(self, tag_name, y, x=None):
         """
         Parameters
         ==========
         tag_name: str
             tag for the data point
-        x: int, float
-            x value for the data point
         y: int, float
             y value for the data point
+        x: int, float
+            x value for the data point. defaults to the tag's next step, so the
+            first point for a tag is at x=0, the next at x=1, and so on
 
         Examples
         ========
@@ -167,25 +465,325 @@ class Bandit(object):
 
         if _is_numeric(y)==False:
             raise Exception("`y` parameter is not a number '{}'".format(y))
+        if x is not None and _is_numeric(x)==False:
+            raise Exception("`x` parameter is not a number '{}'".format(x))
+
+        tag_name = tag_name.replace(' ', '-')
+        if x is None:
+            x = self._next_steps(tag_name, 1)[0]
+
+        if self._aggregator is not None:
+            return self._aggregator.add(tag_name, x, y)
+
+        # the point gets encoded exactly once; the same line goes to charts.ndjson
+        # and to the server
+        return self._dispatch([json_dumps(dict(tag_name=tag_name, x=x, y=y))])
+
+    @instrument.timed('report_many')
+    def report_many(self, tag_name, ys, xs=None):
+        """
+        Report a whole series of data points for a tag at once. Points are sent
+        to Bandit in a single request (or handed to the aggregator/reporter in
+        one go) instead of one request per point.
+
+        Parameters
+        ==========
+        tag_name: str
+            tag for the data points
+        ys: list, numpy array, pandas Series
+            y values for the data points
+        xs: list, numpy array, pandas Series
+            x values for the data points. defaults to the tag's next len(ys) steps
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.report_many("loss", np.array([0.9, 0.5, 0.3, 0.25]))
+        >>> bandit.report_many("lr", [0.1, 0.01], xs=[0, 1000])
+        """
+        ys = _to_numbers(ys, 'ys')
+        tag_name = tag_name.replace(' ', '-')
+        if xs is None:
+            xs = self._next_steps(tag_name, len(ys))
+        else:
+            xs = _to_numbers(xs, 'xs')
+            if len(xs)!=len(ys):
+                raise Exception("xs and ys have different lengths (%d and %d)" % (len(xs), len(ys)))
 
-        data = dict(tag_name=tag_name.replace(' ', '-'), x=0, y=y)
-        data = json.loads(json_dumps(data))
+        if self._aggregator is not None:
+            return self._aggregator.extend(tag_name, xs, ys)
 
+        return self._dispatch([json_dumps(dict(tag_name=tag_name, x=x, y=y)) for x, y in zip(xs, ys)])
+
+    def _next_steps(self, tag_name, n):
+        "claim the next `n` auto-incrementing x values for a tag"
+        with self._steps_lock:
+            start = self._steps.get(tag_name, 0)
+            self._steps[tag_name] = start + n
+        return list(range(start, start + n))
+
+    def _dispatch(self, lines):
+        """
+        send JSON encoded data points to Bandit, through the reporter if there
+        is one. off of a Bandit worker they're just printed
+        """
         # this is detecting whether or not this is being run on a bandit worker.
         # if we're not on a bandit worker, just do a "dry run"
         job_id = os.environ.get('BANDIT_JOB_ID')
         if not job_id or self._is_local==True:
-            print(json_dumps(data))
+            for line in lines:
+                print(line)
             return { "status": "OK", "message": "DRY RUN" }
 
-        # write/append to the charts.ndjson file that will be inside the container
-        with open('/job/metadata/charts.ndjson', 'ab') as f:
-            f.write(json_dumps(data) + '\n')
+        if not lines:
+            return { "status": "OK" }
+
+        if self._reporter is not None:
+            for line in lines:
+                result = self._reporter.add(line)
+            return result
+
+        self._write_charts(lines)
+        if len(lines) > 1:
+            return self._send_reports(lines)
+
+        return self._send_report(lines[0])
+
+    def aggregate_reports(self, interval=5.0, max_points=100, method="lttb"):
+        """
+        Downsample data points from `report` and `report_many` on the client.
+        Points are collected per tag for `interval` seconds, then cut down to at
+        most `max_points` before being sent. Can be combined with
+        `buffer_reports` or `background_reports`.
+
+        Parameters
+        ==========
+        interval: float
+            number of seconds of points to collect before downsampling
+        max_points: int
+            max number of points sent per tag per interval
+        method: str
+            "lttb", "reservoir", or a per-bucket summary: "mean", "min", "max",
+            "last", "count"
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.aggregate_reports(interval=10, max_points=500)
+        >>> for batch in batches:
+        ...     bandit.report("loss", train(batch))
+        """
+        if self._aggregator is not None:
+            self._aggregator.close()
+        self._aggregator = Aggregator(self, interval=interval, max_points=max_points, method=method)
+        return self._aggregator
+
+    def buffer_reports(self, flush_size=100, flush_interval=5.0, max_buffer=10000):
+        """
+        Collect data points from `report` and `stream` in memory and send them to
+        Bandit in batches rather than one HTTP request per point. Whatever is left
+        in the buffer gets sent when your job exits.
+
+        Parameters
+        ==========
+        flush_size: int
+            number of points to collect before sending them
+        flush_interval: float
+            max number of seconds between sends
+        max_buffer: int
+            max number of points to hold in memory
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.buffer_reports(flush_size=500, flush_interval=10)
+        >>> for i in range(10000):
+        ...     bandit.report("thing", i)
+        """
+        return self._set_reporter(BufferedReporter(self, flush_size=flush_size,
+                                                   flush_interval=flush_interval,
+                                                   max_buffer=max_buffer))
+
+    def background_reports(self, max_queue=10000, policy="drop-oldest", batch_size=100,
+                           flush_interval=1.0, spill_path=None):
+        """
+        Send data points from `report` and `stream` on a background thread so a
+        slow Bandit server never holds up your job. Points are put on a bounded
+        queue; `policy` controls what happens when it fills up.
+
+        Parameters
+        ==========
+        max_queue: int
+            max number of points held in memory
+        policy: str
+            "drop-oldest", "block", or "spill" (write overflow to disk)
+        batch_size: int
+            max number of points sent per request
+        flush_interval: float
+            max number of seconds a point waits before being sent
+        spill_path: str
+            file used by the "spill" policy. defaults to a temporary file
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.background_reports(policy="block")
+        >>> bandit.report("thing", 10)
+        >>> bandit.report_stats()
+        """
+        return self._set_reporter(BackgroundReporter(self, max_queue=max_queue, policy=policy,
+                                                     batch_size=batch_size,
+                                                     flush_interval=flush_interval,
+                                                     spill_path=spill_path))
+
+    def stats(self):
+        """
+        Timings and counters for the client's own work (reports, metadata and
+        email writes, dashboards, HTTP requests and retries). Collection is off
+        unless $BANDIT_INSTRUMENT is set or `bandit.instrument.enable()` was
+        called.
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.stats()['operations']['report']['mean']
+        0.00012
+        """
+        return instrument.stats()
+
+    def report_stats(self):
+        """
+        Get counters for the data points that have gone through the buffered or
+        background reporter. Returns None if points are being sent directly.
+        """
+        if self._reporter is not None:
+            return self._reporter.stats()
+
+    def _set_reporter(self, reporter):
+        if self._reporter is not None:
+            self._reporter.close()
+        self._reporter = reporter
+        if self._aggregator is not None:
+            # exit handlers run last in, first out. make sure the aggregator
+            # hands over its points before the new reporter shuts down
+            atexit.unregister(self._aggregator.close)
+            atexit.register(self._aggregator.close)
+        return reporter
+
+    def flush_reports(self):
+        """
+        Send any data points that are being buffered to Bandit.
+        """
+        if self._aggregator is not None:
+            self._aggregator.flush()
+        if self._reporter is not None:
+            self._reporter.flush()
+
+    @instrument.timed('http')
+    def _request(self, method, path, **kwargs):
+        "make an authenticated request to the Bandit server over the pooled session"
+        url = urljoin(self.url, path)
+        kwargs.setdefault('auth', (self.username, self.apikey))
+        kwargs.setdefault('timeout', self.timeout)
+        r = self.session.request(method, url, **kwargs)
+        if instrument.is_enabled():
+            # urllib3 retries connection errors and 5xx's before we see the response
+            retries = getattr(r.raw, 'retries', None)
+            instrument.add('http.requests')
+            instrument.add('http.retries', len(getattr(retries, 'history', None) or ()))
+            instrument.add('http.bytes_sent', len(kwargs.get('data') or ''))
+            instrument.add('http.bytes_received', len(r.content))
+        return r
+
+    def binary_charts(self, path=None):
+        """
+        Keep the data points you report in a compact binary log instead of
+        charts.ndjson. Points are still sent to Bandit as usual. See
+        `bandit.metrics` for reading the log and converting it to ndjson.
+
+        Parameters
+        ==========
+        path: str
+            where to put the log. defaults to charts.bin next to charts.ndjson
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> bandit.binary_charts()
+        >>> bandit.report("loss", 0.25)
+        """
+        if self._charts_log is not None:
+            self._charts_log.close()
+        self._charts_log = MetricsLog(path or job_path('metadata', 'charts.bin'))
+        return self._charts_log
+
+    def artifacts(self, upload=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=4):
+        """
+        Write big files (models, exports) to the output directory through a
+        streaming writer that checksums them, and optionally upload them to
+        Bandit in parallel chunks while the job is still running. See
+        `bandit.artifacts`.
+
+        Parameters
+        ==========
+        upload: bool
+            upload artifacts as they're written
+        chunk_size: int
+            size of each part of an upload, in bytes
+        workers: int
+            max number of parts being uploaded at once
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> artifacts = bandit.artifacts(upload=True)
+        >>> with artifacts.open("model.pkl") as f:
+        ...     pickle.dump(model, f)
+        >>> artifacts.wait()
+        """
+        if self._artifacts is not None:
+            self._artifacts.close()
+        self._artifacts = ArtifactStore(self, self.output_dir, upload=upload, chunk_size=chunk_size,
+                                        workers=workers)
+        return self._artifacts
+
+    def _write_charts(self, lines):
+        "write/append JSON encoded data points to the charts.ndjson file that will be inside the container"
+        if self._charts_log is not None:
+            self._charts_log.append_lines(lines)
+            instrument.add('file_writes')
+            return
+        n_bytes = append(job_path('metadata', 'charts.ndjson'), ''.join(line + '\n' for line in lines))
+        instrument.add('file_writes')
+        instrument.add('charts.bytes', n_bytes)
 
-        url = urlparse.urljoin(self.url, '/'.join(['api', 'jobs', job_id, 'report']))
-        r = requests.put(url, json=data, auth=(self.username, self.apikey))
+    def _send_report(self, line):
+        "send one JSON encoded data point to the per-point report endpoint"
+        job_id = os.environ.get('BANDIT_JOB_ID')
+        r = self._request('PUT', '/'.join(['api', 'jobs', job_id, 'report']), data=line.encode('utf-8'),
+                          headers={'Content-Type': 'application/json'})
         return r.json()
 
+    def _send_reports(self, lines):
+        """
+        send a batch of JSON encoded data points in one request, as a JSON array
+        PUT to api/jobs/<id>/reports. Bandit servers that predate the bulk
+        endpoint answer with a 404 (or 405); from then on the points are sent
+        one at a time to api/jobs/<id>/report instead
+        """
+        if self._bulk_reports:
+            job_id = os.environ.get('BANDIT_JOB_ID')
+            r = self._request('PUT', '/'.join(['api', 'jobs', job_id, 'reports']),
+                              data=('[' + ','.join(lines) + ']').encode('utf-8'),
+                              headers={'Content-Type': 'application/json'})
+            if r.status_code not in (404, 405):
+                r.raise_for_status()
+                return r.json()
+            self._bulk_reports = False
+        for line in lines:
+            result = self._send_report(line)
+        return result
+
     def get_connection(self, name):
         """
         Get a database connection string that's saved on Bandit
@@ -203,7 +801,32 @@ class Bandit(object):
         """
         return os.environ.get('DATABASE_' + name)
 
-    def make_dashboard(self, name, template_name="raw-html", **kwargs):
+    def db(self, name, pool_size=None, recycle=None):
+        """
+        Get a pooled connection to a database that's saved on Bandit. The pool
+        is created the first time you ask for it and shared by the whole process.
+
+        Parameters
+        ==========
+        name: str
+            name of the database connection
+        pool_size: int
+            max number of connections open at once. defaults to 5. only used
+            when the pool is created
+        recycle: float
+            number of seconds after which a connection is replaced. defaults to
+            3600. only used when the pool is created
+
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> df = bandit.db('postgres-dw').read_sql("select * from users")
+        """
+        return database.db(name, pool_size=pool_size, recycle=recycle)
+
+    @instrument.timed('make_dashboard')
+    def make_dashboard(self, name, template_name="raw-html", stream=False, max_rows=None,
+                       page_size=None, assets=None, stylesheet=None, max_image_size=None, **kwargs):
         """
         Construct an HTML dashboard from Python objects. You can use one of the pre-defined
         templates (see dashboards/) or create your own!
@@ -212,6 +835,24 @@ class Bandit(object):
         ==========
         template_name: str
             name of the template
+        stream: bool
+            write DataFrames to the dashboard a chunk of rows at a time rather
+            than building the whole page in memory. use this for big tables
+        max_rows: int
+            only include the first `max_rows` rows of each DataFrame
+        page_size: int
+            put `page_size` rows of each DataFrame in the dashboard and the rest
+            on linked pages next to it. implies `stream`
+        assets: str
+            make the dashboard self-contained. "copy" copies the local images and
+            stylesheets it uses into an assets/ folder in the output directory
+            (named by content, so they're only stored once), "inline" embeds them
+            in the page
+        stylesheet: str
+            local CSS file to use instead of the bootstrap stylesheet the built-in
+            templates load from the internet. only used with `assets`
+        max_image_size: tuple
+            (width, height) to shrink bigger images down to. only used with `assets`
         kwargs:
             variables you'd like to put into your template
 
@@ -219,44 +860,207 @@ class Bandit(object):
         ========
         >>> from ggplot import mtcars
         >>> bandit = Bandit()
-        >>> print bandit.make_dashboard("my dashboard", table=mtcars.to_html(classes="table"))
-        >>> print bandit.make_dashboard("my dashboard", table=mtcars)
+        >>> print(bandit.make_dashboard("my dashboard", table=mtcars.to_html(classes="table")))
+        >>> print(bandit.make_dashboard("my dashboard", table=mtcars))
         >>> bandit.make_dashboard("my dashboard", template_name='many-tables', tables=[mtcars.head().to_html(classes='table'), mtcars.tail().to_html(classes='table')])
+        >>> bandit.make_dashboard("big table", table=huge_df, page_size=1000)
+        >>> bandit.make_dashboard("plots", template_name='image-with-tables', img='/tmp/plot.png', assets='copy')
         """
-        variables = {}
-        for key, value in kwargs.items():
-            if isinstance(value, DataFrame):
-                value = value.to_html(classes='table table-bordered')
-            variables[key] = value
+        return _render_dashboard(self.output_dir, self._is_local, name, template_name=template_name,
+                                 stream=stream, max_rows=max_rows, page_size=page_size, assets=assets,
+                                 stylesheet=stylesheet, max_image_size=max_image_size, **kwargs)
 
-        compiler = pybars.Compiler()
+    @instrument.timed('make_dashboards')
+    def make_dashboards(self, specs, workers=None):
+        """
+        Render a bunch of dashboards at once with a pool of processes. Each
+        dashboard is described by a dict of the arguments you'd pass to
+        `make_dashboard`. DataFrames are turned into HTML in the worker
+        processes, and templates are compiled once up front and shared with
+        the workers. A dashboard that fails doesn't stop the others.
 
-        if os.path.exists(template_name):
-            template_file = template_name
-        else:
-            this_dir = os.path.dirname(os.path.realpath(__file__))
-            template_file = os.path.join(this_dir, 'dashboards', template_name + '.html')
-            if not os.path.exists(template_file):
-                raise Exception("Could not file template file: " + template_file)
+        Parameters
+        ==========
+        specs: list
+            list of dicts with a `name`, any of the other `make_dashboard`
+            arguments, and the variables for the template
+        workers: int
+            number of processes to use. defaults to the number of CPUs
 
-        template_string = open(template_file, 'rb').read()
-        template_string = _to_unicode(template_string)
-        template = compiler.compile(template_string)
-        html = template(variables)
+        Returns
+        =======
+        list of dicts, one per spec, with the dashboard's `name`, the number of
+        `seconds` it took to render, and the `error` if it failed (None otherwise)
 
-        if self._is_local==True:
-            print(html)
-            return
+        Examples
+        ========
+        >>> bandit = Bandit()
+        >>> specs = [dict(name=segment + ".html", template_name="single-table", table=df)
+        ...          for segment, df in sales.groupby("segment")]
+        >>> for result in bandit.make_dashboards(specs, workers=4):
+        ...     if result['error']:
+        ...         print(result['name'], result['error'])
+        """
+        template_names = sorted(set(spec.get('template_name', 'raw-html') for spec in specs))
+        # compile templates before forking so the workers start out with them.
+        # they get compiled again in the worker if the pool spawns new
+        # interpreters instead of forking
+        precompiled = []
+        for template_name in template_names:
+            try:
+                get_template(template_name)
+                precompiled.append(template_name)
+            except Exception:
+                # this'll be reported for the dashboards that use it
+                pass
+
+        jobs = [(self.output_dir, self._is_local, spec) for spec in specs]
+        if workers==1:
+            return [_render_dashboard_job(job) for job in jobs]
+
+        import multiprocessing
+        pool = multiprocessing.Pool(workers, initializer=precompile, initargs=(precompiled, ))
+        try:
+            return pool.map(_render_dashboard_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+def _render_dashboard(output_dir, is_local, name, template_name="raw-html", stream=False,
+                      max_rows=None, page_size=None, assets=None, stylesheet=None,
+                      max_image_size=None, **kwargs):
+    "does the work for `Bandit.make_dashboard`"
+    if assets is not None:
+        store = AssetStore(output_dir, mode=assets, max_image_size=max_image_size)
+        replace = {BOOTSTRAP_URL: stylesheet} if stylesheet else None
+        bundle = lambda html: store.rewrite(html, replace=replace)
+    else:
+        bundle = lambda html: html
+
+    if stream or page_size is not None:
+        return _stream_dashboard(output_dir, is_local, name, template_name, max_rows, page_size,
+                                 bundle, kwargs)
+
+    variables = {}
+    for key, value in kwargs.items():
+        if _is_dataframe(value):
+            if max_rows is not None:
+                value = value.head(max_rows)
+            value = value.to_html(classes=tables.TABLE_CLASSES)
+        variables[key] = value
+
+    template = get_template(template_name)
+    html = bundle(template(variables))
+
+    if is_local==True:
+        print(html)
+        return
+
+    with open(output_dir + name, 'wb') as f:
+        f.write(html.encode('utf-8'))
+
+def _stream_dashboard(output_dir, is_local, name, template_name, max_rows, page_size, bundle, kwargs):
+    """
+    render the template with a placeholder in place of each DataFrame, then
+    write the page out piece by piece, streaming the tables in between
+    """
+    marker = 'bandit-table-' + uuid.uuid4().hex
+    frames = {}
+    variables = {}
+    for key, value in kwargs.items():
+        if _is_dataframe(value):
+            placeholder = '%s-%d-' % (marker, len(frames))
+            frames[placeholder] = (key, value)
+            value = placeholder
+        variables[key] = value
 
-        with open(self.output_dir + name, 'wb') as f:
-            f.write(html)
+    html = bundle(get_template(template_name)(variables))
 
-def _to_unicode(s):
-    "python2/3 compatible unicoder"
+    if is_local==True:
+        # notebooks and redirect_stdout give us text streams with no .buffer
+        f = sys.stdout
+    else:
+        f = open(output_dir + name, 'wb')
     try:
-        return unicode(s)
-    except Exception as e:
-        return str(text, 'utf-8')
+        for piece in re.split('(%s-[0-9]+-)' % marker, html):
+            if piece not in frames:
+                tables.write(f, piece)
+                continue
+            key, df = frames[piece]
+            if page_size is None:
+                tables.write_table(f, df, max_rows=max_rows)
+            elif is_local==True:
+                # the other pages would have nowhere to live that the printed
+                # page could link to, so just show the first one
+                rows = page_size if max_rows is None else min(page_size, max_rows)
+                tables.write_table(f, df, max_rows=rows)
+            else:
+                if max_rows is not None:
+                    df = df.head(max_rows)
+                prefix = os.path.splitext(name)[0] + '-' + key
+                tables.write_paged_table(f, df, output_dir, name, prefix, page_size, bundle=bundle)
+    finally:
+        if is_local==True:
+            f.flush()
+        else:
+            f.close()
+
+def _render_dashboard_job(job):
+    "render one dashboard for `Bandit.make_dashboards`. runs in a worker process"
+    output_dir, is_local, spec = job
+    spec = dict(spec)
+    name = spec.pop('name')
+    start = time.perf_counter()
+    try:
+        _render_dashboard(output_dir, is_local, name, **spec)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return {'name': name, 'seconds': time.perf_counter() - start, 'error': error}
+
+def _filters(**kwargs):
+    "query parameters for the filters that were actually given"
+    params = {}
+    for key, value in kwargs.items():
+        if value is None:
+            continue
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        params[key] = value
+    return params
+
+def _matches(obj, params):
+    """
+    double check a row against the filters we sent the server. not every server
+    supports filtering, and rows that don't have a field can't be ruled out
+    """
+    for key in ('project', 'name', 'status'):
+        if key in params and getattr(obj, key, params[key])!=params[key]:
+            return False
+    return True
+
+def _runs_of(results, project, name):
+    "job results that belong to the job `project/name`"
+    return [r for r in results if r.name==name and getattr(r, 'project', project)==project]
+
+def _to_numbers(values, name):
+    "turn a list/array/Series of numbers into a list, making sure they're all numbers"
+    dtype = getattr(values, 'dtype', None)
+    if dtype is not None and getattr(dtype, 'kind', None) in ('i', 'u', 'f'):
+        # numeric numpy arrays and pandas Series don't need checking one by one
+        return values.tolist()
+    values = list(values)
+    for value in values:
+        if _is_numeric(value)==False:
+            raise Exception("`{}` contains a value that is not a number '{}'".format(name, value))
+    return values
+
+
+def _is_dataframe(value):
+    "pandas is slow to import, so we don't. if the job hasn't imported it, value can't be a DataFrame"
+    pandas = sys.modules.get('pandas')
+    return pandas is not None and isinstance(value, pandas.DataFrame)
+
 
 def _is_numeric(x):
     try:
@@ -0,0 +1,195 @@
+from .models import JobResult
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_results (
+    key TEXT PRIMARY KEY,
+    project TEXT,
+    name TEXT,
+    n INTEGER,
+    status TEXT,
+    started TEXT,
+    fetched_at REAL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS job_results_job ON job_results (project, name, n);
+CREATE INDEX IF NOT EXISTS job_results_status ON job_results (status);
+CREATE INDEX IF NOT EXISTS job_results_started ON job_results (started);
+CREATE TABLE IF NOT EXISTS sync (
+    id INTEGER PRIMARY KEY,
+    synced_at REAL
+);
+"""
+
+# job results in these states can still change, so we keep re-fetching them
+_UNFINISHED_STATUSES = ('pending', 'queued', 'starting', 'running')
+
+
+class JobResultCache(object):
+    """
+    Local SQLite copy of your job results. The first `sync` downloads
+    everything; after that only results that are newer than the newest one in
+    the cache (or that were still running last time) are fetched. Queries are
+    answered from the local index.
+
+    Parameters
+    ==========
+    bandit: Bandit
+        the client used to talk to Bandit
+    cache_dir: str
+        directory the cache lives in. defaults to $BANDIT_CACHE_DIR or ~/.bandit
+    ttl: float
+        number of seconds a result is kept after it was last fetched. results are
+        kept forever if None
+    max_rows: int
+        max number of results to keep. the oldest ones are evicted first
+    refresh_interval: float
+        `query` syncs with Bandit first if the last sync is older than this
+    time_field: str
+        the job result field holding the time the job started
+
+    Examples
+    ========
+    >>> bandit = Bandit()
+    >>> cache = JobResultCache(bandit, refresh_interval=60)
+    >>> cache.query(project="myproject", status="failed")
+    """
+    def __init__(self, bandit, cache_dir=None, ttl=None, max_rows=100000, refresh_interval=60,
+                 time_field='startTime'):
+        if cache_dir is None:
+            cache_dir = os.environ.get('BANDIT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.bandit'))
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+        self.bandit = bandit
+        self.path = os.path.join(cache_dir, 'job-results.db')
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.refresh_interval = refresh_interval
+        self.time_field = time_field
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def sync(self):
+        """
+        Fetch new and unfinished job results from Bandit into the cache.
+
+        Returns
+        =======
+        the number of results that were fetched
+        """
+        with self._lock:
+            since = self._sync_point()
+            now = time.time()
+            rows = []
+            for result in self.bandit.iter_job_results(since=since):
+                data = result.data
+                rows.append((
+                    _result_key(data),
+                    data.get('project'),
+                    data.get('name'),
+                    data.get('n'),
+                    data.get('status'),
+                    data.get(self.time_field),
+                    now,
+                    json.dumps(data)
+                ))
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.execute("INSERT OR REPLACE INTO sync VALUES (1, ?)", (now, ))
+                self._evict(now)
+            return len(rows)
+
+    def query(self, project=None, name=None, status=None, since=None, until=None, refresh=True):
+        """
+        Get job results from the cache.
+
+        Parameters
+        ==========
+        project: str
+            only get results for jobs in this project
+        name: str
+            only get results for jobs with this name
+        status: str
+            only get results with this status
+        since: datetime
+            only get results from jobs that started at or after this time
+        until: datetime
+            only get results from jobs that started before this time
+        refresh: bool
+            sync with Bandit first if the cache is older than `refresh_interval`
+        """
+        if refresh and self.age() >= self.refresh_interval:
+            self.sync()
+
+        where, args = [], []
+        for column, op, value in [('project', '=', project), ('name', '=', name), ('status', '=', status),
+                                  ('started', '>=', since), ('started', '<', until)]:
+            if value is None:
+                continue
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            where.append("%s %s ?" % (column, op))
+            args.append(value)
+
+        sql = "SELECT data FROM job_results"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY started, n"
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [JobResult(**json.loads(data)) for data, in rows]
+
+    def age(self):
+        "number of seconds since the last sync"
+        with self._lock:
+            row = self._db.execute("SELECT synced_at FROM sync WHERE id=1").fetchone()
+        if row is None:
+            return float('inf')
+        return time.time() - row[0]
+
+    def clear(self):
+        "throw away everything in the cache"
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM job_results")
+            self._db.execute("DELETE FROM sync")
+
+    def close(self):
+        self._db.close()
+
+    def _sync_point(self):
+        """
+        the start time to sync from: the oldest result that hadn't finished last
+        time, otherwise the newest result we have. None means fetch everything
+        """
+        if self._db.execute("SELECT 1 FROM job_results WHERE started IS NULL LIMIT 1").fetchone():
+            # no way to tell what's new without timestamps
+            return None
+        marks = ",".join("?" * len(_UNFINISHED_STATUSES))
+        row = self._db.execute("SELECT MIN(started) FROM job_results WHERE status IN (%s)" % marks,
+                               _UNFINISHED_STATUSES).fetchone()
+        if row[0] is None:
+            row = self._db.execute("SELECT MAX(started) FROM job_results").fetchone()
+        return row[0]
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM job_results WHERE fetched_at < ?", (now - self.ttl, ))
+        if self.max_rows is not None:
+            self._db.execute("""
+                DELETE FROM job_results WHERE key IN (
+                    SELECT key FROM job_results ORDER BY started DESC, n DESC LIMIT -1 OFFSET ?
+                )""", (self.max_rows, ))
+
+
+def _result_key(data):
+    "job results are identified by their id, or failing that project/name/n"
+    if data.get('id') is not None:
+        return str(data['id'])
+    return "%s/%s/%s" % (data.get('project'), data.get('name'), data.get('n'))
@@ -1,20 +1,58 @@
 from .yhat_json import json_dumps
+from .files import atomic_write, job_path
+from . import instrument
+import atexit
 import mimetypes
 import base64
+import gzip
+import shutil
+import tempfile
+import threading
+import uuid
 import warnings
-from exceptions import UserWarning
+import weakref
+import zipfile
 import sys
 import os
 
+# max size of an attachment, in bytes (after compression)
+MAX_ATTACHMENT_SIZE = 1000000
+
+# read/encode attachments this many bytes at a time. has to be a multiple of 3
+# so the base64 of each chunk can just be concatenated
+_CHUNK_SIZE = 3 * 256 * 1024
+
+_COMPRESSED_EXTENSIONS = {"gzip": ".gz", "zip": ".zip"}
+_COMPRESSED_TYPES = {"gzip": "application/gzip", "zip": "application/zip"}
+
 _DEFAULT_BODY = """Your job has completed. This is the default message. You can
 customize this message by creating an email object: `from bandit import Email` and `email.body(html or string)`
 function and passing it stringified HTML or a plaintext string.""".replace("\n", " ")
 _DEFAULT_BODY += "\n\nCheers!\n~Team Bandit"
 
+# emails that still need flushing when the job exits. weak so that emails you
+# are done with can be garbage collected. call `send` or `flush` on those
+_live = weakref.WeakSet()
+
+def _flush_all():
+    for email in list(_live):
+        email.flush()
+
+atexit.register(_flush_all)
+
 class Email(object):
     """
     Use the Email objects to programatically send e-mail alerts with Bandit.
+
+    Nothing gets written until you call `send` or `flush` (or the job exits),
+    so building up an email with lots of attachments only serializes it once.
+    Each Email gets its own file: the first one in a job is email.json, the
+    next one email-2.json, and so on.
     """
+    # number of emails created in this process that write JSON
+    _count = 0
+    _count_lock = threading.Lock()
+
     def __init__(self, recipients=[], subject="", body="", write_json=True):
         if isinstance(recipients, str):
             recipients = [recipients]
@@ -26,7 +64,13 @@ class Email(object):
         self._body = body if body else _DEFAULT_BODY
         self._attachments = [] # attachments
         self.write_json = write_json
-        self._write()
+        self._dirty = True
+        if write_json:
+            with Email._count_lock:
+                Email._count += 1
+                n = Email._count
+            self._filename = 'email.json' if n==1 else 'email-%d.json' % n
+            _live.add(self)
 
     def _to_dict(self):
         "private method for dictifying an Email"
@@ -38,6 +82,7 @@ class Email(object):
             "isHTML": True
         }
 
+    @instrument.timed('email_write')
     def _write(self):
         """
         Emails get written to a JSON file by default. This is then picked up by
@@ -46,10 +91,22 @@ class Email(object):
         if self.write_json==False:
             return self._to_dict()
 
-        data = json_dumps(self._to_dict())
-        if os.path.exists('/job/metadata'):
-            with open('/job/metadata/email.json', 'wb') as f:
-                f.write(data)
+        self._dirty = False
+        metadata_dir = job_path('metadata')
+        if os.path.exists(metadata_dir):
+            data = json_dumps(self._to_dict())
+            atomic_write(os.path.join(metadata_dir, self._filename), data)
+            instrument.add('file_writes')
+            instrument.add('email.bytes', len(data))
+
+    def flush(self):
+        """
+        Write the email out for the Bandit job runner if it has changed since it
+        was last written. This happens automatically when you call `send` and
+        when your job exits.
+        """
+        if self._dirty:
+            return self._write()
 
     def __str__(self):
         """
@@ -91,7 +148,7 @@ class Email(object):
             the subject line of your email
         """
         self._subject = string
-        self._write()
+        self._dirty = True
 
     def body(self, html_or_string):
         """
@@ -103,9 +160,9 @@ class Email(object):
             the body of your email. this can be either HTML or plaintext
         """
         self._body = html_or_string
-        self._write()
+        self._dirty = True
 
-    def add_attachment(self, filepath, filetype=None):
+    def add_attachment(self, filepath, filetype=None, compress=None):
         """
         Add an attachment to your email
 
@@ -113,24 +170,54 @@ class Email(object):
         ==========
         filepath: str
             path to the file you'd like to attach
+        filetype: str
+            mimetype of the file. guessed from the file name if None
+        compress: str
+            "gzip" or "zip" to compress the file before attaching it, or "auto"
+            to gzip it only if it's too big to attach as is. handy for large
+            CSV reports
+
+        The file is base64 encoded into a sidecar file in the job's
+        metadata/attachments/ directory. email.json points to it with a path
+        relative to the metadata directory, i.e. attachments/1a2b3c4d-report.csv,
+        so it resolves wherever the runner has the job's directory mounted.
         """
+        if compress not in (None, "gzip", "zip", "auto"):
+            raise Exception("compress must be one of: gzip, zip, auto")
 
         if filetype is None:
             filetype, _ = mimetypes.guess_type(filepath)
 
-        with open(filepath, 'rb') as f:
-            content = f.read()
-            n_bytes = sys.getsizeof(content)
-            if n_bytes > 1000000:
+        n_bytes = os.path.getsize(filepath)
+        if compress=="auto":
+            compress = "gzip" if n_bytes > MAX_ATTACHMENT_SIZE else None
+
+        name = os.path.basename(filepath)
+        source = filepath
+        if compress is not None:
+            source = _compress(filepath, compress)
+            name, filetype = name + _COMPRESSED_EXTENSIONS[compress], _COMPRESSED_TYPES[compress]
+            n_bytes = os.path.getsize(source)
+
+        try:
+            if n_bytes > MAX_ATTACHMENT_SIZE:
                 sys.stderr.write("Attachment is too large! %s is %d bytes\n" % (filepath, n_bytes))
                 return
-            attachment = {
-                "type": filetype,
-                "name": os.path.basename(filepath),
-                "content": base64.encodestring(content)
-            }
-            self._attachments.append(attachment)
-            self._write()
+            sidecar = "%s-%s.b64" % (uuid.uuid4().hex[:8], name)
+            _base64_file(source, os.path.join(_attachment_dir(), sidecar))
+        finally:
+            if source!=filepath:
+                os.remove(source)
+
+        attachment = {
+            "type": filetype,
+            "name": name,
+            "size": n_bytes,
+            "encoding": "base64",
+            "path": "attachments/" + sidecar
+        }
+        self._attachments.append(attachment)
+        self._dirty = True
 
     def send(self, to):
         """
@@ -145,10 +232,67 @@ class Email(object):
             warnings.warn("the recipients you passed to the `send` method were formatted as a string. Bandit will split into individual emails using a comma. Please consider using a list instead!", UserWarning)
             to = to.split(',')
         self._recipients = to
-        self._write()
+        self._dirty = True
+        self.flush()
+
+
+_local_metadata_dir = None
+
+def _metadata_dir():
+    """
+    The directory email.json and its attachments go in. When we're not on a
+    Bandit worker it's a temp dir laid out the same way.
+    """
+    global _local_metadata_dir
+    metadata_dir = job_path('metadata')
+    if os.path.exists(metadata_dir):
+        return metadata_dir
+    if _local_metadata_dir is None:
+        _local_metadata_dir = tempfile.mkdtemp(prefix='tmp-bandit-metadata-')
+    return _local_metadata_dir
+
+def _attachment_dir():
+    """
+    Attachments are written to metadata/attachments/ as base64 sidecar files
+    that email.json points to.
+    """
+    path = os.path.join(_metadata_dir(), 'attachments')
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+def _base64_file(src, dest):
+    "base64 encode the file at `src` into `dest` without reading all of it into memory"
+    with open(src, 'rb') as fin, open(dest, 'wb') as fout:
+        while True:
+            chunk = fin.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            fout.write(base64.b64encode(chunk))
+
+def _compress(filepath, method):
+    "compress `filepath` into a temp file and return its path"
+    fd, path = tempfile.mkstemp(suffix=_COMPRESSED_EXTENSIONS[method])
+    os.close(fd)
+    try:
+        if method=="gzip":
+            with open(filepath, 'rb') as fin:
+                fout = gzip.open(path, 'wb')
+                try:
+                    shutil.copyfileobj(fin, fout, _CHUNK_SIZE)
+                finally:
+                    fout.close()
+        else:
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.write(filepath, os.path.basename(filepath))
+    except BaseException:
+        # i.e. the disk filled up. don't leave a half written temp file around
+        os.remove(path)
+        raise
+    return path
 
 
 # email = Email(write_json=False)
 # # email = Email()
 # email.body('hi')
-# print email
+# print(email)
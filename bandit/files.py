@@ -0,0 +1,74 @@
+import atexit
+import io
+import os
+import tempfile
+import threading
+
+# where a Bandit worker mounts the job's files. `bandit run-local` points this
+# somewhere else so the same layout can be used on a dev box
+DEFAULT_JOB_ROOT = '/job'
+
+
+def job_path(*parts):
+    """
+    Path to a file in the job's directory: $BANDIT_JOB_ROOT (or /job)
+    joined with `parts`.
+
+    Examples
+    ========
+    >>> job_path('metadata', 'charts.ndjson')
+    '/job/metadata/charts.ndjson'
+    """
+    return os.path.join(os.environ.get('BANDIT_JOB_ROOT', DEFAULT_JOB_ROOT), *parts)
+
+
+def atomic_write(path, data):
+    """
+    Write `data` to `path` so that anyone reading the file sees either the old
+    contents or the new contents, never half of each. The data is written to a
+    temp file in the same directory, which is then renamed over `path`. Text is
+    written as UTF-8.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    dirname = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.' + os.path.basename(path) + '-')
+    try:
+        with io.open(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+_appends = {}
+_appends_lock = threading.Lock()
+
+
+def append(path, data):
+    """
+    Append `data` to `path` and return the number of bytes written. Text is
+    written as UTF-8. Files that get appended to over and over (i.e.
+    charts.ndjson) are opened once and kept open as an `io.BufferedWriter`;
+    every append is flushed, so readers see it right away.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    with _appends_lock:
+        f = _appends.get(path)
+        if f is None:
+            f = _appends[path] = io.open(path, 'ab')
+        f.write(data)
+        f.flush()
+    return len(data)
+
+
+def _close_appends():
+    with _appends_lock:
+        for f in _appends.values():
+            f.close()
+        _appends.clear()
+
+atexit.register(_close_appends)
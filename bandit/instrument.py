@@ -0,0 +1,166 @@
+"""
+Lightweight timing and counters for the client's hot paths (`report`,
+metadata and email writes, dashboards, HTTP requests), so you can see how
+much of a job's time goes to Bandit itself.
+
+Instrumentation is off unless $BANDIT_INSTRUMENT is set or you call `enable`;
+while it's off the instrumented functions only pay for a single flag check.
+When it's on, a snapshot of the numbers is written to
+/job/metadata/client-stats.json when the job exits.
+
+    >>> from bandit import instrument
+    >>> instrument.enable()
+    >>> instrument.add_callback(lambda name, seconds: log.debug("%s took %.4fs", name, seconds))
+    >>> instrument.stats()['operations']['report']['p99']
+"""
+from .files import atomic_write, job_path
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+_enabled = os.environ.get('BANDIT_INSTRUMENT', '') not in ('', '0')
+_lock = threading.Lock()
+_operations = {}
+_counters = {}
+_callbacks = []
+
+
+def enable():
+    "start collecting timings and counters"
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    "stop collecting. what's been collected so far is kept"
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def add_callback(callback):
+    """
+    Call `callback(name, seconds)` every time an instrumented operation
+    finishes. Callbacks run on the thread that did the work, so keep them
+    quick.
+    """
+    with _lock:
+        _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    with _lock:
+        if callback in _callbacks:
+            _callbacks.remove(callback)
+
+
+def timed(name):
+    """
+    Decorator that records how long each call to the function takes under
+    `name`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record(name, seconds):
+    "add a timing for `name`"
+    if not _enabled:
+        return
+    with _lock:
+        op = _operations.get(name)
+        if op is None:
+            op = _operations[name] = {"count": 0, "total": 0.0, "max": 0.0, "buckets": {}}
+        op["count"] += 1
+        op["total"] += seconds
+        op["max"] = max(op["max"], seconds)
+        # power of two buckets in microseconds: bucket b holds [2^(b-1), 2^b)us
+        bucket = int(seconds * 1e6).bit_length()
+        op["buckets"][bucket] = op["buckets"].get(bucket, 0) + 1
+        callbacks = list(_callbacks)
+    for callback in callbacks:
+        callback(name, seconds)
+
+
+def add(name, value=1):
+    "add `value` to the counter `name` (i.e. bytes written, retries)"
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def stats():
+    """
+    A snapshot of everything that's been collected. Each operation has its
+    count, total/mean/max seconds, approximate p50/p90/p99 and a latency
+    histogram of [upper bound in seconds, count] pairs.
+
+    Examples
+    ========
+    >>> stats()
+    {'enabled': True,
+     'operations': {'report': {'count': 1000, 'total': 0.21, 'mean': 0.00021, ...}},
+     'counters': {'charts.bytes': 41000, 'file_writes': 1001, 'http.retries': 0}}
+    """
+    with _lock:
+        operations = {}
+        for name, op in _operations.items():
+            buckets = sorted(op["buckets"].items())
+            operations[name] = {
+                "count": op["count"],
+                "total": op["total"],
+                "mean": op["total"] / op["count"],
+                "max": op["max"],
+                "p50": _percentile(buckets, op["count"], 0.5),
+                "p90": _percentile(buckets, op["count"], 0.9),
+                "p99": _percentile(buckets, op["count"], 0.99),
+                "histogram": [[_upper_bound(b), n] for b, n in buckets]
+            }
+        return {"enabled": _enabled, "operations": operations, "counters": dict(_counters)}
+
+
+def reset():
+    "throw away everything that's been collected"
+    with _lock:
+        _operations.clear()
+        _counters.clear()
+
+
+def _upper_bound(bucket):
+    return (2 ** bucket) / 1e6
+
+
+def _percentile(buckets, count, q):
+    "the upper bound of the bucket the q-th percentile falls in"
+    seen = 0
+    for bucket, n in buckets:
+        seen += n
+        if seen >= q * count:
+            return _upper_bound(bucket)
+    return 0.0
+
+
+def _dump():
+    "write the stats for the job runner, if we're on a worker and collected anything"
+    if not (_operations or _counters) or not os.path.exists(job_path('metadata')):
+        return
+    atomic_write(job_path('metadata', 'client-stats.json'), json.dumps(stats()))
+
+atexit.register(_dump)
@@ -1,6 +1,15 @@
+from .files import atomic_write, job_path
+from . import instrument
+from contextlib import contextmanager
+import atexit
 import json
 import os
 import sys
+import threading
+
+def _metadata_path():
+    "looked up on every write, so $BANDIT_JOB_ROOT can be set after bandit is imported"
+    return job_path('metadata', 'metadata.json')
 
 class Map(dict):
     """
@@ -11,11 +20,11 @@ class Map(dict):
         super(Map, self).__init__(*args, **kwargs)
         for arg in args:
             if isinstance(arg, dict):
-                for k, v in arg.iteritems():
+                for k, v in arg.items():
                     self[k] = v
 
         if kwargs:
-            for k, v in kwargs.iteritems():
+            for k, v in kwargs.items():
                 self[k] = v
 
     def __getattr__(self, attr):
@@ -35,41 +44,158 @@ class Map(dict):
         super(Map, self).__delitem__(key)
         del self.__dict__[key]
 
+class _FlushState(object):
+    "Metadata's own bookkeeping, kept out of the metadata keys"
+    def __init__(self):
+        self.dirty = False
+        self.batch_depth = 0
+        self.flush_interval = None
+        self.timer = None
+        self.lock = threading.RLock()
+
 class Metadata(Map):
     """
     Metadata that can be stored for your job.
+
+    By default every change is written straight to metadata.json. To set a lot
+    of keys at once, use `update` or a `batch` so the file only gets written
+    once, or turn on `auto_flush` to coalesce writes on a timer.
+
+    Examples
+    ========
+    >>> bandit.metadata.r2 = 0.82
+    >>> bandit.metadata.update(r2=0.82, rmse=1.2)
+    >>> with bandit.metadata.batch():
+    ...     for name, score in scores.items():
+    ...         bandit.metadata[name] = score
     """
+    # a slot wins over the instance __dict__ that Map copies keys into, so no
+    # key can clobber it
+    __slots__ = ('_state', )
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, '_state', _FlushState())
+        with self.batch():
+            super(Metadata, self).__init__(*args, **kwargs)
+
     def __setitem__(self, key, value):
         try:
             json.dumps(key)
             json.dumps(value)
         except Exception as e:
             raise Exception(e)
-        super(Metadata, self).__setitem__(key, value)
-        self._write_metadata(self)
+        dict.__setitem__(self, key, value)
+        # keys named like our methods (i.e. 'flush') are only available as
+        # metadata['flush'], so they don't hide the method
+        if not (isinstance(key, str) and hasattr(type(self), key)):
+            self.__dict__[key] = value
+        self._changed()
 
     def __delitem__(self, key):
-        super(Metadata, self).__delitem__(key)
-        self._write_metadata(self)
+        dict.__delitem__(self, key)
+        self.__dict__.pop(key, None)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        """
+        Set several keys at once, writing metadata.json a single time.
+        """
+        with self.batch():
+            for arg in args:
+                for k, v in dict(arg).items():
+                    self[k] = v
+            for k, v in kwargs.items():
+                self[k] = v
 
+    @contextmanager
+    def batch(self):
+        """
+        Hold off on writing metadata.json until the end of the `with` block.
+        Batches can be nested; the write happens when the outermost one exits.
+        """
+        state = self._state
+        with state.lock:
+            state.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with state.lock:
+                state.batch_depth -= 1
+                done = state.batch_depth==0
+            if done:
+                self._changed(force=False)
+
+    def auto_flush(self, interval=1.0):
+        """
+        Coalesce writes: changes are written at most once every `interval`
+        seconds, and once more when the interpreter exits.
+
+        Parameters
+        ==========
+        interval: float
+            number of seconds to wait before writing changes. pass None to go
+            back to writing on every change
+        """
+        state = self._state
+        with state.lock:
+            if interval is not None and state.flush_interval is None:
+                atexit.register(self.flush)
+            state.flush_interval = interval
+        if interval is None:
+            self.flush()
+
+    def flush(self):
+        """
+        Write any pending changes to metadata.json.
+        """
+        state = self._state
+        with state.lock:
+            if state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+            if not state.dirty:
+                return
+            state.dirty = False
+            self._write_metadata(self)
+
+    def _changed(self, force=True):
+        state = self._state
+        with state.lock:
+            if force:
+                state.dirty = True
+            if not state.dirty or state.batch_depth > 0:
+                return
+            if state.flush_interval is None:
+                self.flush()
+            elif state.timer is None:
+                state.timer = threading.Timer(state.flush_interval, self.flush)
+                state.timer.daemon = True
+                state.timer.start()
+
+    @instrument.timed('metadata_write')
     def _write_metadata(self, data):
+        # we're not on a bandit worker, so just show what would've been written
+        path = _metadata_path()
+        dry_run = not os.path.exists(path)
         try:
-            json.dumps(data)
+            encoded = json.dumps(data, indent=2 if dry_run else None)
         except Exception as e:
             raise Exception("data is not json serializable: %s" % str(e))
 
-        if not os.path.exists('/job/metadata/metadata.json'):
-            sys.stderr.write(json.dumps(data, indent=2) + '\n')
+        if dry_run:
+            sys.stderr.write(encoded + '\n')
             return
 
-        with open('/job/metadata/metadata.json', 'wb') as f:
-            json.dump(data, f)
+        atomic_write(path, encoded)
+        instrument.add('file_writes')
+        instrument.add('metadata.bytes', len(encoded))
 
     def _get_metadata(self):
-        if not os.path.exists('/job/metadata/metadata.json'):
+        path = _metadata_path()
+        if not os.path.exists(path):
             return {}
 
-        with open('/job/metadata/metadata.json', 'rb') as f:
+        with open(path, 'rb') as f:
             return json.load(f)
 
 
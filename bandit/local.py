@@ -0,0 +1,321 @@
+"""
+Run a job on your own machine the way a Bandit worker would. The job gets a
+job directory with the same layout as a worker's /job (metadata/ and
+output-files/), the same environment variables (BANDIT_JOB_ID, DATABASE_*,
+...), and a stand-in Bandit server on localhost that accepts its reports. So
+`report`, `metadata`, `Email` and dashboards do real I/O instead of printing a
+dry run, which makes this handy for profiling and load testing jobs.
+
+    $ bandit run-local myjob.py --database postgres-dw=postgresql://localhost/dw
+"""
+from .files import DEFAULT_JOB_ROOT, atomic_write
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class LocalServer(object):
+    """
+    Stands in for the Bandit server while a job runs locally. Data points sent
+    by `Bandit.report` (one at a time or in bulk) are appended to `reports_path`
+    and counted, and artifact uploads end up in `artifacts_dir`; every other API
+    call gets an empty, successful response.
+
+    Parameters
+    ==========
+    reports_path: str
+        file the data points are written to, one JSON object per line
+    host: str
+        interface to listen on
+    port: int
+        port to listen on. 0 picks a free one
+    artifacts_dir: str
+        directory uploaded artifacts are put in. defaults to artifacts/ next to
+        `reports_path`
+
+    Examples
+    ========
+    >>> server = LocalServer('/tmp/reports.ndjson')
+    >>> server.url
+    'http://127.0.0.1:53712/'
+    >>> server.close()
+    """
+    def __init__(self, reports_path, host='127.0.0.1', port=0, artifacts_dir=None):
+        self.reports_path = reports_path
+        self.artifacts_dir = artifacts_dir or os.path.join(os.path.dirname(reports_path), 'artifacts')
+        self.n_requests = 0
+        self.n_points = 0
+        self.n_artifacts = 0
+        self._uploads = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, payload = server._handle(self.command, self.path.split('?')[0], body, self.headers)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        self._server = _Server((host, port), Handler)
+        self.url = 'http://%s:%d/' % (host, self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, name='bandit-local-server')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _handle(self, method, path, body, headers=None):
+        parts = path.strip('/').split('/')
+        if parts[:2]==['api', 'jobs'] and len(parts) > 3 and parts[3]=='artifacts':
+            return self._handle_artifact(method, parts[4:], body, headers or {})
+        with self._lock:
+            self.n_requests += 1
+            if method=='PUT' and len(parts)==4 and parts[:2]==['api', 'jobs'] and parts[3] in ('report', 'reports'):
+                try:
+                    points = json.loads(body.decode('utf-8'))
+                except ValueError:
+                    return 400, {'status': 'error', 'message': 'data points must be JSON'}
+                if parts[3]=='report':
+                    points = [points]
+                with open(self.reports_path, 'a') as f:
+                    for point in points:
+                        f.write(json.dumps(point) + '\n')
+                self.n_points += len(points)
+                return 200, {'status': 'OK', 'message': 'REPORTED'}
+        if path=='/api/jobs':
+            return 200, {'jobs': []}
+        if path=='/api/job-results':
+            return 200, {'jobResults': []}
+        return 200, {'status': 'OK'}
+
+    def _handle_artifact(self, method, parts, body, headers):
+        """
+        Multipart uploads from `bandit.artifacts`. Parts are kept in
+        <artifacts_dir>/.uploads/<upload id>/ until the upload is completed.
+        Starting an upload with the id of an unfinished one, or of a file (same
+        name, size and checksum) that was already partly uploaded, hands back
+        the parts that are already here.
+        """
+        if method=='POST' and not parts:
+            request = json.loads(body.decode('utf-8'))
+            name = os.path.normpath(request.get('name') or '')
+            if name.startswith('..') or os.path.isabs(name):
+                return 400, {'status': 'error', 'message': 'bad artifact name'}
+            key = (name, request.get('size'), request.get('sha256'), request.get('chunk_size'))
+            with self._lock:
+                for upload_id, upload in self._uploads.items():
+                    if upload['complete'] or upload['name']!=name:
+                        continue
+                    if upload_id==request.get('upload_id') or (upload['key']==key and key[2] is not None):
+                        break
+                else:
+                    upload_id = uuid.uuid4().hex
+                    upload = self._uploads[upload_id] = {
+                        'key': key, 'name': name, 'complete': False,
+                        'dir': os.path.join(self.artifacts_dir, '.uploads', upload_id)
+                    }
+                    os.makedirs(upload['dir'])
+            received = sorted(int(part) for part in os.listdir(upload['dir']) if part.isdigit())
+            return 200, {'upload_id': upload_id, 'parts': received}
+
+        upload = self._uploads.get(parts[0]) if parts else None
+        if upload is None:
+            return 404, {'status': 'error', 'message': 'no such upload'}
+
+        if method=='PUT' and len(parts)==3 and parts[1]=='parts' and parts[2].isdigit():
+            checksum = headers.get('X-Bandit-SHA256')
+            if checksum is not None and checksum!=hashlib.sha256(body).hexdigest():
+                return 400, {'status': 'error', 'message': 'part %s is corrupt' % parts[2]}
+            atomic_write(os.path.join(upload['dir'], parts[2]), body)
+            return 200, {'status': 'OK'}
+
+        if method=='POST' and parts[1:]==['complete']:
+            request = json.loads(body.decode('utf-8'))
+            part_paths = [os.path.join(upload['dir'], str(n)) for n in range(request['parts'])]
+            for n, part in enumerate(part_paths):
+                if not os.path.exists(part):
+                    return 400, {'status': 'error', 'message': 'part %d is missing' % n}
+            path = os.path.join(self.artifacts_dir, upload['name'])
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            sha256 = hashlib.sha256()
+            with open(path, 'wb') as fout:
+                for part in part_paths:
+                    with open(part, 'rb') as fin:
+                        data = fin.read()
+                    sha256.update(data)
+                    fout.write(data)
+            if sha256.hexdigest()!=request['sha256']:
+                os.remove(path)
+                return 400, {'status': 'error', 'message': 'checksum does not match'}
+            shutil.rmtree(upload['dir'])
+            with self._lock:
+                upload['complete'] = True
+                self.n_artifacts += 1
+            return 200, {'status': 'OK', 'sha256': request['sha256']}
+
+        return 404, {'status': 'error', 'message': 'not found'}
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def make_job_root(job_root=None):
+    """
+    Create a directory laid out like /job on a Bandit worker and return its
+    path. A temporary directory is used if `job_root` is None.
+    """
+    if job_root is None:
+        job_root = tempfile.mkdtemp(prefix='bandit-job-')
+    for dirname in ('metadata', 'output-files'):
+        path = os.path.join(job_root, dirname)
+        if not os.path.exists(path):
+            os.makedirs(path)
+    metadata_path = os.path.join(job_root, 'metadata', 'metadata.json')
+    if not os.path.exists(metadata_path):
+        with open(metadata_path, 'w') as f:
+            f.write('{}')
+    return job_root
+
+
+def run_local(command, job_root=None, job_id=None, databases=None, env=None):
+    """
+    Run `command` with the job directory, environment variables, and Bandit
+    server a worker would give it.
+
+    Parameters
+    ==========
+    command: list
+        the command to run. if the first item is a .py file it's run with the
+        current python
+    job_root: str
+        directory to use in place of /job. defaults to a temporary directory
+    job_id: str
+        value for BANDIT_JOB_ID
+    databases: dict
+        connection strings by name, exposed as DATABASE_<name>
+    env: dict
+        any other environment variables to set for the job
+
+    Returns
+    =======
+    dict with the job's `returncode`, `duration`, `job_root`, and the number of
+    `points` it reported and `artifacts` it uploaded
+
+    Examples
+    ========
+    >>> result = run_local(['train.py', '--epochs', '10'], databases={'dw': 'postgresql://localhost/dw'})
+    >>> os.listdir(os.path.join(result['job_root'], 'output-files'))
+    """
+    command = list(command)
+    if command and command[0].endswith('.py'):
+        command.insert(0, sys.executable)
+
+    job_root = make_job_root(job_root)
+    server = LocalServer(os.path.join(job_root, 'metadata', 'reports.ndjson'))
+
+    job_env = dict(os.environ)
+    job_env.update({
+        'BANDIT_JOB_ROOT': os.path.abspath(job_root),
+        'BANDIT_JOB_ID': str(job_id or uuid.uuid4().hex[:8]),
+        'BANDIT_CLIENT_USERNAME': os.environ.get('BANDIT_CLIENT_USERNAME', getpass.getuser()),
+        'BANDIT_CLIENT_APIKEY': 'local',
+        'BANDIT_CLIENT_URL': server.url,
+        # so the client writes metadata/client-stats.json for the summary
+        'BANDIT_INSTRUMENT': os.environ.get('BANDIT_INSTRUMENT', '1'),
+    })
+    for name, connection in (databases or {}).items():
+        job_env['DATABASE_' + name] = connection
+    job_env.update(env or {})
+
+    start = time.perf_counter()
+    try:
+        returncode = subprocess.call(command, env=job_env)
+    finally:
+        server.close()
+    return {
+        "returncode": returncode,
+        "duration": time.perf_counter() - start,
+        "job_root": job_root,
+        "points": server.n_points,
+        "artifacts": server.n_artifacts
+    }
+
+
+def main(argv=None):
+    "entry point for the `bandit` command"
+    parser = argparse.ArgumentParser(prog='bandit')
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run-local', help='run a job locally the way a Bandit worker would')
+    run.add_argument('--job-root', help='directory to use in place of %s (default: a temp dir)' % DEFAULT_JOB_ROOT)
+    run.add_argument('--job-id', help='value for BANDIT_JOB_ID')
+    run.add_argument('--database', action='append', default=[], metavar='NAME=URL',
+                     help='database connection, exposed as DATABASE_NAME. can be repeated')
+    run.add_argument('job', help='the script to run')
+    run.add_argument('args', nargs=argparse.REMAINDER, help='arguments for the script')
+    args = parser.parse_args(argv)
+
+    if args.command!='run-local':
+        parser.print_help()
+        return 2
+
+    databases = {}
+    for database in args.database:
+        if '=' not in database:
+            parser.error("--database must look like NAME=URL, got '%s'" % database)
+        name, connection = database.split('=', 1)
+        databases[name] = connection
+
+    result = run_local([args.job] + args.args, job_root=args.job_root, job_id=args.job_id,
+                       databases=databases)
+    sys.stderr.write("job exited with %d after %.2fs, reported %d data points and uploaded %d artifacts. "
+                     "job files are in %s\n" % (result['returncode'], result['duration'], result['points'],
+                                                 result['artifacts'], result['job_root']))
+    sys.stderr.write(_client_summary(result['job_root']))
+    return result['returncode']
+
+
+def _client_summary(job_root):
+    "a table of how long the job spent in the Bandit client, from client-stats.json"
+    path = os.path.join(job_root, 'metadata', 'client-stats.json')
+    if not os.path.exists(path):
+        return ''
+    with open(path) as f:
+        stats = json.load(f)
+
+    lines = ['%-18s %8s %10s %10s %10s' % ('client overhead', 'calls', 'total(s)', 'mean(ms)', 'p99(ms)')]
+    for name, op in sorted(stats['operations'].items(), key=lambda item: -item[1]['total']):
+        lines.append('%-18s %8d %10.3f %10.3f %10.3f' % (name, op['count'], op['total'],
+                                                        op['mean'] * 1000, op['p99'] * 1000))
+    for name, value in sorted(stats['counters'].items()):
+        lines.append('%-18s %8d' % (name, value))
+    return '\n'.join(lines) + '\n'
+
+
+if __name__=="__main__":
+    sys.exit(main())
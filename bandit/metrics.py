@@ -0,0 +1,274 @@
+"""
+A compact, append-only binary log for the data points sent with
+`Bandit.report`, as an alternative to charts.ndjson. Every point is a fixed
+size record of (tag id, x, y, timestamp); the tag names live once in a small
+dictionary file next to the log. Readers mmap the log, so pulling one tag's
+points out of a big file doesn't mean parsing all of it.
+
+    charts.bin       8 byte header, then 28 byte little-endian records
+    charts.bin.tags  one JSON encoded tag name per line; line n is tag id n
+
+Use `ndjson_to_binary` and `binary_to_ndjson` to convert to and from the
+charts.ndjson format.
+"""
+from .yhat_json import json_dumps
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'BNDTLOG1'
+RECORD = struct.Struct('<Iddd')
+RECORD_FIELDS = [('tag', '<u4'), ('x', '<f8'), ('y', '<f8'), ('timestamp', '<f8')]
+
+
+class MetricsLog(object):
+    """
+    Appends data points to a binary metrics log, creating it if it doesn't
+    exist yet.
+
+    Parameters
+    ==========
+    path: str
+        path to the log. the tag dictionary is written to <path>.tags
+
+    Examples
+    ========
+    >>> log = MetricsLog('/job/metadata/charts.bin')
+    >>> log.append('loss', 0, 0.93)
+    >>> log.append_lines(['{"tag_name": "loss", "x": 1, "y": 0.87}'])
+    >>> log.close()
+    """
+    def __init__(self, path):
+        self.path = path
+        self.tags_path = path + '.tags'
+        self._tags = dict((tag, i) for i, tag in enumerate(_read_tags(self.tags_path)))
+        self._lock = threading.Lock()
+
+        self._file = open(path, 'ab')
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell()==0:
+            self._file.write(MAGIC)
+            self._file.flush()
+        else:
+            _check_header(path)
+            # a crash halfway through a write leaves a partial record at the
+            # end. cut it off so everything after it lines up again
+            extra = (self._file.tell() - len(MAGIC)) % RECORD.size
+            if extra:
+                self._file.truncate(self._file.tell() - extra)
+        self._tags_file = open(self.tags_path, 'a')
+
+    def append(self, tag_name, x, y, timestamp=None):
+        "append a single data point"
+        self.extend([(tag_name, x, y, timestamp)])
+
+    def extend(self, points):
+        """
+        Append (tag_name, x, y, timestamp) tuples. Points without a timestamp
+        get the current time. x and y are stored as doubles; null (which is
+        what NaN turns into in charts.ndjson) or anything else that isn't a
+        number is stored as NaN.
+        """
+        now = time.time()
+        with self._lock:
+            records = []
+            for tag_name, x, y, timestamp in points:
+                records.append(RECORD.pack(self._tag_id(tag_name), _float(x), _float(y),
+                                           now if timestamp is None else _float(timestamp)))
+            # new tags have to be on disk before the records that use them
+            self._tags_file.flush()
+            self._file.write(b''.join(records))
+            self._file.flush()
+
+    def append_lines(self, lines):
+        "append JSON encoded data points, as they'd be written to charts.ndjson"
+        points = []
+        for line in lines:
+            point = json.loads(line)
+            points.append((point['tag_name'], point['x'], point['y'], point.get('timestamp')))
+        self.extend(points)
+
+    def _tag_id(self, tag_name):
+        tag_id = self._tags.get(tag_name)
+        if tag_id is None:
+            tag_id = self._tags[tag_name] = len(self._tags)
+            self._tags_file.write(json.dumps(tag_name) + '\n')
+        return tag_id
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._tags_file.close()
+
+
+class MetricsReader(object):
+    """
+    Reads a binary metrics log through mmap. The reader sees the records that
+    were in the log when it was opened; open a new one to pick up more.
+
+    Parameters
+    ==========
+    path: str
+        path to the log
+
+    Examples
+    ========
+    >>> reader = MetricsReader('/job/metadata/charts.bin')
+    >>> reader.tags()
+    ['loss', 'accuracy']
+    >>> reader.query('loss', x_min=100, x_max=200)[:2]
+    [(100.0, 0.31, 1490000000.5), (101.0, 0.30, 1490000000.6)]
+    """
+    def __init__(self, path):
+        _check_header(path)
+        self.path = path
+        self._tags = _read_tags(path + '.tags')
+        self._ids = dict((tag, i) for i, tag in enumerate(self._tags))
+
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # ignore a partially written record at the end
+        self._n = (size - len(MAGIC)) // RECORD.size
+
+    def __len__(self):
+        return self._n
+
+    def tags(self):
+        "names of the tags in the log, in the order they first showed up"
+        return list(self._tags)
+
+    def query(self, tag_name, x_min=None, x_max=None, since=None, until=None):
+        """
+        Get the points for a tag, in the order they were written.
+
+        Parameters
+        ==========
+        tag_name: str
+            the tag to get points for
+        x_min, x_max: float
+            only get points with x_min <= x <= x_max
+        since, until: float
+            only get points with since <= timestamp < until (seconds since epoch)
+
+        Returns
+        =======
+        list of (x, y, timestamp) tuples
+        """
+        tag_id = self._ids.get(tag_name)
+        if tag_id is None or self._n==0:
+            return []
+
+        np = _numpy()
+        if np is not None:
+            records = np.frombuffer(self._mmap, dtype=np.dtype(RECORD_FIELDS), count=self._n, offset=len(MAGIC))
+            mask = records['tag']==tag_id
+            if x_min is not None:
+                mask &= records['x'] >= x_min
+            if x_max is not None:
+                mask &= records['x'] <= x_max
+            if since is not None:
+                mask &= records['timestamp'] >= since
+            if until is not None:
+                mask &= records['timestamp'] < until
+            found = records[mask]
+            return list(zip(found['x'].tolist(), found['y'].tolist(), found['timestamp'].tolist()))
+
+        points = []
+        for i in range(self._n):
+            tag, x, y, timestamp = RECORD.unpack_from(self._mmap, len(MAGIC) + i * RECORD.size)
+            if tag!=tag_id:
+                continue
+            if (x_min is not None and x < x_min) or (x_max is not None and x > x_max):
+                continue
+            if (since is not None and timestamp < since) or (until is not None and timestamp >= until):
+                continue
+            points.append((x, y, timestamp))
+        return points
+
+    def __iter__(self):
+        "every point in the log as (tag_name, x, y, timestamp)"
+        for i in range(self._n):
+            tag, x, y, timestamp = RECORD.unpack_from(self._mmap, len(MAGIC) + i * RECORD.size)
+            yield self._tags[tag], x, y, timestamp
+
+    def close(self):
+        self._mmap.close()
+
+
+def ndjson_to_binary(ndjson_path, log_path):
+    """
+    Append the points in a charts.ndjson file to a binary metrics log.
+    Returns the number of points converted.
+    """
+    log = MetricsLog(log_path)
+    n = 0
+    try:
+        with open(ndjson_path) as f:
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(line)
+                if len(batch) >= 10000:
+                    log.append_lines(batch)
+                    n += len(batch)
+                    batch = []
+            log.append_lines(batch)
+            n += len(batch)
+    finally:
+        log.close()
+    return n
+
+
+def binary_to_ndjson(log_path, ndjson_path):
+    """
+    Write the points in a binary metrics log out in the charts.ndjson format.
+    Returns the number of points converted.
+    """
+    reader = MetricsReader(log_path)
+    try:
+        with open(ndjson_path, 'w') as f:
+            for tag_name, x, y, timestamp in reader:
+                f.write(json_dumps(dict(tag_name=tag_name, x=_number(x), y=_number(y))) + '\n')
+        return len(reader)
+    finally:
+        reader.close()
+
+
+def _numpy():
+    "numpy is only imported when a log is queried, and it's optional"
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _read_tags(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC))!=MAGIC:
+            raise Exception("%s is not a bandit metrics log" % path)
+
+
+def _number(value):
+    "x and y are stored as doubles; hand whole numbers (like steps) back as ints"
+    if value==value and value not in (float('inf'), float('-inf')) and value.is_integer():
+        return int(value)
+    return value
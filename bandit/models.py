@@ -0,0 +1,159 @@
+"""
+Compact records for the jobs and job results that come back from Bandit. These
+use __slots__ instead of a per-instance __dict__, so holding on to hundreds of
+thousands of them stays cheap. Fields that hold JSON (i.e. metadata) are kept
+as the strings that came off the wire; `parsed` decodes them the first time
+you ask and keeps the result.
+"""
+from collections import OrderedDict
+import json
+
+
+class Record(object):
+    """
+    Base class for objects that come back from Bandit. Subclasses list their
+    fields in `__slots__`; anything else the server sends along ends up in
+    `_extra` and is still available as an attribute.
+    """
+    __slots__ = ('_extra', '_decoded')
+    _fields = ()
+
+    def __init__(self, **kwargs):
+        self._extra = None
+        self._decoded = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __setattr__(self, key, value):
+        try:
+            object.__setattr__(self, key, value)
+        except AttributeError:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        if key not in Record.__slots__ and self._decoded is not None:
+            self._decoded.pop(key, None)
+
+    def __getattr__(self, key):
+        # only gets called for fields that weren't sent by the server. our own
+        # bookkeeping slots are never looked up in _extra, so a record that
+        # hasn't been initialized yet (i.e. while unpickling) can't recurse
+        if key not in Record.__slots__ and self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise AttributeError("%s has no attribute '%s'" % (type(self).__name__, key))
+
+    def parsed(self, field):
+        """
+        The value of `field` decoded from JSON. The decoded value is kept, so
+        big fields are only decoded once. Values that aren't JSON strings are
+        handed back as they are.
+
+        Examples
+        ========
+        >>> result.metadata
+        '{"r2": 0.8}'
+        >>> result.parsed('metadata')['r2']
+        0.8
+        """
+        if self._decoded is not None and field in self._decoded:
+            return self._decoded[field]
+        value = getattr(self, field)
+        if isinstance(value, (bytes, str)):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        if self._decoded is None:
+            self._decoded = {}
+        self._decoded[field] = value
+        return value
+
+    @property
+    def data(self):
+        "the record as a dict, the way it came from Bandit"
+        data = {}
+        for field in self._fields:
+            if _has_slot(self, field):
+                data[field] = getattr(self, field)
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getstate__(self):
+        return self.data
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def _has_slot(record, slot):
+    try:
+        object.__getattribute__(record, slot)
+        return True
+    except AttributeError:
+        return False
+
+
+class Job(Record):
+    _fields = ('id', 'username', 'project', 'name', 'command', 'schedule', 'createdAt', 'updatedAt',
+               'metadata')
+    __slots__ = _fields
+
+    def __repr__(self):
+        return "<Job {}/{}>".format(self.username, self.name)
+
+
+class JobResult(Record):
+    _fields = ('id', 'username', 'project', 'name', 'n', 'status', 'startTime', 'endTime',
+               'duration', 'exitCode', 'logs', 'metadata')
+    __slots__ = _fields
+
+    def __repr__(self):
+        return "<JobResult {}/{}/{}>".format(self.name, self.n, self.status)
+
+
+def to_columns(records, fields=None):
+    """
+    Turn a list of Jobs or JobResults into columns, which is a much better
+    layout for bulk analysis.
+
+    Parameters
+    ==========
+    records: list
+        Jobs or JobResults
+    fields: list
+        the fields to include. defaults to every field that shows up in `records`
+
+    Examples
+    ========
+    >>> columns = to_columns(bandit.get_job_results(), fields=['name', 'status'])
+    >>> columns['status'][:3]
+    ['success', 'success', 'failed']
+    """
+    records = list(records)
+    if fields is None:
+        fields = []
+        for record in records:
+            for field in record.data:
+                if field not in fields:
+                    fields.append(field)
+
+    columns = OrderedDict()
+    for field in fields:
+        columns[field] = [getattr(record, field, None) for record in records]
+    return columns
+
+
+def to_dataframe(records, fields=None):
+    """
+    Turn a list of Jobs or JobResults into a pandas DataFrame. Takes the same
+    arguments as `to_columns`.
+
+    Examples
+    ========
+    >>> df = to_dataframe(bandit.get_job_results())
+    >>> df.groupby('status').size()
+    """
+    from pandas import DataFrame
+    columns = to_columns(records, fields)
+    return DataFrame(columns, columns=list(columns.keys()))
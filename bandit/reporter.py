@@ -0,0 +1,358 @@
+"""
+Reporters sit between `Bandit.report` and the Bandit server. By default every
+call to `report` is sent to Bandit right away; a reporter lets you collect data
+points in memory and ship them in batches instead.
+"""
+import atexit
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+class BufferedReporter(object):
+    """
+    Collects data points from `Bandit.report` in memory and sends them to Bandit
+    in batches. A batch is flushed once `flush_size` points have been collected,
+    once `flush_interval` seconds have passed since the last flush, or when the
+    interpreter exits.
+
+    Parameters
+    ==========
+    bandit: Bandit
+        the client that the points will be sent with
+    flush_size: int
+        number of points to collect before flushing
+    flush_interval: float
+        max number of seconds a point waits before being flushed. a timer
+        flushes the buffer even if nothing else gets reported
+    max_buffer: int
+        max number of points held in memory, counting both new points and ones
+        waiting to be resent. if Bandit can't be reached and the buffer fills
+        up, the oldest points are dropped
+
+    Examples
+    ========
+    >>> bandit = Bandit()
+    >>> bandit.buffer_reports(flush_size=500)
+    >>> for i in range(10000):
+    ...     bandit.report("loss", 1. / (i + 1))
+    >>> bandit.flush_reports()
+    """
+    def __init__(self, bandit, flush_size=100, flush_interval=5.0, max_buffer=10000):
+        if max_buffer < flush_size:
+            raise Exception("max_buffer must be at least as large as flush_size")
+
+        self.bandit = bandit
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+
+        # points that haven't been written to charts.ndjson yet
+        self._buffer = collections.deque()
+        # points that are on disk but haven't made it to the server yet. the
+        # two share the `max_buffer` limit
+        self._unsent = collections.deque()
+        self._lock = threading.RLock()
+        self._last_flush = time.time()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def add(self, line):
+        """
+        Add a JSON encoded data point to the buffer, flushing if a threshold has
+        been hit.
+        """
+        with self._lock:
+            self._extend(self._buffer, [line])
+            due = len(self._buffer) >= self.flush_size or \
+                time.time() - self._last_flush >= self.flush_interval
+            if not due:
+                self._schedule()
+        if due:
+            self.flush()
+        return { "status": "OK", "message": "BUFFERED" }
+
+    def flush(self):
+        """
+        Write everything in the buffer to charts.ndjson and send it to Bandit.
+        Points that can't be sent are kept around and retried on the next flush.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._last_flush = time.time()
+            points = list(self._buffer)
+            self._buffer.clear()
+            if points:
+                self.bandit._write_charts(points)
+
+            self._extend(self._unsent, points)
+            if not self._unsent:
+                return
+            pending = list(self._unsent)
+            self._unsent.clear()
+
+            try:
+                self.bandit._send_reports(pending)
+            except Exception as e:
+                sys.stderr.write("Could not send %d data points to Bandit: %s\n" % (len(pending), str(e)))
+                self._extend(self._unsent, pending)
+                self._schedule()
+
+    def _schedule(self):
+        "make sure a flush happens within `flush_interval`. called with `_lock` held"
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _extend(self, queue, points):
+        """
+        append points to `queue`, dropping the oldest points (unsent ones first)
+        once there are more than `max_buffer` in memory
+        """
+        queue.extend(points)
+        overflow = len(self._unsent) + len(self._buffer) - self.max_buffer
+        for i in range(max(overflow, 0)):
+            (self._unsent or self._buffer).popleft()
+            self.dropped += 1
+
+    def close(self):
+        "flush any remaining points and stop flushing at exit"
+        self.flush()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        atexit.unregister(self.flush)
+
+    def stats(self):
+        "counts of points that are buffered, waiting to be resent, or dropped"
+        with self._lock:
+            return {
+                "buffered": len(self._buffer),
+                "unsent": len(self._unsent),
+                "dropped": self.dropped
+            }
+
+
+class BackgroundReporter(object):
+    """
+    Sends data points from `Bandit.report` to Bandit on a background thread so
+    your job never waits on the network. Points go onto a bounded queue; a worker
+    thread drains it in batches of `batch_size` (or every `flush_interval`
+    seconds, whichever comes first).
+
+    When the queue is full, `policy` decides what happens to new points:
+
+        - "drop-oldest": throw away the oldest queued point
+        - "block": wait for the worker to make room
+        - "spill": append the point to `spill_path` on disk. once points have
+          been spilled, new points are spilled too until the spill has been
+          sent, so points still go out in order. the spill is read back
+          `batch_size` points at a time
+
+    Parameters
+    ==========
+    bandit: Bandit
+        the client that the points will be sent with
+    max_queue: int
+        max number of points held in memory
+    policy: str
+        one of "drop-oldest", "block", or "spill"
+    batch_size: int
+        max number of points sent per request
+    flush_interval: float
+        max number of seconds a point waits before being sent
+    spill_path: str
+        file used by the "spill" policy. defaults to a temporary file
+
+    Examples
+    ========
+    >>> bandit = Bandit()
+    >>> reporter = bandit.background_reports(max_queue=5000, policy="spill")
+    >>> bandit.report("loss", 0.25)
+    >>> reporter.stats()
+    {'queued': 1, 'sent': 0, 'dropped': 0, 'failed': 0, 'spilled': 0, 'pending': 1}
+    """
+    POLICIES = ("drop-oldest", "block", "spill")
+
+    def __init__(self, bandit, max_queue=10000, policy="drop-oldest", batch_size=100,
+                 flush_interval=1.0, spill_path=None):
+        if policy not in self.POLICIES:
+            raise Exception("policy must be one of: " + ", ".join(self.POLICIES))
+
+        self.bandit = bandit
+        self.max_queue = max_queue
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if policy=="spill" and spill_path is None:
+            fd, spill_path = tempfile.mkstemp(prefix='bandit-spill-', suffix='.ndjson')
+            os.close(fd)
+        self.spill_path = spill_path
+        # opened on the first spill and kept open. points are appended to the
+        # end and read back from `_spill_offset`
+        self._spill_file = None
+        self._spill_offset = 0
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._counters = dict(queued=0, sent=0, dropped=0, failed=0, spilled=0)
+        self._n_spilled = 0
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='bandit-reporter')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, line):
+        """
+        Queue a JSON encoded data point to be sent by the background thread.
+        """
+        with self._cond:
+            if self._closed:
+                raise Exception("reporter has been closed")
+
+            if self._n_spilled:
+                # older points are waiting on disk, so this one has to go after them
+                self._spill(line)
+                return { "status": "OK", "message": "SPILLED" }
+
+            if len(self._queue) >= self.max_queue:
+                if self.policy=="drop-oldest":
+                    self._queue.popleft()
+                    self._counters['dropped'] += 1
+                elif self.policy=="spill":
+                    self._spill(line)
+                    return { "status": "OK", "message": "SPILLED" }
+                else:
+                    while len(self._queue) >= self.max_queue and self._thread.is_alive():
+                        self._cond.wait(0.1)
+
+            self._queue.append(line)
+            self._counters['queued'] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+        return { "status": "OK", "message": "QUEUED" }
+
+    def flush(self, timeout=None):
+        """
+        Wait for everything that's been queued (or spilled) to be sent.
+
+        Parameters
+        ==========
+        timeout: float
+            max number of seconds to wait. waits indefinitely if None
+
+        Returns
+        =======
+        True if everything was sent, False if we timed out
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight or self._n_spilled:
+                if not self._thread.is_alive():
+                    return False
+                if deadline is not None and time.time() >= deadline:
+                    return False
+                self._cond.wait(0.1)
+        return True
+
+    def close(self, timeout=30):
+        "send whatever's left and stop the background thread"
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        """
+        Counters for the points that have gone through the reporter: queued,
+        sent, dropped (by the "drop-oldest" policy), failed (could not be sent)
+        and spilled to disk, plus the number currently pending in memory.
+        """
+        with self._cond:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._queue)
+            return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._n_spilled and not self._closed:
+                    self._flush_requested = False
+                    self._cond.wait(self.flush_interval)
+                elif len(self._queue) < self.batch_size and not (self._closed or self._flush_requested):
+                    self._cond.wait(self.flush_interval)
+
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                if not batch and self._n_spilled:
+                    batch = self._unspill()
+                if not batch and self._closed:
+                    if self._spill_file is not None:
+                        self._spill_file.close()
+                    self._cond.notify_all()
+                    return
+                self._in_flight = len(batch)
+                # wake up anyone blocked on a full queue
+                self._cond.notify_all()
+
+            if batch:
+                self._send(batch)
+
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _send(self, batch):
+        try:
+            self.bandit._write_charts(batch)
+            self.bandit._send_reports(batch)
+        except Exception as e:
+            sys.stderr.write("Could not send %d data points to Bandit: %s\n" % (len(batch), str(e)))
+            with self._cond:
+                self._counters['failed'] += len(batch)
+        else:
+            with self._cond:
+                self._counters['sent'] += len(batch)
+
+    def _spill(self, line):
+        "append a point to the spill file. called with `_cond` held"
+        if self._spill_file is None:
+            self._spill_file = open(self.spill_path, 'w+b')
+        self._spill_file.seek(0, os.SEEK_END)
+        self._spill_file.write(line.encode('utf-8') + b'\n')
+        self._n_spilled += 1
+        self._counters['spilled'] += 1
+
+    def _unspill(self):
+        "read the next `batch_size` spilled points. called with `_cond` held"
+        f = self._spill_file
+        f.flush()
+        f.seek(self._spill_offset)
+        batch = []
+        while len(batch) < min(self.batch_size, self._n_spilled):
+            batch.append(f.readline().decode('utf-8').rstrip('\n'))
+        self._spill_offset = f.tell()
+        self._n_spilled -= len(batch)
+        if not self._n_spilled:
+            # all caught up. start the file over so it doesn't keep growing
+            f.seek(0)
+            f.truncate()
+            self._spill_offset = 0
+        return batch
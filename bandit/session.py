@@ -0,0 +1,40 @@
+# status codes that are worth retrying. these are almost always a proxy or
+# load balancer in front of Bandit having a bad moment
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def make_session(pool_size=10, retries=3, backoff_factor=0.5):
+    """
+    Build a `requests.Session` that keeps connections to Bandit alive and
+    retries failed requests.
+
+    Parameters
+    ==========
+    pool_size: int
+        max number of connections kept open to the Bandit server
+    retries: int
+        number of times to retry a request that hits a connection error or
+        a 5xx response
+    backoff_factor: float
+        retries sleep for backoff_factor * (2 ** (n_retries - 1)) seconds
+    """
+    # requests takes a while to import, so it's only imported once a job
+    # actually talks to Bandit
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
@@ -0,0 +1,129 @@
+"""
+Streaming HTML rendering for DataFrames. `DataFrame.to_html` builds the whole
+table as one string, which for a few million rows means several copies of the
+page in memory. These helpers write a table to a file a chunk of rows at a time
+instead, so memory use stays flat no matter how big the table is.
+"""
+from .assets import BOOTSTRAP_URL
+import io
+import os
+
+TABLE_CLASSES = 'table table-bordered'
+
+_PAGE = """<!doctype html>
+<html lang="en">
+  <head>
+    <meta charset="utf-8">
+    <link rel="stylesheet" href="%(stylesheet)s" />
+    <title>%(title)s</title>
+  </head>
+  <body>
+    <div class="container">
+"""
+
+
+def write_table(f, df, chunk_size=10000, max_rows=None):
+    """
+    Write `df` to the file `f` as an HTML table, `chunk_size` rows at a time.
+
+    Parameters
+    ==========
+    f: file
+        file opened in binary mode, or a text stream like sys.stdout
+    df: DataFrame
+        the table to write
+    chunk_size: int
+        number of rows rendered at once
+    max_rows: int
+        only write the first `max_rows` rows
+    """
+    n_rows = len(df) if max_rows is None else min(len(df), max_rows)
+    head, tail = _table_shell(df)
+    write(f, head)
+    for start in range(0, n_rows, chunk_size):
+        chunk = df.iloc[start:min(start + chunk_size, n_rows)]
+        write(f, _table_body(chunk))
+    write(f, tail)
+    if n_rows < len(df):
+        write(f, '<p class="text-muted">Showing %d of %d rows</p>\n' % (n_rows, len(df)))
+
+
+def write_paged_table(f, df, output_dir, first_page, prefix, page_size, chunk_size=10000,
+                      bundle=None):
+    """
+    Write the first `page_size` rows of `df` to `f` and every following page to
+    its own file in `output_dir`, with links between the pages.
+
+    Parameters
+    ==========
+    f: file
+        file opened in binary mode that the first page is written to
+    df: DataFrame
+        the table to write
+    output_dir: str
+        directory the other pages are written to
+    first_page: str
+        file name of the page `f` belongs to, so the other pages can link to it
+    prefix: str
+        other pages are named <prefix>-page-<n>.html
+    page_size: int
+        number of rows per page
+    bundle: function
+        applied to the <head> of the other pages so their stylesheet goes
+        through the same `AssetStore` as the first page
+
+    Returns
+    =======
+    list of the paths of the extra pages that were written
+    """
+    n_pages = max(1, (len(df) + page_size - 1) // page_size)
+    names = [first_page] + ['%s-page-%d.html' % (prefix, page + 1) for page in range(1, n_pages)]
+
+    write_table(f, df.iloc[:page_size], chunk_size=chunk_size)
+    write(f, _pager(names, 0))
+
+    paths = []
+    for page in range(1, n_pages):
+        head = _PAGE % {'title': '%s (page %d)' % (prefix, page + 1), 'stylesheet': BOOTSTRAP_URL}
+        path = os.path.join(output_dir, names[page])
+        with open(path, 'wb') as page_file:
+            write(page_file, bundle(head) if bundle else head)
+            write_table(page_file, df.iloc[page * page_size:(page + 1) * page_size], chunk_size=chunk_size)
+            write(page_file, _pager(names, page))
+            write(page_file, '    </div>\n  </body>\n</html>\n')
+        paths.append(path)
+    return paths
+
+
+def _table_shell(df):
+    "the opening <table> + header, and the closing tags"
+    html = df.head(0).to_html(classes=TABLE_CLASSES)
+    start = html.index('<tbody>') + len('<tbody>')
+    return html[:start] + '\n', html[html.index('</tbody>'):] + '\n'
+
+
+def _table_body(chunk):
+    "just the <tr>s for a chunk of rows"
+    html = chunk.to_html(header=False)
+    start = html.index('<tbody>') + len('<tbody>')
+    return html[start:html.index('</tbody>')].strip('\n') + '\n'
+
+
+def _pager(names, current):
+    if len(names) < 2:
+        return ''
+    links = []
+    for page, name in enumerate(names):
+        active = ' class="active"' if page==current else ''
+        links.append('<li%s><a href="%s">%d</a></li>' % (active, name, page + 1))
+    return '<ul class="pagination">%s</ul>\n' % ''.join(links)
+
+
+def write(f, s):
+    "write text or bytes to `f`. binary files get UTF-8, anything else gets text"
+    if isinstance(f, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(f, 'mode', ''):
+        if not isinstance(s, bytes):
+            s = s.encode('utf-8')
+    elif isinstance(s, bytes):
+        s = s.decode('utf-8')
+    f.write(s)
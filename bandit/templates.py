@@ -0,0 +1,117 @@
+"""
+Compiled dashboard templates. Compiling a handlebars template is by far the
+most expensive part of `make_dashboard`, so compiled templates are cached per
+process, keyed by the template's path and modification time.
+"""
+from collections import OrderedDict
+import glob
+import os
+import threading
+
+BUILTIN_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'dashboards')
+
+
+def find_template(template_name):
+    """
+    Get the path to a template. `template_name` can either be the path to your
+    own template or the name of one of the built-in templates (see dashboards/).
+    """
+    if os.path.exists(template_name):
+        return template_name
+
+    template_file = os.path.join(BUILTIN_DIR, template_name + '.html')
+    if not os.path.exists(template_file):
+        raise Exception("Could not file template file: " + template_file)
+    return template_file
+
+
+class TemplateCache(object):
+    """
+    LRU cache of compiled templates. A template is recompiled if the file has
+    been modified since it was cached.
+
+    Parameters
+    ==========
+    maxsize: int
+        max number of compiled templates to keep around
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._compiler = None
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Get the compiled template for the file at `path`
+        """
+        path = os.path.realpath(path)
+        key = (path, os.path.getmtime(path))
+        with self._lock:
+            template = self._templates.pop(key, None)
+            if template is not None:
+                self.hits += 1
+                self._templates[key] = template
+                return template
+
+        with open(path, 'rb') as f:
+            template_string = f.read().decode('utf-8')
+
+        with self._lock:
+            self.misses += 1
+            if self._compiler is None:
+                # pybars is slow to import; only pay for it once a dashboard is made
+                import pybars
+                self._compiler = pybars.Compiler()
+            template = self._compiler.compile(template_string)
+            # anything cached for an older version of this file is stale
+            for stale in [k for k in self._templates if k[0]==path]:
+                del self._templates[stale]
+            self._templates[key] = template
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+            return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+
+_cache = TemplateCache()
+
+
+def get_template(template_name):
+    """
+    Get a compiled template from the process-wide cache. Takes either a path or
+    the name of a built-in template.
+    """
+    return _cache.get(find_template(template_name))
+
+
+def precompile(template_names=None):
+    """
+    Compile templates ahead of time so the first `make_dashboard` doesn't pay
+    for it. Compiles all of the built-in templates by default.
+
+    Parameters
+    ==========
+    template_names: list
+        paths or built-in template names
+
+    Examples
+    ========
+    >>> from bandit import templates
+    >>> templates.precompile()
+    >>> templates.precompile(['raw-html', 'my-template.html'])
+    """
+    if template_names is None:
+        template_names = sorted(glob.glob(os.path.join(BUILTIN_DIR, '*.html')))
+    for template_name in template_names:
+        get_template(template_name)
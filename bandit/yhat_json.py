@@ -1,12 +1,16 @@
 import json
+import sys
 # we're not going to require numpy as a hard requirement as it can be a huge
 # pain to install. *most* of our customers will already have it installed. the ones
 # that don't are most likely just doing a lightweight test (i.e. HelloWorld) and
-# installing numpy would just be really annoying.
+# installing numpy would just be really annoying. we don't import it either:
+# objects can only be numpy arrays if numpy has already been imported by the job.
+# orjson is a lot faster than the standard library and turns NaN into null out
+# of the box. if it's installed, we'll use it.
 try:
-    import numpy as np
+    import orjson
 except ImportError as e:
-    np = None
+    orjson = None
 
 class NumpyAwareJSONEncoder(json.JSONEncoder):
     """
@@ -18,15 +22,18 @@ class NumpyAwareJSONEncoder(json.JSONEncoder):
     modified in the future to serialize non-numpy specific data types (though you'd
     prboably want to change the name of the class).
     """
-    def __init__(self, nan_str="null", **kwargs):
+    def __init__(self, nan_str="null", inf_str=None, **kwargs):
         super(NumpyAwareJSONEncoder, self).__init__(**kwargs)
         self.nan_str = nan_str
+        # None writes Infinity and -Infinity
+        self.inf_str = inf_str
         self.allow_nan = True
 
     def default(self, obj):
-        if np and isinstance(obj, np.ndarray) and obj.ndim == 1:
-            return obj.tolist()
-        return json.JSONEncoder.default(self, obj)
+        try:
+            return _to_jsonable(obj)
+        except TypeError:
+            return json.JSONEncoder.default(self, obj)
 
     # uses code from official python json.encoder module. Same licence applies.
     def iterencode(self, o, _one_shot=False):
@@ -44,24 +51,20 @@ class NumpyAwareJSONEncoder(json.JSONEncoder):
             markers = None
         if self.ensure_ascii:
             _encoder = json.encoder.encode_basestring_ascii
-
         else:
             _encoder = json.encoder.encode_basestring
-        # if self.encoding != 'utf-8':
-        #     def _encoder(o, _orig_encoder=_encoder, _encoding=self.encoding):
-        #         if isinstance(o, str):
-        #             o = o.decode(_encoding)
-        #         return _orig_encoder(o)
 
         def floatstr(o, allow_nan=self.allow_nan, _repr=repr,
             _inf=json.encoder.INFINITY, _neginf=-json.encoder.INFINITY,
-            nan_str=self.nan_str):
+            nan_str=self.nan_str, inf_str=self.inf_str):
             # Check for specials.  Note that this type of test is processor
             # and/or platform-specific, so do tests which don't depend on the
             # internals.
 
             if o != o:
                 text = nan_str
+            elif (o == _inf or o == _neginf) and inf_str is not None:
+                text = inf_str
             elif o == _inf:
                 text = 'Infinity'
             elif o == _neginf:
@@ -83,12 +86,81 @@ class NumpyAwareJSONEncoder(json.JSONEncoder):
         return _iterencode(o, 0)
 
 
+def _to_jsonable(obj):
+    """
+    Convert numpy and pandas objects (and dates) into plain python objects that
+    can be encoded. NaN and NaT turn into None. Raises TypeError for anything
+    else.
+    """
+    # if numpy hasn't been imported, obj can't be a numpy object
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.kind=='M':
+                strings = np.datetime_as_string(obj).astype(object)
+                strings[np.isnat(obj)] = None
+                return strings.tolist()
+            if obj.dtype.kind in 'fc':
+                missing = np.isnan(obj)
+                if missing.any():
+                    obj = obj.astype(object)
+                    obj[missing] = None
+            return obj.tolist()
+        if isinstance(obj, np.datetime64):
+            return None if np.isnat(obj) else str(np.datetime_as_string(obj))
+        if isinstance(obj, np.generic):
+            value = obj.item()
+            return None if value!=value else value
+
+    # if pandas hasn't been imported, obj can't be a pandas object
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        if isinstance(obj, pd.DataFrame):
+            return obj.to_dict(orient='records')
+        if isinstance(obj, pd.Series):
+            return _to_jsonable(obj.values)
+        if obj is pd.NaT:
+            return None
+
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError("%r is not JSON serializable" % (obj, ))
+
+
+# orjson can't be configured, so the other encoders are set up to match it: no
+# spaces, non-ASCII left as is, and NaN/Infinity written as null. that way
+# charts.ndjson and the reports we send don't depend on what's installed
+_SEPARATORS = (',', ':')
+
+# the C accelerated encoder in the standard library. it can't turn NaN into null,
+# so anything with a NaN or infinity in it gets handed off to the NumpyAwareJSONEncoder
+_fast_encoder = json.JSONEncoder(allow_nan=False, default=_to_jsonable, separators=_SEPARATORS,
+                                 ensure_ascii=False)
+
+
 # we're going to create a json de-serializer that will by default use
 # NumpyAwareJSONEncoder with json
 def json_dumps(data, **kwargs):
     """
     Uses json.dumps to serialize data into JSON. In addition to the standard
-    json.dumps function, we're also using the NumpyAwareJSONEncoder to handle
-    numpy arrays and the `ignore_nan` parameter by default to handle np.nan values.
+    json.dumps function, we're also handling numpy arrays and scalars, pandas
+    Series/DataFrames, and turning NaNs and infinities into nulls. The output
+    is compact and leaves non-ASCII characters unescaped.
+
+    Encoding goes through orjson when it's installed, then the standard library's
+    C encoder, and only falls back to the (much slower) pure python
+    NumpyAwareJSONEncoder when the data has NaNs the faster encoders can't handle.
     """
-    return json.dumps(data, cls=NumpyAwareJSONEncoder, allow_nan=False)
+    if orjson is not None:
+        try:
+            # orjson's own numpy support (OPT_SERIALIZE_NUMPY) can crash the
+            # interpreter on datetime64 arrays with NaT in them, so numpy objects
+            # go through _to_jsonable like they do for the standard library
+            return orjson.dumps(data, default=_to_jsonable, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    try:
+        return _fast_encoder.encode(data)
+    except ValueError:
+        return json.dumps(data, cls=NumpyAwareJSONEncoder, allow_nan=False, inf_str="null",
+                          separators=_SEPARATORS, ensure_ascii=False)
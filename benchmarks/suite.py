@@ -0,0 +1,304 @@
+"""
+Benchmarks for the client's I/O and serialization hot paths. Everything runs
+against a temporary job root and a local stand-in Bandit server (see
+`bandit.local`), so no real worker or server is needed and runs are
+reproducible.
+
+Save the results of a release and compare later runs against them:
+
+    $ python benchmarks/suite.py --output benchmarks/results/0.3.0.json
+    $ python benchmarks/suite.py --compare benchmarks/results/0.3.0.json
+    $ python benchmarks/suite.py -k dashboard
+
+`--compare` exits with 1 if anything got slower (or uses more memory) than
+`--threshold` allows. Peak memory is measured with tracemalloc.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import tracemalloc
+from bandit import Bandit, Email, templates, yhat_json, __version__
+from bandit.job import Metadata
+from bandit.local import LocalServer, make_job_root
+from bandit.yhat_json import json_dumps, NumpyAwareJSONEncoder
+
+BENCHMARKS = []
+
+
+def benchmark(name, **params):
+    """
+    Register a benchmark. The decorated function does any setup, then returns
+    (fn, ops): a function to time and the number of operations one call does.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func, params))
+        return func
+    return decorator
+
+
+class Environment(object):
+    "the job root and stand-in server shared by the benchmarks"
+    def __init__(self):
+        self.job_root = make_job_root()
+        os.environ['BANDIT_JOB_ROOT'] = self.job_root
+        os.environ['BANDIT_JOB_ID'] = 'bench'
+        self.server = LocalServer(os.path.join(self.job_root, 'metadata', 'reports.ndjson'))
+        self.tmp = tempfile.mkdtemp(prefix='bandit-bench-files-')
+
+    def client(self):
+        bandit = Bandit("bench", "bench", self.server.url, backoff_factor=0)
+        bandit.output_dir = os.path.join(self.job_root, 'output-files', '')
+        return bandit
+
+    def file(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def close(self):
+        self.server.close()
+        shutil.rmtree(self.tmp)
+        shutil.rmtree(self.job_root)
+
+
+# report ######################################################################
+
+@benchmark("report (one request per point)")
+def report_direct(env):
+    bandit = env.client()
+    def fn():
+        for i in range(200):
+            bandit.report("loss", 0.25)
+    return fn, 200
+
+
+@benchmark("report (buffered)")
+def report_buffered(env):
+    bandit = env.client()
+    bandit.buffer_reports(flush_size=1000, flush_interval=60)
+    def fn():
+        for i in range(5000):
+            bandit.report("loss", 0.25)
+        bandit.flush_reports()
+    return fn, 5000
+
+
+@benchmark("report (background)")
+def report_background(env):
+    bandit = env.client()
+    reporter = bandit.background_reports(batch_size=1000, flush_interval=0.01)
+    def fn():
+        for i in range(5000):
+            bandit.report("loss", 0.25)
+        reporter.flush()
+    return fn, 5000
+
+
+@benchmark("report_many (numpy, 10k points)")
+def report_many(env):
+    bandit = env.client()
+    ys = np.random.normal(size=10000)
+    return (lambda: bandit.report_many("loss", ys)), 10000
+
+
+@benchmark("report (aggregated, lttb)")
+def report_aggregated(env):
+    bandit = env.client()
+    bandit.aggregate_reports(interval=60, max_points=100)
+    def fn():
+        for i in range(10000):
+            bandit.report("loss", 0.25)
+        bandit.flush_reports()
+    return fn, 10000
+
+
+# metadata ####################################################################
+
+for _keys in (10, 100, 1000):
+    @benchmark("metadata set (%d keys)" % _keys, keys=_keys)
+    def metadata_set(env, keys):
+        metadata = Metadata(dict(("key-%d" % i, i * 1.5) for i in range(keys)))
+        def fn():
+            for i in range(100):
+                metadata["key-0"] = i
+        return fn, 100
+
+    @benchmark("metadata update (%d keys)" % _keys, keys=_keys)
+    def metadata_update(env, keys):
+        metadata = Metadata()
+        data = dict(("key-%d" % i, i * 1.5) for i in range(keys))
+        return (lambda: metadata.update(data)), 1
+
+
+# json ########################################################################
+
+def _legacy_dumps(data):
+    "the pure python encoder json_dumps used to be built on"
+    return json.dumps(data, cls=NumpyAwareJSONEncoder, allow_nan=False)
+
+
+def _stdlib_dumps(data):
+    "json_dumps as it runs when orjson isn't installed"
+    orjson, yhat_json.orjson = yhat_json.orjson, None
+    try:
+        return json_dumps(data)
+    finally:
+        yhat_json.orjson = orjson
+
+
+_ENCODERS = [("json_dumps", json_dumps), ("json_dumps without orjson", _stdlib_dumps),
+             ("legacy encoder", _legacy_dumps)]
+
+_PAYLOADS = [
+    ("report point", lambda: {"tag_name": "loss", "x": 0, "y": 0.25}, 1000),
+    ("report point (numpy)", lambda: {"tag_name": "loss", "x": 0, "y": np.float64(0.25)}, 1000),
+    ("1-d array", lambda: np.random.normal(size=10000), 10),
+    ("1-d array with NaN", lambda: np.where(np.arange(10000) % 10, np.random.normal(size=10000), np.nan), 10),
+    ("2-d array", lambda: np.random.normal(size=(100, 100)), 10),
+    ("DataFrame", lambda: pd.DataFrame(np.random.normal(size=(1000, 5)), columns=list("abcde")), 10),
+    ("metadata dict", lambda: dict(("key-%d" % i, {"value": i * 1.5, "tags": ["a", "b"]}) for i in range(200)), 100),
+]
+
+for _encoder_name, _encoder in _ENCODERS:
+    for _name, _make, _number in _PAYLOADS:
+        @benchmark("%s %s" % (_encoder_name, _name), encoder=_encoder, make=_make, number=_number)
+        def dumps(env, encoder, make, number):
+            payload = make()
+            def fn():
+                for i in range(number):
+                    encoder(payload)
+            return fn, number
+
+
+# dashboards ##################################################################
+
+for _rows in (1000, 10000, 50000):
+    for _stream in (False, True):
+        @benchmark("make_dashboard (%d rows%s)" % (_rows, ", streamed" if _stream else ""),
+                   rows=_rows, stream=_stream)
+        def dashboard(env, rows, stream):
+            bandit = env.client()
+            df = pd.DataFrame(np.random.normal(size=(rows, 5)), columns=list("abcde"))
+            return (lambda: bandit.make_dashboard("table.html", template_name="single-table",
+                                                  table=df, stream=stream)), 1
+
+for _cached in (False, True):
+    @benchmark("make_dashboard (small, %s template)" % ("cached" if _cached else "compiled"), cached=_cached)
+    def dashboard_template(env, cached):
+        bandit = env.client()
+        df = pd.DataFrame(np.random.normal(size=(20, 5)), columns=list("abcde"))
+        tables = [df.head().to_html(), df.tail().to_html()]
+        def fn():
+            for i in range(100):
+                if not cached:
+                    templates._cache.clear()
+                bandit.make_dashboard("segment-%d.html" % i, template_name="image-with-tables",
+                                      img="plot.png", tables=tables)
+        return fn, 100
+
+
+# email #######################################################################
+
+@benchmark("Email.add_attachment (900kB)")
+def attachment(env):
+    path = env.file("data.bin", os.urandom(900 * 1000))
+    return (lambda: Email(write_json=False).add_attachment(path)), 1
+
+
+@benchmark("Email.add_attachment (20MB csv, gzipped)")
+def attachment_gzip(env):
+    row = b"2017-01-01,12345,0.123456789,some text,more text\n"
+    path = env.file("data.csv", row * (20 * 1000 * 1000 // len(row)))
+    return (lambda: Email(write_json=False).add_attachment(path, compress="auto")), 1
+
+
+###############################################################################
+
+def run(name, func, params, env, repeat):
+    fn, ops = func(env, **params)
+    fn()  # warm up
+    best = min(_time(fn) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        fn()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "ops": ops, "us_per_op": best / ops * 1e6, "peak_bytes": peak_bytes}
+
+
+def _time(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def compare(results, baseline, threshold):
+    "print how `results` changed since `baseline`. returns the names that regressed"
+    regressions = []
+    print("\n%-44s %12s %12s %9s %9s" % ("compared to " + baseline["meta"]["version"], "us/op", "was", "time", "memory"))
+    for name in [name for name, _, _ in BENCHMARKS if name in results]:
+        result = results[name]
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        time_ratio = result["us_per_op"] / old["us_per_op"]
+        memory_ratio = None
+        if result["peak_bytes"] and old.get("peak_bytes"):
+            memory_ratio = float(result["peak_bytes"]) / old["peak_bytes"]
+        flag = ""
+        if time_ratio > 1 + threshold or (memory_ratio or 0) > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("%-44s %12.1f %12.1f %8.2fx %9s%s" % (name, result["us_per_op"], old["us_per_op"], time_ratio,
+                                                   "%.2fx" % memory_ratio if memory_ratio else "n/a", flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the bandit client")
+    parser.add_argument("-k", dest="keyword", help="only run benchmarks with this in their name")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs; the best one counts")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown (0.2 is 20%%) that counts as a regression")
+    args = parser.parse_args(argv)
+
+    env = Environment()
+    results = {}
+    print("%-44s %12s %12s %12s" % ("benchmark", "ops/s", "us/op", "peak memory"))
+    try:
+        for name, func, params in BENCHMARKS:
+            if args.keyword and args.keyword not in name:
+                continue
+            result = results[name] = run(name, func, params, env, args.repeat)
+            peak = "%.1fMB" % (result["peak_bytes"] / 1e6)
+            print("%-44s %12.0f %12.1f %12s" % (name, result["ops"] / result["seconds"], result["us_per_op"], peak))
+            sys.stdout.flush()
+    finally:
+        env.close()
+
+    if args.output:
+        meta = {"version": __version__, "python": platform.python_version(),
+                "platform": platform.platform(), "time": time.time()}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -1,7 +1,6 @@
 import os
 
-from distutils.core import setup
-from setuptools import find_packages
+from setuptools import setup, find_packages
 
 # Get version from defined python file
 with open(
@@ -24,8 +23,14 @@ setup(
     description="Bandit client for Yhat (http://yhat.com/)",
     license="BSD",
     classifiers=(
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
     ),
+    python_requires='>=3.5',
     install_requires=[
     ],
+    entry_points={
+        'console_scripts': ['bandit=bandit.local:main'],
+    },
     keywords=['yhat', 'bandit'],
 )
@@ -0,0 +1,49 @@
+"""
+setUp helpers shared by the tests. Everything they do is undone with
+`addCleanup`, so it's cleaned up even if the rest of setUp fails and nothing
+leaks into the tests that run after.
+
+    def setUp(self):
+        self.root = job_root(self)
+        self.stub = report_server(self)
+"""
+import os
+import shutil
+from bandit.local import make_job_root
+from stubserver import StubServer
+
+
+def set_env(test, **env):
+    "set environment variables until `test` is done"
+    old = dict((key, os.environ.get(key)) for key in env)
+    def restore():
+        for key, value in old.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    test.addCleanup(restore)
+    os.environ.update(env)
+
+
+def job_root(test, job_id='7'):
+    "make a job root and point $BANDIT_JOB_ROOT and $BANDIT_JOB_ID at it"
+    root = make_job_root()
+    test.addCleanup(shutil.rmtree, root, True)
+    set_env(test, BANDIT_JOB_ROOT=root, BANDIT_JOB_ID=job_id)
+    return root
+
+
+def stub_server(test):
+    "a StubServer that's closed when `test` is done"
+    stub = StubServer()
+    test.addCleanup(stub.close)
+    return stub
+
+
+def report_server(test, job_id='7'):
+    "a StubServer that accepts data points for the job"
+    stub = stub_server(test)
+    stub.respond('PUT', '/api/jobs/%s/report' % job_id, 200, {'status': 'OK'})
+    stub.respond('PUT', '/api/jobs/%s/reports' % job_id, 200, {'status': 'OK'})
+    return stub
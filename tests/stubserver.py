@@ -0,0 +1,80 @@
+"""
+A tiny HTTP server that stands in for Bandit in the tests. Register canned
+responses with `stub.respond(method, path, status, body)`; every request that
+comes in is recorded on `stub.requests`, and `stub.connections` counts the
+connections that were opened.
+"""
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubServer(object):
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections open between requests, like a real server
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                path = self.path.split('?')[0]
+                status, payload = stub._next(self.command, path, self.path, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def respond(self, method, path, status=200, body=None):
+        """
+        Queue a response for `method path`. The last response registered for a
+        path keeps being served once the queue runs out. `body` can also be a
+        function that takes the request and returns (status, body).
+        """
+        with self._lock:
+            self._responses.setdefault((method, path), []).append((status, body))
+
+    def _next(self, method, path, full_path, body):
+        with self._lock:
+            request = {'method': method, 'path': path, 'full_path': full_path, 'body': body}
+            self.requests.append(request)
+            queue = self._responses.get((method, path))
+            if not queue:
+                return 404, {'status': 'error', 'message': 'not found'}
+            status, payload = queue.pop(0) if len(queue) > 1 else queue[0]
+        if callable(payload):
+            return payload(request)
+        return status, payload
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
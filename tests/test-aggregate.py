@@ -0,0 +1,158 @@
+import unittest
+import json
+import os
+import atexit
+import numpy as np
+from bandit import Bandit
+from bandit.aggregate import Aggregator, lttb, bucket
+from fixtures import job_root, report_server, stub_server
+
+
+class FakeBandit(object):
+    def __init__(self):
+        self.points = []
+
+    def _dispatch(self, lines):
+        self.points.extend(json.loads(line) for line in lines)
+
+    def flush_reports(self):
+        pass
+
+
+class TestDownsample(unittest.TestCase):
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        xs = list(range(1000))
+        ys = [0.0] * 1000
+        ys[517] = 100.0
+        picked = lttb(xs, ys, 20)
+        self.assertEqual(len(picked), 20)
+        self.assertEqual(picked[0], (0, 0.0))
+        self.assertEqual(picked[-1], (999, 0.0))
+        self.assertTrue((517, 100.0) in picked)
+
+    def test_lttb_short_series(self):
+        self.assertEqual(lttb([0, 1], [5, 6], 10), [(0, 5), (1, 6)])
+
+    def test_bucket(self):
+        xs = list(range(10))
+        ys = [float(x) for x in xs]
+        self.assertEqual(bucket(xs, ys, 2, 'mean'), [(4, 2.0), (9, 7.0)])
+        self.assertEqual(bucket(xs, ys, 2, 'max'), [(4, 4.0), (9, 9.0)])
+        self.assertEqual(bucket(xs, ys, 3, 'count'), [(2, 3), (5, 3), (9, 4)])
+
+
+class TestAggregator(unittest.TestCase):
+
+    def test_max_points_per_tag(self):
+        bandit = FakeBandit()
+        aggregator = Aggregator(bandit, interval=60, max_points=10)
+        aggregator.extend('loss', range(1000), np.random.normal(size=1000))
+        aggregator.add('acc', 0, 0.5)
+        aggregator.flush()
+        tags = [p['tag_name'] for p in bandit.points]
+        self.assertEqual(tags.count('loss'), 10)
+        self.assertEqual(tags.count('acc'), 1)
+        self.assertEqual(aggregator.stats(), {'received': 1001, 'sent': 11})
+
+    def test_reservoir(self):
+        bandit = FakeBandit()
+        aggregator = Aggregator(bandit, interval=60, max_points=50, method='reservoir')
+        aggregator.extend('loss', range(10000), range(10000))
+        self.assertEqual(len(aggregator._windows['loss'][1]), 50)
+        aggregator.flush()
+        xs = [p['x'] for p in bandit.points]
+        self.assertEqual(xs, sorted(xs))
+        self.assertEqual(len(xs), 50)
+
+    def test_flush_on_interval(self):
+        bandit = FakeBandit()
+        aggregator = Aggregator(bandit, interval=0, max_points=10, method='last')
+        aggregator.add('loss', 0, 1.5)
+        self.assertEqual(bandit.points, [{'tag_name': 'loss', 'x': 0, 'y': 1.5}])
+
+    def test_bad_method(self):
+        self.assertRaises(Exception, Aggregator, FakeBandit(), method='median')
+
+
+class TestReport(unittest.TestCase):
+
+    def setUp(self):
+        self.root = job_root(self)
+        self.stub = report_server(self)
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+
+    def sent(self):
+        points = []
+        for request in self.stub.requests:
+            data = json.loads(request['body'].decode('utf-8'))
+            points.extend(data if isinstance(data, list) else [data])
+        return points
+
+    def test_steps(self):
+        self.bandit.report("loss", 0.5)
+        self.bandit.report("loss", 0.4)
+        self.bandit.report("acc", 0.1)
+        self.bandit.report("loss", 0.3, x=10)
+        self.assertEqual([(p['tag_name'], p['x']) for p in self.sent()],
+                         [('loss', 0), ('loss', 1), ('acc', 0), ('loss', 10)])
+
+    def test_report_many(self):
+        self.bandit.report("loss", 1.0)
+        self.bandit.report_many("loss", np.array([0.5, 0.25, 0.125]))
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual([(p['x'], p['y']) for p in self.sent()], [(0, 1.0), (1, 0.5), (2, 0.25), (3, 0.125)])
+        with open(os.path.join(self.root, 'metadata', 'charts.ndjson')) as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+    def test_no_bulk_endpoint(self):
+        self.stub.close()
+        self.stub = stub_server(self)
+        self.stub.respond('PUT', '/api/jobs/7/report', 200, {'status': 'OK'})
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+        self.bandit.report_many("loss", [0.5, 0.25])
+        self.bandit.report_many("loss", [0.125])
+        self.bandit.report_many("loss", [0.1, 0.05])
+        # the bulk endpoint is only tried once
+        paths = [r['path'] for r in self.stub.requests]
+        self.assertEqual(paths, ['/api/jobs/7/reports'] + ['/api/jobs/7/report'] * 5)
+        self.stub.requests.pop(0)
+        self.assertEqual([(p['x'], p['y']) for p in self.sent()], [(0, 0.5), (1, 0.25), (2, 0.125), (3, 0.1), (4, 0.05)])
+
+    def test_report_many_checks_values(self):
+        self.assertRaises(Exception, self.bandit.report_many, "loss", [1, "two"])
+        self.assertRaises(Exception, self.bandit.report_many, "loss", [1, 2], xs=[0])
+
+    def test_aggregate(self):
+        aggregator = self.bandit.aggregate_reports(interval=60, max_points=5, method='mean')
+        self.bandit.report_many("loss", np.arange(100, dtype=float))
+        self.bandit.report("loss", 100.0)
+        self.assertEqual(self.stub.requests, [])
+        self.bandit.flush_reports()
+        points = self.sent()
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual([p['x'] for p in points], [19, 39, 59, 79, 100])
+        self.assertEqual(points[0]['y'], 9.5)
+        aggregator.close()
+
+    def test_replacing_unregisters_exit_handlers(self):
+        handlers = []
+        def unregister(func):
+            handlers[:] = [h for h in handlers if h!=func]
+        original = atexit.register, atexit.unregister
+        atexit.register, atexit.unregister = handlers.append, unregister
+        try:
+            self.bandit.aggregate_reports(interval=60)
+            self.bandit.aggregate_reports(interval=60)
+            self.bandit.buffer_reports(flush_interval=60)
+            self.bandit.buffer_reports(flush_interval=60)
+            # one for the aggregator and one for the reporter
+            self.assertEqual(handlers, [self.bandit._reporter.flush, self.bandit._aggregator.close])
+            self.bandit._aggregator.close()
+            self.bandit._reporter.close()
+            self.assertEqual(handlers, [])
+        finally:
+            atexit.register, atexit.unregister = original
+
+if __name__=="__main__":
+    unittest.main()
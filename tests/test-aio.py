@@ -0,0 +1,58 @@
+import unittest
+import asyncio
+import time
+from bandit import aio
+from bandit.aio import AsyncBandit
+from stubserver import StubServer
+
+
+loop = asyncio.new_event_loop()
+
+def run(coro):
+    return loop.run_until_complete(coro)
+
+
+@unittest.skipIf(aio.aiohttp is None, "AsyncBandit needs aiohttp")
+class TestAsync(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.bandit = AsyncBandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+
+    def tearDown(self):
+        run(self.bandit.close())
+        self.stub.close()
+
+    def test_local_mode(self):
+        bandit = AsyncBandit()
+        self.assertTrue(bandit._is_local)
+        self.assertEqual(run(bandit.report("ze-tag", 1)), {'status': 'OK', 'message': 'DRY RUN'})
+
+    def test_get_jobs(self):
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': [{'username': 'glamp', 'name': 'echo1'}]})
+        jobs = run(self.bandit.get_jobs())
+        self.assertEqual(jobs[0].name, 'echo1')
+
+    def test_retries(self):
+        self.stub.respond('GET', '/api/job-results', 503, {})
+        self.stub.respond('GET', '/api/job-results', 200, {'jobResults': []})
+        self.assertEqual(run(self.bandit.get_job_results()), [])
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_runs_concurrently(self):
+        def slow(request):
+            time.sleep(0.2)
+            return 200, {'status': 'OK'}
+        self.stub.respond('GET', '/api/projects/glamp/bandit-demos/jobs/echo1', 200, slow)
+
+        async def run_many():
+            jobs = [self.bandit.run('bandit-demos', 'echo1') for i in range(10)]
+            return await asyncio.gather(*jobs)
+
+        start = time.time()
+        responses = run(run_many())
+        self.assertEqual([r['status'] for r in responses], ['OK'] * 10)
+        self.assertTrue(time.time() - start < 1.5)
+
+if __name__=="__main__":
+    unittest.main()
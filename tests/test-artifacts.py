@@ -0,0 +1,131 @@
+import unittest
+import hashlib
+import io
+import json
+import os
+from bandit import Bandit
+from bandit.local import LocalServer
+from fixtures import job_root
+
+
+class FlakyServer(LocalServer):
+    "fails the first attempt at the parts in `fail`, and the first `fail_starts` uploads"
+    def __init__(self, reports_path, fail=(), fail_starts=0):
+        self.fail = set(fail)
+        self.fail_starts = fail_starts
+        self.parts_sent = []
+        LocalServer.__init__(self, reports_path)
+
+    def _handle_artifact(self, method, parts, body, headers):
+        if method=='POST' and not parts and self.fail_starts:
+            self.fail_starts -= 1
+            return 500, {'status': 'error'}
+        if method=='PUT' and len(parts)==3:
+            self.parts_sent.append(int(parts[2]))
+            if int(parts[2]) in self.fail:
+                self.fail.remove(int(parts[2]))
+                return 500, {'status': 'error'}
+        return LocalServer._handle_artifact(self, method, parts, body, headers)
+
+
+class TestArtifacts(unittest.TestCase):
+
+    def setUp(self):
+        self.root = job_root(self)
+        self.data = os.urandom(10500)
+
+    def store(self, fail=(), fail_starts=0, **kwargs):
+        self.server = FlakyServer(os.path.join(self.root, 'metadata', 'reports.ndjson'), fail=fail,
+                                  fail_starts=fail_starts)
+        self.addCleanup(self.server.close)
+        bandit = Bandit("glamp", "apikey", self.server.url, retries=0)
+        return bandit.artifacts(chunk_size=1000, **kwargs)
+
+    def output(self, *parts):
+        return os.path.join(self.root, 'output-files', *parts)
+
+    def uploaded(self, name):
+        with open(os.path.join(self.server.artifacts_dir, name), 'rb') as f:
+            return f.read()
+
+    def manifest(self):
+        with open(self.output('artifacts.json')) as f:
+            return json.load(f)
+
+    def test_write(self):
+        artifacts = self.store()
+        with artifacts.open('models/model.bin') as f:
+            f.write(self.data[:300])
+            f.write(self.data[300:])
+            self.assertFalse(os.path.exists(self.output('models', 'model.bin')))
+        with open(self.output('models', 'model.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.output('models')), ['model.bin'])
+        self.assertEqual(self.manifest(), {'models/model.bin': {
+            'size': 10500, 'sha256': hashlib.sha256(self.data).hexdigest(), 'uploaded': False}})
+        self.assertRaises(Exception, artifacts.upload, 'models/model.bin')
+
+    def test_abort(self):
+        artifacts = self.store()
+        try:
+            with artifacts.open('model.bin') as f:
+                f.write(b'half')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(sorted(os.listdir(self.output())), [])
+
+    def test_bad_name(self):
+        artifacts = self.store()
+        self.assertRaises(Exception, artifacts.open, '../metadata/metadata.json')
+        self.assertRaises(Exception, artifacts.open, '/tmp/model.bin')
+
+    def test_upload(self):
+        artifacts = self.store(upload=True, workers=3)
+        with artifacts.open('model.bin') as f:
+            for i in range(0, len(self.data), 700):
+                f.write(self.data[i:i + 700])
+        src = self.output('..', 'data.csv')
+        with open(src, 'wb') as f:
+            f.write(b'a,b\n1,2\n')
+        artifacts.save('data.csv', src)
+        self.assertEqual(sorted(a.name for a in artifacts.wait()), ['data.csv', 'model.bin'])
+        self.assertEqual(self.uploaded('model.bin'), self.data)
+        self.assertEqual(self.uploaded('data.csv'), b'a,b\n1,2\n')
+        self.assertEqual(sorted(self.server.parts_sent), [0] * 2 + list(range(1, 11)))
+        self.assertTrue(self.manifest()['model.bin']['uploaded'])
+        self.assertEqual(self.server.n_artifacts, 2)
+
+    def test_resume(self):
+        artifacts = self.store(fail=[3, 7], upload=True)
+        artifacts.save('model.bin', io.BytesIO(self.data))
+        self.assertRaises(Exception, artifacts.wait)
+        self.assertFalse(self.manifest()['model.bin']['uploaded'])
+
+        self.server.parts_sent = []
+        self.assertEqual(artifacts.upload('model.bin').result().name, 'model.bin')
+        self.assertEqual(sorted(self.server.parts_sent), [3, 7])
+        self.assertEqual(self.uploaded('model.bin'), self.data)
+        self.assertTrue(self.manifest()['model.bin']['uploaded'])
+
+    def test_start_fails(self):
+        artifacts = self.store(fail_starts=1, upload=True)
+        artifacts.save('model.bin', io.BytesIO(self.data))
+        self.assertRaises(Exception, artifacts.wait)
+        # the next part started the upload, so only one part is missing
+        self.server.parts_sent = []
+        artifacts.upload('model.bin').result()
+        self.assertEqual(len(self.server.parts_sent), 1)
+        self.assertEqual(self.uploaded('model.bin'), self.data)
+
+    def test_server_down(self):
+        artifacts = self.store(upload=True)
+        self.server.close()
+        with artifacts.open('model.bin') as f:
+            f.write(self.data)
+        with open(self.output('model.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertRaises(Exception, artifacts.wait)
+
+if __name__=="__main__":
+    unittest.main()
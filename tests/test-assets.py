@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import tempfile
+from bandit import Bandit
+from bandit.assets import AssetStore, BOOTSTRAP_URL
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.bandit = Bandit("glamp", "apikey", "http://localhost/")
+        self.bandit.output_dir = tempfile.mkdtemp() + '/'
+        self.dir = tempfile.mkdtemp()
+        self.plot = self.file('plot.png', b'\x89PNG not really')
+        self.css = self.file('bootstrap.css', b'body { color: red; }')
+
+    def tearDown(self):
+        shutil.rmtree(self.bandit.output_dir)
+        shutil.rmtree(self.dir)
+
+    def file(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def read(self, name):
+        with open(self.bandit.output_dir + name, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def test_copy_dedups(self):
+        copy = self.file('copy-of-plot.png', b'\x89PNG not really')
+        for i, img in enumerate([self.plot, copy]):
+            self.bandit.make_dashboard('dash-%d.html' % i, template_name='image-with-tables',
+                                       img=img, tables=[], assets='copy')
+        assets = os.listdir(self.bandit.output_dir + 'assets')
+        self.assertEqual(len(assets), 1)
+        self.assertTrue(('src="assets/%s"' % assets[0]) in self.read('dash-0.html'))
+        self.assertTrue(('src="assets/%s"' % assets[0]) in self.read('dash-1.html'))
+        # remote stylesheets are left alone
+        self.assertTrue(BOOTSTRAP_URL in self.read('dash-0.html'))
+
+    def test_inline(self):
+        self.bandit.make_dashboard('dash.html', template_name='image-with-tables', img=self.plot,
+                                   tables=[], assets='inline', stylesheet=self.css)
+        html = self.read('dash.html')
+        self.assertTrue('src="data:image/png;base64,' in html)
+        self.assertTrue('href="data:text/css;base64,' in html)
+        self.assertFalse(BOOTSTRAP_URL in html)
+        self.assertEqual(os.listdir(self.bandit.output_dir), ['dash.html'])
+
+    def test_paged_tables(self):
+        import pandas as pd
+        df = pd.DataFrame({'a': range(25)})
+        self.bandit.make_dashboard('dash.html', template_name='single-table', table=df, page_size=10,
+                                   assets='copy', stylesheet=self.css)
+        css = 'href="assets/%s"' % os.listdir(self.bandit.output_dir + 'assets')[0]
+        for name in ['dash.html', 'dash-table-page-2.html', 'dash-table-page-3.html']:
+            self.assertTrue(css in self.read(name))
+            self.assertFalse(BOOTSTRAP_URL in self.read(name))
+
+    def test_missing_files_are_left_alone(self):
+        store = AssetStore(self.bandit.output_dir)
+        html = '<img src="nope.png" /><img src="%s" />' % self.plot
+        self.assertEqual(store.rewrite(html).count('assets/'), 1)
+
+    @unittest.skipIf(Image is None, "Pillow isn't installed")
+    def test_downscale(self):
+        big = os.path.join(self.dir, 'big.png')
+        Image.new('RGB', (2000, 1000), 'white').save(big)
+        store = AssetStore(self.bandit.output_dir, max_image_size=(400, 400))
+        url = store.add(big)
+        self.assertEqual(Image.open(self.bandit.output_dir + url).size, (400, 200))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import shutil
+import tempfile
+from bandit import JobResultCache
+from bandit.bandit import JobResult
+
+
+class FakeBandit(object):
+    def __init__(self):
+        self.results = []
+        self.calls = []
+
+    def add(self, n, status='success', project='demos'):
+        self.results.append({'id': n, 'project': project, 'name': 'echo1', 'n': n, 'status': status,
+                             'startTime': '2017-01-01T00:00:%02d' % n})
+
+    def iter_job_results(self, since=None):
+        self.calls.append(since)
+        for r in self.results:
+            if since is None or r['startTime'] >= since:
+                yield JobResult(**r)
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.bandit = FakeBandit()
+        for n in range(10):
+            self.bandit.add(n, project='demos' if n % 2 else 'models')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_incremental_sync(self):
+        cache = JobResultCache(self.bandit, cache_dir=self.dir)
+        self.assertEqual(cache.sync(), 10)
+        self.bandit.add(10)
+        self.bandit.add(11)
+        # only the newest result we had, plus the 2 new ones
+        self.assertEqual(cache.sync(), 3)
+        self.assertEqual(self.bandit.calls, [None, '2017-01-01T00:00:09'])
+        self.assertEqual(len(cache.query(refresh=False)), 12)
+
+    def test_unfinished_results_are_refetched(self):
+        self.bandit.add(10, status='running')
+        self.bandit.add(11)
+        cache = JobResultCache(self.bandit, cache_dir=self.dir)
+        cache.sync()
+        self.bandit.results[10]['status'] = 'success'
+        cache.sync()
+        self.assertEqual(self.bandit.calls[-1], '2017-01-01T00:00:10')
+        self.assertEqual(cache.query(status='running', refresh=False), [])
+
+    def test_query(self):
+        cache = JobResultCache(self.bandit, cache_dir=self.dir)
+        results = cache.query(project='models', since='2017-01-01T00:00:04')
+        self.assertEqual([r.n for r in results], [4, 6, 8])
+        # still fresh, so no second trip to the server
+        cache.query(project='demos')
+        self.assertEqual(len(self.bandit.calls), 1)
+
+    def test_eviction(self):
+        cache = JobResultCache(self.bandit, cache_dir=self.dir, max_rows=4)
+        cache.sync()
+        self.assertEqual([r.n for r in cache.query(refresh=False)], [6, 7, 8, 9])
+        cache = JobResultCache(self.bandit, cache_dir=self.dir, ttl=-1)
+        cache.sync()
+        self.assertEqual(cache.query(refresh=False), [])
+
+    def test_persists(self):
+        JobResultCache(self.bandit, cache_dir=self.dir).sync()
+        cache = JobResultCache(self.bandit, cache_dir=self.dir)
+        self.assertEqual(len(cache.query(refresh=False)), 10)
+
+if __name__=="__main__":
+    unittest.main()
@@ -4,8 +4,8 @@ from ggplot import *
 p = ggplot(diamonds, aes(x='price')) + geom_density()
 p.save('/tmp/plot.png')
 bandit = Bandit()
-# print bandit.make_dashboard(table=mtcars.to_html(classes="table"))
-# print bandit.make_dashboard(table=mtcars)
+# print(bandit.make_dashboard(table=mtcars.to_html(classes="table")))
+# print(bandit.make_dashboard(table=mtcars))
 # print(bandit.make_dashboard(
 #     template_name='image-with-tables',
 #     img='/tmp/plot.png',
@@ -1,6 +1,12 @@
 import unittest
-from bandit import Bandit
+from bandit import Bandit, db
+from bandit import database
+from bandit.database import ConnectionPool, Database, _options
 import os
+import shutil
+import sqlite3
+import tempfile
+import threading
 
 
 class TestBasic(unittest.TestCase):
@@ -11,5 +17,103 @@ class TestBasic(unittest.TestCase):
         connection = bandit.get_connection('theoreticalDB')
         self.assertEqual('hello', connection)
 
+
+class TestPool(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.db')
+        os.environ['DATABASE_testdb'] = 'sqlite:///' + self.path
+        self.db = db('testdb', pool_size=2)
+        self.db.execute("create table users (id integer, name text)")
+        with self.db.connect() as conn:
+            conn.executemany("insert into users values (?, ?)", [(i, 'user%d' % i) for i in range(25)])
+
+    def tearDown(self):
+        self.db.close()
+        database._databases.clear()
+        shutil.rmtree(self.dir)
+
+    def test_same_database(self):
+        self.assertTrue(db('testdb') is self.db)
+        self.assertTrue(Bandit().db('testdb') is self.db)
+        self.assertTrue(db('testdb', pool_size=2, recycle=3600) is self.db)
+
+    def test_different_pool_options(self):
+        self.assertRaises(Exception, db, 'testdb', pool_size=10)
+        self.assertRaises(Exception, Bandit().db, 'testdb', recycle=60)
+
+    def test_reuses_connections(self):
+        for i in range(10):
+            self.db.execute("select count(*) from users")
+        self.assertEqual(self.db.pool.stats()['opened'], 1)
+
+    def test_read_sql(self):
+        df = self.db.read_sql("select * from users where id < ?", (3, ))
+        self.assertEqual(list(df.columns), ['id', 'name'])
+        self.assertEqual(list(df['name']), ['user0', 'user1', 'user2'])
+
+    def test_read_sql_chunks(self):
+        chunks = list(self.db.read_sql("select * from users", chunksize=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(self.db.pool.stats()['idle'], 1)
+
+    def test_chunks_closed_early(self):
+        chunks = self.db.read_sql("select * from users", chunksize=10)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.db.pool.stats(), {'open': 1, 'idle': 1, 'opened': 1})
+
+    def test_rollback(self):
+        try:
+            with self.db.connect() as conn:
+                conn.execute("delete from users")
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(self.db.execute("select count(*) from users"), [(25, )])
+
+    def test_missing(self):
+        self.assertRaises(Exception, db, 'nope')
+
+    def test_recycle(self):
+        pool = ConnectionPool(lambda: sqlite3.connect(self.path), size=1, recycle=0)
+        for i in range(3):
+            with pool.connection() as conn:
+                conn.execute("select 1")
+        self.assertEqual(pool.stats()['opened'], 3)
+
+    def test_pool_size(self):
+        pool = ConnectionPool(lambda: sqlite3.connect(self.path, check_same_thread=False), size=2, timeout=5)
+        held = [pool.get(), pool.get()]
+        threading.Timer(0.05, pool.put, held[0]).start()
+        conn, opened_at = pool.get()
+        self.assertTrue(conn is held[0][0])
+        self.assertEqual(pool.stats()['opened'], 2)
+
+
+class TestOptions(unittest.TestCase):
+
+    def test_types(self):
+        kwargs, pool = _options('postgres', 'sslmode=verify-full&connect_timeout=10&pool_size=3&recycle=60')
+        self.assertEqual(kwargs, {'sslmode': 'verify-full', 'connect_timeout': 10})
+        self.assertEqual(pool, {'pool_size': 3, 'recycle': 60.0})
+
+    def test_ssl(self):
+        self.assertEqual(_options('postgres', 'ssl=true')[0], {'sslmode': 'require'})
+        self.assertEqual(_options('mysql', 'ssl_ca=/ca.pem&autocommit=true&charset=utf8mb4')[0],
+                         {'ssl': {'ca': '/ca.pem'}, 'autocommit': True, 'charset': 'utf8mb4'})
+
+    def test_bad_options(self):
+        self.assertRaises(Exception, _options, 'postgres', 'pool=5')
+        self.assertRaises(Exception, _options, 'mysql', 'connect_timeout=soon')
+        self.assertRaises(Exception, _options, 'mysql', 'autocommit=maybe')
+
+    def test_pool_options(self):
+        database = Database('sqlite:///:memory:?timeout=2')
+        self.assertEqual(database.pool.size, 1)
+        database = Database('sqlite:///' + os.path.join(tempfile.gettempdir(), 'x.db') + '?pool_size=7&recycle=5')
+        self.assertEqual((database.pool.size, database.pool.recycle), (7, 5.0))
+
 if __name__=="__main__":
     unittest.main()
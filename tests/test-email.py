@@ -1,4 +1,14 @@
 import unittest
+import base64
+import gc
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import json
+import sys
+import zipfile
 from bandit import Email
 
 
@@ -33,5 +43,143 @@ class TestBasic(unittest.TestCase):
         email.send(["hi@test.com", "bye@test.com"])
         self.assertTrue(email._write()['recipients'], ['hi@test.com', 'bye@test.com'])
 
+
+class TestAttachments(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.dir, 'metadata'))
+        os.environ['BANDIT_JOB_ROOT'] = self.dir
+
+    def tearDown(self):
+        del os.environ['BANDIT_JOB_ROOT']
+        shutil.rmtree(self.dir)
+
+    def file(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def decode(self, attachment):
+        with open(os.path.join(self.dir, 'metadata', attachment['path']), 'rb') as f:
+            return base64.b64decode(f.read())
+
+    def test_attachment_is_a_sidecar(self):
+        content = os.urandom(3 * 256 * 1024 + 10)
+        email = Email(write_json=False)
+        email.add_attachment(self.file('data.bin', content))
+        attachment = email._write()['attachments'][0]
+        self.assertFalse('content' in attachment)
+        self.assertEqual(attachment['size'], len(content))
+        self.assertEqual(self.decode(attachment), content)
+        # relative to the metadata dir, so it doesn't matter where that's mounted
+        self.assertTrue(attachment['path'].startswith('attachments/'))
+
+    def test_too_large(self):
+        email = Email(write_json=False)
+        email.add_attachment(self.file('big.csv', b'a,b,c\n' * 200000))
+        self.assertEqual(email._write()['attachments'], [])
+
+    def test_auto_compress(self):
+        content = b'a,b,c\n' * 200000
+        email = Email(write_json=False)
+        email.add_attachment(self.file('small.csv', b'a,b,c\n'), compress='auto')
+        email.add_attachment(self.file('big.csv', content), compress='auto')
+        small, big = email._write()['attachments']
+        self.assertEqual(small['name'], 'small.csv')
+        self.assertEqual((big['name'], big['type']), ('big.csv.gz', 'application/gzip'))
+        self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(self.decode(big))).read(), content)
+
+    def test_zip(self):
+        email = Email(write_json=False)
+        email.add_attachment(self.file('report.csv', b'a,b,c\n'), compress='zip')
+        attachment = email._write()['attachments'][0]
+        self.assertEqual(attachment['name'], 'report.csv.zip')
+        z = zipfile.ZipFile(io.BytesIO(self.decode(attachment)))
+        self.assertEqual(z.read('report.csv'), b'a,b,c\n')
+
+    def test_compress_fails(self):
+        tmp = os.path.join(self.dir, 'tmp')
+        os.makedirs(tmp)
+        tempfile.tempdir = tmp
+        try:
+            email = Email(write_json=False)
+            # a directory can't be read, so compressing it fails part way
+            self.assertRaises(Exception, email.add_attachment, tmp, compress='gzip')
+        finally:
+            tempfile.tempdir = None
+        self.assertEqual(os.listdir(tmp), [])
+
+
+class TestFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.module = sys.modules['bandit.email']
+        self.root = tempfile.mkdtemp()
+        self.dir = os.path.join(self.root, 'metadata')
+        os.makedirs(self.dir)
+        os.environ['BANDIT_JOB_ROOT'] = self.root
+        Email._count = 0
+        self.writes = 0
+        original = self.module.atomic_write
+        def atomic_write(*args, **kwargs):
+            self.writes += 1
+            return original(*args, **kwargs)
+        self.module.atomic_write = atomic_write
+        self.original = original
+
+    def tearDown(self):
+        self.module.atomic_write = self.original
+        del os.environ['BANDIT_JOB_ROOT']
+        shutil.rmtree(self.root)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return json.load(f)
+
+    def test_nothing_written_until_flush(self):
+        email = Email()
+        email.subject('hi')
+        email.body('there')
+        self.assertEqual(os.listdir(self.dir), [])
+        email.flush()
+        email.flush()
+        self.assertEqual(self.writes, 1)
+        self.assertEqual(self.read('email.json')['subject'], 'hi')
+
+    def test_send_flushes(self):
+        email = Email(subject='hi')
+        email.send(['hi@test.com'])
+        self.assertEqual(self.writes, 1)
+        self.assertEqual(self.read('email.json')['recipients'], ['hi@test.com'])
+
+    def test_rewrites_after_change(self):
+        email = Email(subject='hi')
+        email.flush()
+        email.subject('bye')
+        email.flush()
+        self.assertEqual(self.writes, 2)
+        self.assertEqual(self.read('email.json')['subject'], 'bye')
+
+    def test_many_emails(self):
+        first = Email(subject='first')
+        second = Email(subject='second')
+        second.send(['a@test.com'])
+        first.send(['b@test.com'])
+        self.assertEqual(sorted(os.listdir(self.dir)), ['email-2.json', 'email.json'])
+        self.assertEqual(self.read('email.json')['subject'], 'first')
+        self.assertEqual(self.read('email-2.json')['subject'], 'second')
+
+    def test_flush_on_exit(self):
+        email = Email(subject='hi')
+        self.module._flush_all()
+        self.assertEqual(self.read('email.json')['subject'], 'hi')
+        # the exit hook doesn't keep the email alive
+        del email
+        gc.collect()
+        self.assertEqual(len(self.module._live), 0)
+        self.assertEqual(self.writes, 1)
+
 if __name__=="__main__":
     unittest.main()
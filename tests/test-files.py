@@ -0,0 +1,66 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from bandit import Bandit, files
+from bandit.files import append, atomic_write
+from fixtures import job_root, report_server
+
+
+class TestFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_atomic_write(self):
+        atomic_write(self.path, 'caf\xe9')
+        self.assertEqual(self.read(), b'caf\xc3\xa9')
+        atomic_write(self.path, b'\x00\xff')
+        self.assertEqual(self.read(), b'\x00\xff')
+        self.assertEqual(os.listdir(self.dir), ['data'])
+
+    def test_append(self):
+        self.assertEqual(append(self.path, 'caf\xe9\n'), 6)
+        self.assertEqual(append(self.path, b'tea\n'), 4)
+        self.assertEqual(self.read(), b'caf\xc3\xa9\ntea\n')
+        # the file is opened once and kept open
+        f = files._appends[self.path]
+        append(self.path, 'coffee\n')
+        self.assertTrue(files._appends[self.path] is f)
+        self.assertEqual(self.read(), b'caf\xc3\xa9\ntea\ncoffee\n')
+
+
+class TestUnicode(unittest.TestCase):
+
+    def setUp(self):
+        self.root = job_root(self)
+        self.stub = report_server(self)
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+        self.bandit.output_dir = os.path.join(self.root, 'output-files', '')
+
+    def test_report(self):
+        self.bandit.report('\xfcber-loss', 0.5)
+        self.bandit.report_many('λ', [1, 2])
+        with open(os.path.join(self.root, 'metadata', 'charts.ndjson'), 'rb') as f:
+            points = [json.loads(line.decode('utf-8')) for line in f]
+        self.assertEqual([p['tag_name'] for p in points], ['\xfcber-loss', 'λ', 'λ'])
+        bodies = [json.loads(r['body'].decode('utf-8')) for r in self.stub.requests]
+        self.assertEqual(bodies[0]['tag_name'], '\xfcber-loss')
+        self.assertEqual([p['y'] for p in bodies[1]], [1, 2])
+
+    def test_dashboard(self):
+        self.bandit.make_dashboard('a.html', template_name='single-table', table='<p>caf\xe9 ☃</p>')
+        with open(self.bandit.output_dir + 'a.html', 'rb') as f:
+            self.assertTrue('<p>caf\xe9 ☃</p>' in f.read().decode('utf-8'))
+
+if __name__=="__main__":
+    unittest.main()
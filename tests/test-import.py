@@ -0,0 +1,54 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ['requests', 'pybars', 'pandas', 'numpy', 'PIL', 'multiprocessing', 'aiohttp']
+
+SCRIPT = """
+import json, sys, time
+start = time.time()
+import bandit
+seconds = time.time() - start
+%s
+print(json.dumps({'seconds': seconds, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def run(code=''):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.check_output([sys.executable, '-c', SCRIPT % (code, HEAVY)], env=env)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+class TestImport(unittest.TestCase):
+
+    def test_import_is_light(self):
+        result = run()
+        self.assertEqual(result['loaded'], [])
+        # importing pandas and friends used to take over a second
+        self.assertTrue(result['seconds'] < 0.5, result['seconds'])
+
+    def test_metadata_and_email(self):
+        code = """
+b = bandit.Bandit()
+b.metadata.update(r2=0.9)
+bandit.Email(write_json=False).subject('hi')
+"""
+        self.assertEqual(run(code)['loaded'], [])
+
+    def test_imported_when_needed(self):
+        code = """
+import pandas
+b = bandit.Bandit('user', 'apikey', 'http://localhost:1/')
+b.output_dir = __import__('tempfile').mkdtemp() + '/'
+b.make_dashboard('t.html', template_name='single-table', table=pandas.DataFrame({'a': [1]}))
+b.session
+"""
+        self.assertEqual(run(code)['loaded'], ['requests', 'pybars', 'pandas', 'numpy'])
+
+if __name__=="__main__":
+    unittest.main()
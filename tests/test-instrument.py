@@ -0,0 +1,88 @@
+import unittest
+import json
+import os
+from bandit import Bandit, instrument
+from fixtures import job_root, stub_server
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        instrument.reset()
+        instrument.enable()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_disabled(self):
+        instrument.disable()
+        instrument.record('report', 0.1)
+        instrument.add('file_writes')
+        self.assertEqual(instrument.stats(), {'enabled': False, 'operations': {}, 'counters': {}})
+
+    def test_timed(self):
+        @instrument.timed('work')
+        def work(x):
+            return x * 2
+        self.assertEqual(work(21), 42)
+        self.assertEqual(work.__name__, 'work')
+        self.assertEqual(instrument.stats()['operations']['work']['count'], 1)
+
+    def test_histogram(self):
+        for seconds in [0.001] * 98 + [0.5, 0.5]:
+            instrument.record('report', seconds)
+        op = instrument.stats()['operations']['report']
+        self.assertEqual(op['count'], 100)
+        self.assertAlmostEqual(op['total'], 1.098)
+        self.assertEqual(op['max'], 0.5)
+        # percentiles are the upper bounds of power of two buckets
+        self.assertTrue(0.001 <= op['p50'] <= 0.002)
+        self.assertTrue(0.5 <= op['p99'] <= 1.0)
+        self.assertEqual(sum(n for _, n in op['histogram']), 100)
+
+    def test_callbacks(self):
+        calls = []
+        callback = lambda name, seconds: calls.append(name)
+        instrument.add_callback(callback)
+        instrument.record('report', 0.1)
+        instrument.remove_callback(callback)
+        instrument.record('report', 0.1)
+        self.assertEqual(calls, ['report'])
+
+
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+        instrument.reset()
+        instrument.enable()
+        self.root = job_root(self)
+        self.stub = stub_server(self)
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_report(self):
+        self.stub.respond('PUT', '/api/jobs/7/report', 503, {})
+        self.stub.respond('PUT', '/api/jobs/7/report', 200, {'status': 'OK'})
+        self.bandit.report("loss", 0.5)
+        self.bandit.report("loss", 0.25)
+        stats = self.bandit.stats()
+        self.assertEqual(stats['operations']['report']['count'], 2)
+        self.assertEqual(stats['operations']['http']['count'], 2)
+        self.assertEqual(stats['counters']['http.retries'], 1)
+        self.assertEqual(stats['counters']['file_writes'], 2)
+        with open(os.path.join(self.root, 'metadata', 'charts.ndjson')) as f:
+            self.assertEqual(stats['counters']['charts.bytes'], len(f.read()))
+
+    def test_dump(self):
+        self.bandit.metadata.r2 = 0.9
+        instrument._dump()
+        with open(os.path.join(self.root, 'metadata', 'client-stats.json')) as f:
+            stats = json.load(f)
+        self.assertEqual(stats['operations']['metadata_write']['count'], 1)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from bandit import Bandit
+from stubserver import StubServer
+
+RESULTS = [{'project': 'demos' if n % 2 else 'models', 'name': 'echo1', 'n': n,
+            'status': 'success' if n % 3 else 'failed'} for n in range(250)]
+
+
+def paged(request):
+    "job results endpoint that supports limit/offset and project/status filters"
+    query = dict(kv.split('=') for kv in request['full_path'].split('?')[1].split('&'))
+    rows = [r for r in RESULTS if r['project']==query.get('project', r['project'])
+            and r['status']==query.get('status', r['status'])]
+    offset = int(query.get('offset', 0))
+    limit = int(query['limit'])
+    return 200, {'jobResults': rows[offset:offset+limit]}
+
+
+class TestIter(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.bandit = Bandit("glamp", "apikey", self.stub.url)
+
+    def tearDown(self):
+        self.stub.close()
+
+    def test_pages_lazily(self):
+        self.stub.respond('GET', '/api/job-results', 200, paged)
+        results = self.bandit.iter_job_results(page_size=100)
+        first = next(results)
+        self.assertEqual(first.n, 0)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(len(list(results)), 249)
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_filters(self):
+        self.stub.respond('GET', '/api/job-results', 200, paged)
+        results = self.bandit.get_job_results(project='models', status='failed', page_size=10)
+        self.assertEqual([r.n for r in results], list(range(0, 250, 6)))
+
+    def test_cursor(self):
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': [{'name': 'a'}], 'nextCursor': 'abc'})
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': [{'name': 'b'}], 'nextCursor': None})
+        jobs = self.bandit.get_jobs(page_size=1)
+        self.assertEqual([j.name for j in jobs], ['a', 'b'])
+        self.assertTrue('cursor=abc' in self.stub.requests[1]['full_path'])
+
+    def test_server_without_paging(self):
+        self.stub.respond('GET', '/api/job-results', 200, {'jobResults': RESULTS[:100]})
+        self.assertEqual(len(self.bandit.get_job_results(page_size=100)), 100)
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': [{'name': 'a'}] * 250})
+        self.assertEqual(len(self.bandit.get_jobs(page_size=100)), 250)
+
+if __name__=="__main__":
+    unittest.main()
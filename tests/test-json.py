@@ -0,0 +1,72 @@
+import unittest
+import json
+import datetime
+import numpy as np
+import pandas as pd
+from bandit import yhat_json
+from bandit.yhat_json import json_dumps, NumpyAwareJSONEncoder
+
+
+class TestJSON(unittest.TestCase):
+
+    def check(self, data, expected):
+        self.assertEqual(json.loads(json_dumps(data)), expected)
+
+    def test_nan_is_null(self):
+        self.check({'y': float('nan')}, {'y': None})
+        self.check(np.float64('nan'), None)
+        self.check(np.array([1.5, np.nan]), [1.5, None])
+
+    def test_infinity_is_null(self):
+        self.check([float('inf'), float('-inf')], [None, None])
+        self.check(np.array([1.5, np.inf]), [1.5, None])
+
+    def test_same_output_without_orjson(self):
+        data = {'tag_name': 'caf\xe9 λ', 'x': 1, 'y': [0.5, float('nan'), float('inf')]}
+        expected = '{"tag_name":"caf\xe9 λ","x":1,"y":[0.5,null,null]}'
+        self.assertEqual(json_dumps(data), expected)
+        orjson = yhat_json.orjson
+        yhat_json.orjson = None
+        try:
+            self.assertEqual(json_dumps(data), expected)
+            self.assertEqual(json_dumps({'a': [1, 'b']}), '{"a":[1,"b"]}')
+        finally:
+            yhat_json.orjson = orjson
+
+    def test_numpy(self):
+        self.check(np.int64(3), 3)
+        self.check(np.float32(1.5), 1.5)
+        self.check(np.bool_(True), True)
+        self.check(np.arange(6).reshape(2, 3), [[0, 1, 2], [3, 4, 5]])
+        self.check({'t': np.arange(4)[::2]}, {'t': [0, 2]})
+
+    def test_dates(self):
+        self.check(np.array(['2017-01-01', 'NaT'], dtype='datetime64[s]'), ['2017-01-01T00:00:00', None])
+        self.check(np.datetime64('2017-01-01'), '2017-01-01')
+        self.check(datetime.date(2017, 1, 1), '2017-01-01')
+
+    def test_pandas(self):
+        self.check(pd.Series([1, 2.5, np.nan]), [1, 2.5, None])
+        df = pd.DataFrame({'x': [1, 2], 'y': [0.5, np.nan]})
+        self.check(df, [{'x': 1, 'y': 0.5}, {'x': 2, 'y': None}])
+
+    def test_without_orjson(self):
+        orjson = yhat_json.orjson
+        yhat_json.orjson = None
+        try:
+            self.test_nan_is_null()
+            self.test_infinity_is_null()
+            self.test_numpy()
+            self.test_pandas()
+        finally:
+            yhat_json.orjson = orjson
+
+    def test_legacy_encoder(self):
+        data = json.dumps({'y': np.array([1.0, np.nan])}, cls=NumpyAwareJSONEncoder, allow_nan=False)
+        self.assertEqual(json.loads(data), {'y': [1.0, None]})
+
+    def test_unserializable(self):
+        self.assertRaises(TypeError, json_dumps, object())
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import os
+import shutil
+import tempfile
+import pandas as pd
+from bandit import Bandit
+
+
+class TestMakeDashboards(unittest.TestCase):
+
+    def setUp(self):
+        self.bandit = Bandit("glamp", "apikey", "http://localhost/")
+        self.bandit.output_dir = tempfile.mkdtemp() + '/'
+
+    def tearDown(self):
+        shutil.rmtree(self.bandit.output_dir)
+
+    def specs(self, n):
+        return [dict(name='segment-%d.html' % i, template_name='single-table',
+                     table=pd.DataFrame({'segment': [i] * 10, 'value': range(10)}))
+                for i in range(n)]
+
+    def test_renders_in_parallel(self):
+        results = self.bandit.make_dashboards(self.specs(8), workers=2)
+        self.assertEqual([r['name'] for r in results], ['segment-%d.html' % i for i in range(8)])
+        self.assertTrue(all(r['error'] is None and r['seconds'] >= 0 for r in results))
+        self.assertEqual(len(os.listdir(self.bandit.output_dir)), 8)
+        with open(self.bandit.output_dir + 'segment-3.html', 'rb') as f:
+            self.assertTrue(b'<td>3</td>' in f.read())
+
+    def test_failures_dont_stop_the_batch(self):
+        specs = self.specs(3)
+        specs[1]['template_name'] = 'does-not-exist'
+        results = self.bandit.make_dashboards(specs, workers=2)
+        self.assertEqual([r['error'] is None for r in results], [True, False, True])
+        self.assertTrue('does-not-exist' in results[1]['error'])
+        self.assertEqual(len(os.listdir(self.bandit.output_dir)), 2)
+
+    def test_single_worker(self):
+        results = self.bandit.make_dashboards(self.specs(2), workers=1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(len(os.listdir(self.bandit.output_dir)), 2)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import time
+from bandit.job import Metadata
+
+
+class TestMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.dir, 'metadata'))
+        self.path = os.path.join(self.dir, 'metadata', 'metadata.json')
+        with open(self.path, 'w') as f:
+            f.write('{}')
+        os.environ['BANDIT_JOB_ROOT'] = self.dir
+        self.writes = []
+        self._write = Metadata._write_metadata
+
+        test = self
+        def counting_write(metadata, data):
+            test.writes.append(dict(data))
+            test._write(metadata, data)
+        Metadata._write_metadata = counting_write
+
+    def tearDown(self):
+        Metadata._write_metadata = self._write
+        del os.environ['BANDIT_JOB_ROOT']
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_writes_on_every_change(self):
+        metadata = Metadata()
+        metadata.one = 1
+        metadata['two'] = 2
+        del metadata['one']
+        self.assertEqual(len(self.writes), 3)
+        self.assertEqual(self.read(), {'two': 2})
+
+    def test_update(self):
+        metadata = Metadata()
+        metadata.update({'a': 1}, b=2, c=3)
+        self.assertEqual(self.writes, [{'a': 1, 'b': 2, 'c': 3}])
+        self.assertEqual(metadata.b, 2)
+
+    def test_batch(self):
+        metadata = Metadata()
+        with metadata.batch():
+            for i in range(100):
+                metadata['key-%d' % i] = i
+            with metadata.batch():
+                metadata.nested = True
+            self.assertEqual(self.writes, [])
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(len(self.read()), 101)
+
+    def test_constructor_writes_once(self):
+        Metadata({'a': 1}, b=2)
+        self.assertEqual(self.writes, [{'a': 1, 'b': 2}])
+
+    def test_auto_flush(self):
+        metadata = Metadata()
+        metadata.auto_flush(0.05)
+        for i in range(50):
+            metadata['key-%d' % i] = i
+        self.assertEqual(self.writes, [])
+        time.sleep(0.2)
+        self.assertEqual(len(self.writes), 1)
+        metadata.last = 1
+        metadata.flush()
+        self.assertEqual(len(self.writes), 2)
+        self.assertEqual(len(self.read()), 51)
+        metadata.auto_flush(None)
+
+    def test_no_temp_files_left_behind(self):
+        metadata = Metadata()
+        metadata.update(a=1)
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'metadata')), ['metadata.json'])
+
+    def test_not_serializable(self):
+        metadata = Metadata()
+        self.assertRaises(Exception, metadata.__setitem__, 'a', object())
+        self.assertEqual(self.writes, [])
+
+    def test_reserved_names(self):
+        metadata = Metadata()
+        for key in ['_lock', '_dirty', '_timer', '_state', 'flush', 'batch']:
+            metadata[key] = 5
+        metadata.after = 6
+        self.assertEqual(self.read()['_state'], 5)
+        self.assertEqual(self.read()['after'], 6)
+        self.assertEqual(metadata._lock, 5)
+        self.assertEqual(metadata['flush'], 5)
+        del metadata['_state']
+        self.assertFalse('_state' in self.read())
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from bandit import Bandit, metrics
+from bandit.metrics import MetricsLog, MetricsReader, ndjson_to_binary, binary_to_ndjson
+from fixtures import job_root
+
+
+class TestMetricsLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'charts.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self):
+        log = MetricsLog(self.path)
+        for i in range(100):
+            log.append('loss', i, 1. / (i + 1), timestamp=1000 + i)
+            if i % 10==0:
+                log.append('accuracy', i, i / 100., timestamp=1000 + i)
+        log.close()
+
+    def test_query(self):
+        self.write()
+        reader = MetricsReader(self.path)
+        self.assertEqual(reader.tags(), ['loss', 'accuracy'])
+        self.assertEqual(len(reader), 110)
+        self.assertEqual(reader.query('loss', x_min=10, x_max=12),
+                         [(10.0, 1. / 11, 1010.0), (11.0, 1. / 12, 1011.0), (12.0, 1. / 13, 1012.0)])
+        self.assertEqual([p[0] for p in reader.query('accuracy', since=1050, until=1080)], [50.0, 60.0, 70.0])
+        self.assertEqual(reader.query('nope'), [])
+        reader.close()
+
+    def test_query_without_numpy(self):
+        self.write()
+        _numpy, metrics._numpy = metrics._numpy, lambda: None
+        try:
+            reader = MetricsReader(self.path)
+            self.assertEqual(len(reader.query('loss', x_min=90)), 10)
+            reader.close()
+        finally:
+            metrics._numpy = _numpy
+
+    def test_reopen_appends(self):
+        self.write()
+        log = MetricsLog(self.path)
+        log.append('accuracy', 100, 1.0)
+        log.append('lr', 0, 0.1)
+        log.close()
+        reader = MetricsReader(self.path)
+        self.assertEqual(reader.tags(), ['loss', 'accuracy', 'lr'])
+        self.assertEqual(len(reader.query('accuracy')), 11)
+        reader.close()
+
+    def test_partial_record(self):
+        self.write()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x00' * 5)
+        reader = MetricsReader(self.path)
+        self.assertEqual(len(reader), 110)
+        reader.close()
+        log = MetricsLog(self.path)
+        log.append('loss', 100, 0.0)
+        log.close()
+        reader = MetricsReader(self.path)
+        self.assertEqual(reader.query('loss')[-1][:2], (100.0, 0.0))
+        reader.close()
+
+    def test_non_numbers(self):
+        log = MetricsLog(self.path)
+        log.append('loss', 0, float('nan'))
+        log.append('loss', 1, '0.5')
+        log.append_lines(['{"tag_name": "loss", "x": 2, "y": null}', '{"tag_name": "loss", "x": 3, "y": "oops"}'])
+        log.close()
+        reader = MetricsReader(self.path)
+        ys = [p[1] for p in reader.query('loss')]
+        reader.close()
+        self.assertEqual(len(ys), 4)
+        self.assertEqual(ys[1], 0.5)
+        self.assertTrue(all(y!=y for y in ys[:1] + ys[2:]))
+
+    def test_not_a_log(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"tag_name": "loss"}\n')
+        self.assertRaises(Exception, MetricsReader, self.path)
+
+    def test_ndjson_round_trip(self):
+        points = [{'tag_name': 'loss', 'x': i, 'y': 0.5 * i} for i in range(5)]
+        points.append({'tag_name': 'acc', 'x': 0, 'y': 0.75})
+        ndjson = os.path.join(self.dir, 'charts.ndjson')
+        with open(ndjson, 'w') as f:
+            f.write(''.join(json.dumps(p) + '\n' for p in points))
+
+        self.assertEqual(ndjson_to_binary(ndjson, self.path), 6)
+        out = os.path.join(self.dir, 'out.ndjson')
+        self.assertEqual(binary_to_ndjson(self.path, out), 6)
+        with open(out) as f:
+            self.assertEqual([json.loads(line) for line in f], points)
+
+
+class TestBinaryCharts(unittest.TestCase):
+
+    def setUp(self):
+        self.root = job_root(self)
+
+    def test_replaces_ndjson(self):
+        bandit = Bandit("glamp", "apikey", "http://localhost:1/")
+        bandit._send_reports = lambda lines: None
+        bandit.binary_charts()
+        bandit.report_many("loss", [0.5, 0.25, 0.125, float('nan')])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'metadata', 'charts.ndjson')))
+        reader = MetricsReader(os.path.join(self.root, 'metadata', 'charts.bin'))
+        points = reader.query('loss')
+        self.assertEqual([p[:2] for p in points[:3]], [(0.0, 0.5), (1.0, 0.25), (2.0, 0.125)])
+        self.assertTrue(points[3][1]!=points[3][1])
+        reader.close()
+
+if __name__=="__main__":
+    unittest.main()
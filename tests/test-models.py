@@ -0,0 +1,65 @@
+import unittest
+import pickle
+import json
+from bandit.models import Job, JobResult, to_columns, to_dataframe
+
+
+class TestModels(unittest.TestCase):
+
+    def test_attributes(self):
+        result = JobResult(name='echo1', n=3, status='success', somethingNew=1)
+        self.assertEqual(result.name, 'echo1')
+        self.assertEqual(result.somethingNew, 1)
+        self.assertEqual(repr(result), '<JobResult echo1/3/success>')
+        self.assertRaises(AttributeError, getattr, result, 'logs')
+        self.assertRaises(AttributeError, getattr, result, 'nope')
+        self.assertFalse(hasattr(result, '__dict__'))
+
+    def test_data(self):
+        data = {'name': 'echo1', 'n': 3, 'status': 'success', 'metadata': '{"r2": 0.8}', 'other': [1]}
+        result = JobResult(**data)
+        self.assertEqual(result.data, data)
+        result.metadata
+        self.assertEqual(result.data, data)
+
+    def test_parsed(self):
+        result = JobResult(name='echo1', metadata=json.dumps({'r2': 0.8}), logs='hello\nworld')
+        self.assertEqual(result.metadata, '{"r2": 0.8}')
+        self.assertEqual(result.parsed('metadata'), {'r2': 0.8})
+        self.assertTrue(result.parsed('metadata') is result.parsed('metadata'))
+        self.assertEqual(result.parsed('logs'), 'hello\nworld')
+        result.metadata = '{"r2": 0.9}'
+        self.assertEqual(result.parsed('metadata'), {'r2': 0.9})
+
+    def test_parsed_caches_bad_json(self):
+        result = JobResult(metadata='{not json')
+        self.assertEqual(result.parsed('metadata'), '{not json')
+        loads, json.loads = json.loads, None
+        try:
+            self.assertEqual(result.parsed('metadata'), '{not json')
+        finally:
+            json.loads = loads
+
+    def test_underscore_fields(self):
+        job = Job(name='echo1', _id='abc')
+        self.assertEqual(job._id, 'abc')
+        self.assertEqual(job.data, {'name': 'echo1', '_id': 'abc'})
+
+    def test_pickle(self):
+        job = Job(username='glamp', name='echo1', extra='x')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(job, protocol))
+            self.assertEqual(copy.data, job.data)
+
+    def test_columns(self):
+        results = [JobResult(name='echo1', n=n, status='success') for n in range(3)]
+        results.append(JobResult(name='echo2', n=0))
+        columns = to_columns(results)
+        self.assertEqual(columns['n'], [0, 1, 2, 0])
+        self.assertEqual(columns['status'], ['success', 'success', 'success', None])
+        df = to_dataframe(results, fields=['name', 'n'])
+        self.assertEqual(list(df.columns), ['name', 'n'])
+        self.assertEqual(len(df), 4)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from bandit.reporter import BufferedReporter, BackgroundReporter
+import threading
+import json
+import os
+import time
+
+
+def point(y):
+    return json.dumps({"tag_name": "x", "x": 0, "y": y})
+
+
+class FakeBandit(object):
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.written = []
+        self.sent = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _write_charts(self, points):
+        self.written.extend(points)
+
+    def _send_reports(self, points):
+        self.gate.wait()
+        if self.fail:
+            raise Exception("server is down")
+        self.sent.append(points)
+
+
+class TestBuffered(unittest.TestCase):
+
+    def test_flush_on_size(self):
+        bandit = FakeBandit()
+        reporter = BufferedReporter(bandit, flush_size=3, flush_interval=60)
+        for i in range(7):
+            reporter.add(point(i))
+        self.assertEqual([len(batch) for batch in bandit.sent], [3, 3])
+        reporter.close()
+        self.assertEqual(len(bandit.written), 7)
+        self.assertEqual([len(batch) for batch in bandit.sent], [3, 3, 1])
+
+    def test_flush_on_interval(self):
+        bandit = FakeBandit()
+        reporter = BufferedReporter(bandit, flush_size=100, flush_interval=0)
+        reporter.add(point(1))
+        self.assertEqual(len(bandit.sent), 1)
+        reporter.close()
+
+    def test_flush_on_timer(self):
+        bandit = FakeBandit()
+        reporter = BufferedReporter(bandit, flush_size=100, flush_interval=0.05)
+        reporter.add(point(1))
+        self.assertEqual(len(bandit.sent), 0)
+        # nothing else gets reported, but the point still goes out
+        time.sleep(0.5)
+        self.assertEqual(len(bandit.sent), 1)
+        reporter.close()
+
+    def test_one_limit_for_new_and_unsent_points(self):
+        bandit = FakeBandit(fail=True)
+        reporter = BufferedReporter(bandit, flush_size=3, flush_interval=60, max_buffer=4)
+        for i in range(5):
+            reporter.add(point(i))
+        stats = reporter.stats()
+        self.assertEqual((stats['unsent'], stats['buffered'], stats['dropped']), (2, 2, 1))
+        bandit.fail = False
+        reporter.close()
+        self.assertEqual([json.loads(p)['y'] for p in bandit.sent[0]], [1, 2, 3, 4])
+
+    def test_failed_sends_are_retried(self):
+        bandit = FakeBandit(fail=True)
+        reporter = BufferedReporter(bandit, flush_size=2, flush_interval=60, max_buffer=4)
+        for i in range(6):
+            reporter.add(point(i))
+        # every point still makes it to disk once
+        self.assertEqual(len(bandit.written), 6)
+        self.assertEqual(reporter.dropped, 2)
+        bandit.fail = False
+        reporter.close()
+        self.assertEqual([json.loads(p)['y'] for p in bandit.sent[0]], [2, 3, 4, 5])
+
+
+class TestBackground(unittest.TestCase):
+
+    def test_sends_everything(self):
+        bandit = FakeBandit()
+        reporter = BackgroundReporter(bandit, batch_size=10, flush_interval=0.01)
+        for i in range(95):
+            reporter.add(point(i))
+        self.assertTrue(reporter.flush(timeout=5))
+        reporter.close()
+        self.assertEqual(sum(len(batch) for batch in bandit.sent), 95)
+        stats = reporter.stats()
+        self.assertEqual(stats['queued'], 95)
+        self.assertEqual(stats['sent'], 95)
+
+    def test_drop_oldest(self):
+        bandit = FakeBandit()
+        bandit.gate.clear()
+        reporter = BackgroundReporter(bandit, max_queue=5, batch_size=1, flush_interval=0.01)
+        for i in range(20):
+            reporter.add(point(i))
+        bandit.gate.set()
+        reporter.close()
+        stats = reporter.stats()
+        self.assertTrue(stats['dropped'] > 0)
+        self.assertEqual(stats['sent'] + stats['dropped'], 20)
+        self.assertEqual(json.loads(bandit.sent[-1][0])['y'], 19)
+
+    def test_spill(self):
+        bandit = FakeBandit()
+        bandit.gate.clear()
+        reporter = BackgroundReporter(bandit, max_queue=5, policy="spill", batch_size=5, flush_interval=0.01)
+        for i in range(20):
+            reporter.add(point(i))
+        self.assertTrue(reporter.stats()['spilled'] > 0)
+        bandit.gate.set()
+        self.assertTrue(reporter.flush(timeout=5))
+        reporter.close()
+        # spilled points are read back a batch at a time, in order
+        ys = [json.loads(p)['y'] for batch in bandit.sent for p in batch]
+        self.assertEqual(ys, list(range(20)))
+        self.assertTrue(max(len(batch) for batch in bandit.sent) <= 5)
+        self.assertEqual(os.path.getsize(reporter.spill_path), 0)
+        os.remove(reporter.spill_path)
+
+    def test_failures_are_counted(self):
+        bandit = FakeBandit(fail=True)
+        reporter = BackgroundReporter(bandit, batch_size=2, flush_interval=0.01)
+        for i in range(4):
+            reporter.add(point(i))
+        reporter.flush(timeout=5)
+        reporter.close()
+        self.assertEqual(reporter.stats()['failed'], 4)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+from bandit.local import run_local
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+JOB = """
+import os
+from bandit import Bandit, Email
+bandit = Bandit()
+for i in range(5):
+    bandit.report("loss", i)
+bandit.metadata.update(db=bandit.get_connection("dw"), job_id=os.environ["BANDIT_JOB_ID"])
+with open(os.path.join(bandit.output_dir, "out.txt"), "w") as f:
+    f.write("done")
+Email(subject="finished").send(["hi@test.com"])
+"""
+
+
+class TestRunLocal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.job = os.path.join(self.dir, 'job.py')
+        with open(self.job, 'w') as f:
+            f.write(JOB)
+        self.root = os.path.join(self.dir, 'root')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, *parts)) as f:
+            return f.read()
+
+    def test_worker_layout(self):
+        result = run_local([self.job], job_root=self.root, job_id='42', databases={'dw': 'sqlite://'},
+                           env={'PYTHONPATH': ROOT})
+        self.assertEqual(result['returncode'], 0)
+        self.assertEqual(result['points'], 5)
+        self.assertEqual(self.read('output-files', 'out.txt'), 'done')
+        self.assertEqual(json.loads(self.read('metadata', 'metadata.json')), {'db': 'sqlite://', 'job_id': '42'})
+        self.assertEqual(json.loads(self.read('metadata', 'email.json'))['subject'], 'finished')
+
+        charts = [json.loads(line) for line in self.read('metadata', 'charts.ndjson').splitlines()]
+        reports = [json.loads(line) for line in self.read('metadata', 'reports.ndjson').splitlines()]
+        self.assertEqual([point['y'] for point in charts], list(range(5)))
+        self.assertEqual(reports, charts)
+
+    def test_exit_code(self):
+        result = run_local([sys.executable, '-c', 'import sys; sys.exit(3)'], job_root=self.root)
+        self.assertEqual(result['returncode'], 3)
+        self.assertTrue(os.path.isdir(os.path.join(self.root, 'output-files')))
+
+if __name__=="__main__":
+    unittest.main()
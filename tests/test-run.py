@@ -0,0 +1,103 @@
+import unittest
+import threading
+import time
+from bandit import Bandit
+from stubserver import StubServer
+
+
+class FakeRunner(object):
+    "pretends to be the Bandit job runner. each run takes `polls` polls to finish"
+    def __init__(self, polls=2, status='success'):
+        self.polls = polls
+        self.status = status
+        self.results = [{'project': 'bandit-demos', 'name': 'echo1', 'n': 1, 'status': 'success'}]
+        self.lock = threading.Lock()
+
+    def run(self, request):
+        with self.lock:
+            name = request['path'].split('/')[-1]
+            n = max(r['n'] for r in self.results) + 1
+            self.results.append({'project': 'bandit-demos', 'name': name, 'n': n,
+                                 'status': 'running', 'polls': 0})
+        return 200, {'status': 'OK'}
+
+    def job_results(self, request):
+        with self.lock:
+            for result in self.results:
+                if result['status']=='running':
+                    result['polls'] += 1
+                    if result['polls'] > self.polls:
+                        result['status'] = self.status
+            return 200, {'jobResults': [dict(r) for r in self.results]}
+
+
+class TestRun(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.runner = FakeRunner()
+        for name in ['echo1', 'echo2', 'echo3']:
+            self.stub.respond('GET', '/api/projects/glamp/bandit-demos/jobs/' + name, 200, self.runner.run)
+        self.stub.respond('GET', '/api/job-results', 200, self.runner.job_results)
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, backoff_factor=0)
+
+    def tearDown(self):
+        self.stub.close()
+
+    def polls(self):
+        return len([r for r in self.stub.requests if r['path']=='/api/job-results'])
+
+    def test_run_and_wait(self):
+        result = self.bandit.run_and_wait('bandit-demos', 'echo1', poll_interval=0.01)
+        self.assertEqual(result.status, 'success')
+        self.assertEqual(result.n, 2)
+
+    def test_run_series(self):
+        jobs = [{'project': 'bandit-demos', 'name': 'echo1'}] * 3
+        results = self.bandit.run_series(jobs, poll_interval=0.01)
+        self.assertEqual([r.n for r in results], [2, 3, 4])
+
+    def test_run_series_stop_on_failure(self):
+        self.runner.status = 'failed'
+        jobs = [{'project': 'bandit-demos', 'name': 'echo1'}] * 3
+        results = self.bandit.run_series(jobs, stop_on_failure=True, poll_interval=0.01)
+        self.assertEqual(len(results), 1)
+
+    def test_run_parallel_polls_once_for_all_jobs(self):
+        jobs = [{'project': 'bandit-demos', 'name': name} for name in ['echo1', 'echo2', 'echo3', 'echo1']]
+        results = self.bandit.run_parallel(jobs, poll_interval=0.01)
+        self.assertEqual([r.name for r in results], ['echo1', 'echo2', 'echo3', 'echo1'])
+        self.assertEqual(len(set(r.n for r in results)), 4)
+        # 1 baseline fetch + the 3 polls it takes the runner to finish
+        self.assertEqual(self.polls(), 1 + 3)
+
+    def test_run_parallel_max_concurrency(self):
+        jobs = [{'project': 'bandit-demos', 'name': 'echo1'}] * 4
+        results = self.bandit.run_parallel(jobs, max_concurrency=2, poll_interval=0.01)
+        self.assertEqual(sorted(r.n for r in results), [2, 3, 4, 5])
+        self.assertEqual(self.polls(), 1 + 3 + 3)
+
+    def test_timeout(self):
+        self.runner.polls = 1000
+        self.assertRaises(Exception, self.bandit.run_and_wait, 'bandit-demos', 'echo1',
+                          timeout=0.2, poll_interval=0.01)
+
+    def test_timeout_waits_for_deadline(self):
+        self.runner.polls = 1000
+        start = time.monotonic()
+        self.assertRaises(Exception, self.bandit.run_and_wait, 'bandit-demos', 'echo1',
+                          timeout=0.3, poll_interval=0.2, max_poll_interval=5)
+        self.assertTrue(time.monotonic() - start >= 0.3)
+
+    def test_start_fails(self):
+        self.stub.respond('GET', '/api/projects/glamp/bandit-demos/jobs/echo4', 200,
+                          {'status': 'ERROR', 'message': 'no workers'})
+        jobs = [{'project': 'bandit-demos', 'name': name} for name in ['echo1', 'ecoh1', 'echo4']]
+        # no timeout, so this would hang if it waited on the jobs that didn't start
+        results = self.bandit.run_parallel(jobs, poll_interval=0.01)
+        self.assertEqual([r.status for r in results], ['success', 'error', 'error'])
+        self.assertTrue('404' in results[1].message)
+        self.assertEqual(results[2].message, 'no workers')
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from bandit import Bandit
+from stubserver import StubServer
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.bandit = Bandit("glamp", "apikey", self.stub.url, retries=3, backoff_factor=0)
+
+    def tearDown(self):
+        self.stub.close()
+
+    def test_retries_5xx(self):
+        self.stub.respond('GET', '/api/jobs', 503, {})
+        self.stub.respond('GET', '/api/jobs', 502, {})
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': []})
+        self.assertEqual(self.bandit.get_jobs(), [])
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_connection_is_reused(self):
+        self.stub.respond('GET', '/api/jobs', 200, {'jobs': []})
+        for i in range(5):
+            self.bandit.get_jobs()
+        self.assertEqual(len(self.stub.requests), 5)
+        self.assertEqual(self.stub.connections, 1)
+
+if __name__=="__main__":
+    unittest.main()
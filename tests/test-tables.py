@@ -0,0 +1,82 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from bandit import Bandit
+
+
+class TestStreamingDashboards(unittest.TestCase):
+
+    def setUp(self):
+        self.bandit = Bandit("glamp", "apikey", "http://localhost/")
+        self.bandit.output_dir = tempfile.mkdtemp() + '/'
+        self.df = pd.DataFrame({'a': np.arange(25), 'b': np.arange(25) * 0.5})
+
+    def tearDown(self):
+        shutil.rmtree(self.bandit.output_dir)
+
+    def read(self, name):
+        with open(self.bandit.output_dir + name, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def rows(self, html):
+        return html.count('<tr>')
+
+    def test_stream_matches_to_html(self):
+        self.bandit.make_dashboard('a.html', template_name='single-table', table=self.df)
+        self.bandit.make_dashboard('b.html', template_name='single-table', table=self.df, stream=True)
+        a, b = self.read('a.html'), self.read('b.html')
+        self.assertEqual(self.rows(a), self.rows(b))
+        self.assertEqual(a.split(), b.split())
+
+    def test_chunks(self):
+        from bandit import tables
+        with open(self.bandit.output_dir + 'c.html', 'wb') as f:
+            tables.write_table(f, self.df, chunk_size=7)
+        self.assertEqual(self.rows(self.read('c.html')), 25)
+
+    def test_max_rows(self):
+        self.bandit.make_dashboard('a.html', template_name='single-table', table=self.df, stream=True, max_rows=10)
+        html = self.read('a.html')
+        self.assertEqual(self.rows(html), 10)
+        self.assertTrue('Showing 10 of 25 rows' in html)
+
+    def test_pages(self):
+        self.bandit.make_dashboard('dash.html', template_name='single-table', table=self.df, page_size=10)
+        self.assertEqual(sorted(os.listdir(self.bandit.output_dir)),
+                         ['dash-table-page-2.html', 'dash-table-page-3.html', 'dash.html'])
+        self.assertEqual(self.rows(self.read('dash.html')), 10)
+        page = self.read('dash-table-page-3.html')
+        self.assertEqual(self.rows(page), 5)
+        self.assertTrue('href="dash.html"' in page)
+
+    def test_local_stdout(self):
+        local = Bandit(None, None, None)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            local.make_dashboard('a.html', template_name='single-table', table=self.df, stream=True)
+        self.assertEqual(self.rows(out.getvalue()), 25)
+
+    def test_local_pages(self):
+        local = Bandit(None, None, None)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            local.make_dashboard('a.html', template_name='single-table', table=self.df, page_size=10)
+        self.assertEqual(self.rows(out.getvalue()), 10)
+        self.assertTrue('Showing 10 of 25 rows' in out.getvalue())
+        self.assertFalse('page-2.html' in out.getvalue())
+        self.assertEqual(os.listdir(local.output_dir), [])
+        os.rmdir(local.output_dir)
+
+    def test_other_variables_are_rendered(self):
+        self.bandit.make_dashboard('a.html', template_name='image-with-tables', img='plot.png',
+                                   tables=['<p>hi</p>'], stream=True)
+        html = self.read('a.html')
+        self.assertTrue('plot.png' in html and '<p>hi</p>' in html)
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import shutil
+import tempfile
+from bandit import templates
+from bandit.templates import TemplateCache
+
+
+class TestTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def template(self, name, body):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(body)
+        return path
+
+    def test_cache_hits(self):
+        cache = TemplateCache()
+        path = self.template('a.html', '<p>{{x}}</p>')
+        first = cache.get(path)
+        self.assertTrue(cache.get(path) is first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(first({'x': 'hi'}), '<p>hi</p>')
+
+    def test_recompiles_modified_templates(self):
+        cache = TemplateCache()
+        path = self.template('a.html', '<p>{{x}}</p>')
+        cache.get(path)
+        self.template('a.html', '<b>{{x}}</b>')
+        mtime = os.path.getmtime(path) + 10
+        os.utime(path, (mtime, mtime))
+        self.assertEqual(cache.get(path)({'x': 'hi'}), '<b>hi</b>')
+        self.assertEqual(len(cache), 1)
+
+    def test_lru(self):
+        cache = TemplateCache(maxsize=2)
+        a, b, c = [self.template(name, name) for name in ['a', 'b', 'c']]
+        cache.get(a)
+        cache.get(b)
+        cache.get(a)
+        cache.get(c)
+        self.assertEqual(len(cache), 2)
+        cache.get(a)
+        self.assertEqual(cache.misses, 3)
+        cache.get(b)
+        self.assertEqual(cache.misses, 4)
+
+    def test_precompile_builtins(self):
+        templates._cache.clear()
+        templates.precompile()
+        self.assertEqual(len(templates._cache), 3)
+        templates.get_template('raw-html')
+        self.assertEqual(templates._cache.misses, 3)
+
+    def test_missing_template(self):
+        self.assertRaises(Exception, templates.get_template, 'does-not-exist')
+
+if __name__=="__main__":
+    unittest.main()